@@ -0,0 +1,81 @@
+import glob
+import logging
+import os
+import subprocess
+import sys
+import time
+from dotenv import load_dotenv
+from prometheus_client import multiprocess
+
+load_dotenv()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+
+# Number of seconds the master waits for the first published snapshot before starting the workers
+PUBLISH_TIMEOUT = float(os.getenv("PUBLISH_TIMEOUT", "120"))
+
+# Directory where the workers write their Prometheus metrics, so any worker can report those of all workers
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+publisher: subprocess.Popen | None = None
+
+
+def reset_metrics_directory() -> None:
+    """
+    Creates PROMETHEUS_MULTIPROC_DIR, or removes the metric files left in it by a previous run,
+    whose workers' counters would otherwise be added to those of the new workers.
+    """
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+    for path in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, '*.db')):
+        os.remove(path)
+
+
+def on_starting(server) -> None:
+    """
+    Prepares the metrics directory of the workers when PROMETHEUS_MULTIPROC_DIR is set.
+    Starts the snapshot publisher next to the gunicorn master when SHARED_SNAPSHOT is enabled,
+    and waits until a snapshot file exists, so the workers never start without data.
+
+    :param server: The gunicorn arbiter.
+    :raises RuntimeError: If the publisher exits or no snapshot is published in time.
+    """
+    global publisher
+    if PROMETHEUS_MULTIPROC_DIR:
+        reset_metrics_directory()
+    if os.getenv("SHARED_SNAPSHOT", "false").lower() != "true":
+        return
+
+    # A separate process rather than a thread, since the master forks the workers
+    publisher = subprocess.Popen([sys.executable, '-m', 'src.app.publisher'])
+    deadline = time.monotonic() + PUBLISH_TIMEOUT
+    while not os.path.exists(os.getenv("SNAPSHOT_FILE", "")):
+        if publisher.poll() is not None:
+            raise RuntimeError(f'Snapshot publisher exited with code {publisher.returncode}')
+        if time.monotonic() > deadline:
+            raise RuntimeError('No snapshot was published in time')
+        time.sleep(0.1)
+    logging.info(f'Snapshot publisher running with pid {publisher.pid}')
+
+
+def on_exit(server) -> None:
+    """
+    Stops the snapshot publisher together with the gunicorn master.
+
+    :param server: The gunicorn arbiter.
+    """
+    if publisher is not None and publisher.poll() is None:
+        publisher.terminate()
+        publisher.wait(timeout=10)
+
+
+def child_exit(server, worker) -> None:
+    """
+    Marks the metrics of an exited worker as dead, so its gauges are no longer reported,
+    while its counters and histograms remain part of the totals.
+
+    :param server: The gunicorn arbiter.
+    :param worker: The exited worker.
+    """
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(worker.pid)
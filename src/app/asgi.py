@@ -0,0 +1,356 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Iterator
+from urllib.parse import parse_qs
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_accept_header, parse_etags
+from werkzeug.routing import Map, Rule
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine
+from dotenv import load_dotenv
+from src.app.async_service import AsyncPurchasesService
+from src.app.service import PurchasesService
+from src.app.data.cache import SnapshotCache
+from src.app.data.database.configuration import configure_sqlite, create_sqlite_schema, sqlite_url
+from src.app.serializer import serializer
+from src.app.routes.caching import ResponseCache
+from src.app.routes.queries import PURCHASE_QUERIES
+from src.app.utils import encode_cursor, parse_page_arguments
+from src.app.routes.streaming import NDJSON_MIMETYPE, chunk_lines
+from src.app.data.async_repository import (
+    AsyncRepository,
+    ThreadedRepository,
+    AsyncCustomerProductRepositoryCSV,
+    AsyncCustomerProductRepositoryJSON,
+    AsyncCustomerProductRepositorySQL,
+    to_async_url
+)
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+
+type Headers = list[tuple[bytes, bytes]]
+
+
+def create_http_client(timeout: float) -> httpx.AsyncClient:
+    """
+    Creates an async HTTP client which keeps connections alive and reuses them across requests.
+
+    :param timeout: The number of seconds to wait for the server to connect or send data.
+    :return: A configured httpx.AsyncClient.
+    """
+    pool_size = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    return httpx.AsyncClient(
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        transport=httpx.AsyncHTTPTransport(retries=int(os.getenv("HTTP_RETRIES", "3")))
+    )
+
+
+async def create_repository(repo_type: str | None) -> AsyncRepository:
+    """
+    Creates the async repository for the configured source.
+
+    Remote CSV and JSON files are streamed with an async HTTP client and the databases are queried through
+    SQLAlchemy's asyncio extension. Local and snapshot files are read by the synchronous repositories
+    in a worker thread.
+
+    :param repo_type: The source type ('sql', 'sqlite', 'csv', 'json' or 'snapshot').
+    :return: The async repository.
+    :raises ValueError: If the source type is unsupported.
+    """
+    # The synchronous repositories are only needed for sources without an async client
+    from src.app.data import repository
+
+    match repo_type:
+        case "sql":
+            async with create_http_client(timeout=30) as client:
+                response = await client.get(os.getenv('SQLALCHEMY_DATABASE_URL'))
+                response.raise_for_status()
+            engine = create_async_engine(to_async_url(response.text.strip()))
+            return AsyncCustomerProductRepositorySQL(engine)
+        case "sqlite":
+            engine = create_async_engine(to_async_url(sqlite_url(os.getenv('SQLITE_PATH'))))
+            configure_sqlite(engine.sync_engine)
+            async with engine.begin() as connection:
+                await connection.run_sync(create_sqlite_schema)
+            return AsyncCustomerProductRepositorySQL(engine)
+        case "csv" if os.getenv("CSV_PATH", "").startswith(('http://', 'https://')):
+            client = create_http_client(timeout=float(os.getenv("CSV_TIMEOUT", "30")))
+            return AsyncCustomerProductRepositoryCSV(os.getenv("CSV_PATH"), client)
+        case "json" if os.getenv("JSON_PATH", "").startswith(('http://', 'https://')):
+            client = create_http_client(timeout=float(os.getenv("JSON_TIMEOUT", "30")))
+            return AsyncCustomerProductRepositoryJSON(os.getenv("JSON_PATH"), client)
+        case "csv":
+            return ThreadedRepository(repository.customer_product_repository_csv)
+        case "json":
+            return ThreadedRepository(repository.customer_product_repository_json)
+        case "snapshot":
+            return ThreadedRepository(repository.customer_product_repository_snapshot)
+        case _:
+            raise ValueError("Unsupported repository type")
+
+
+async def create_service() -> AsyncPurchasesService:
+    """
+    Creates the AsyncPurchasesService from the environment configuration.
+
+    SOURCE, SNAPSHOT_TTL and ENGINE have the same meaning as for the Flask application. Aggregations are always
+    computed over the cached snapshot, so SQL_PUSHDOWN does not apply.
+
+    :return: The configured AsyncPurchasesService.
+    :raises ValueError: If the source or engine type is unsupported.
+    """
+    match os.getenv("ENGINE", "python"):
+        case "python":
+            service_type = PurchasesService
+        case "columnar":
+            from src.app.columnar import ColumnarPurchasesService
+            service_type = ColumnarPurchasesService
+        case _:
+            raise ValueError("Unsupported engine type")
+
+    return AsyncPurchasesService(
+        repository=await create_repository(os.getenv("SOURCE")),
+        snapshot_cache=SnapshotCache(ttl=float(os.getenv("SNAPSHOT_TTL", "60"))),
+        service_type=service_type
+    )
+
+
+async def get_data(service: AsyncPurchasesService, query: dict[str, list[str]],
+                   ndjson: bool) -> tuple[dict | bytes | Iterator[bytes], int]:
+    """
+    Returns all purchase data, or a page of it with the cursor of the next page when a limit or a cursor is given.
+
+    :param service: The purchases service.
+    :param query: The query parameters of the request.
+    :param ndjson: Whether the client accepts a newline-delimited JSON stream.
+    :return: The error message, the encoded purchase data or the chunks of an NDJSON stream, and the status code.
+    """
+    if 'limit' in query or 'cursor' in query:
+        try:
+            limit, after = parse_page_arguments(query.get('limit', [None])[0], query.get('cursor', [None])[0])
+        except ValueError as error:
+            return {'message': str(error)}, 400
+
+        page, last_id = await service.get_purchases_page(limit, after)
+        next_cursor = None if last_id is None else encode_cursor(last_id)
+        return await asyncio.to_thread(serializer.purchases_page, page, next_cursor), 200
+
+    data = await service.get_all_purchases()
+    if ndjson:
+        return chunk_lines(serializer.purchase_lines(data.customers_and_their_products.items())), 200
+    if data:
+        # Encoding all purchases takes as long as an aggregation, so it runs in a worker thread as well
+        return await asyncio.to_thread(serializer.purchases, data), 200
+    return {'message': 'No SQL data available'}, 500
+
+
+async def get_cache_stats(service: AsyncPurchasesService) -> tuple[dict, int]:
+    """
+    Returns the purchase snapshot cache statistics and the data loading counters of the repository.
+
+    :param service: The purchases service.
+    :return: The response data and the status code.
+    """
+    return {**service.snapshot_cache.stats(), 'repository': service.repository.stats()}, 200
+
+
+# The same paths as the Flask application, matched by the same rules and converters
+URL_MAP = Map([
+    Rule('/data', endpoint='data'),
+    Rule('/cache', endpoint='cache'),
+    *(Rule(f'/purchases{query.rule}', endpoint=name) for name, query in PURCHASE_QUERIES.items())
+])
+
+
+class PurchasesApplication:
+    """
+    ASGI application serving the purchase routes of the Flask application from an AsyncPurchasesService.
+
+    Run it with an ASGI server, e.g. `uvicorn src.app.asgi:app --workers 4`. Each worker runs a single event loop,
+    so requests waiting for a slow source do not occupy a worker, and concurrent requests share one load.
+    Responses are encoded like Flask's, and errors are returned as {'message': ...} with a 500 status code.
+    """
+
+    def __init__(self, service_factory: Callable[[], Awaitable[AsyncPurchasesService]] = create_service,
+                 response_cache: ResponseCache | None = None) -> None:
+        """
+        Initializes the application.
+
+        :param service_factory: A coroutine function creating the service when the server starts.
+        :param response_cache: The cache of rendered /purchases responses, sized by RESPONSE_CACHE_SIZE by default.
+        """
+        self.service_factory = service_factory
+        self.service: AsyncPurchasesService | None = None
+        self._service_lock = asyncio.Lock()
+        self.response_cache = response_cache if response_cache is not None \
+            else ResponseCache(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "256")))
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        """
+        Handles a single ASGI connection.
+
+        :param scope: The connection scope.
+        :param receive: The coroutine receiving events from the server.
+        :param send: The coroutine sending events to the server.
+        """
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            status, body, headers = await self._dispatch(scope)
+            if status == 304:
+                await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            if isinstance(body, bytes):
+                await send({
+                    'type': 'http.response.start',
+                    'status': status,
+                    'headers': [
+                        (b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode()),
+                        *headers
+                    ]
+                })
+                await send({'type': 'http.response.body', 'body': body})
+                return
+
+            # NDJSON streams are sent chunk by chunk while they are serialized
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [(b'content-type', NDJSON_MIMETYPE.encode())]
+            })
+            for chunk in body:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        """
+        Creates the service on startup and releases its connections on shutdown.
+
+        :param receive: The coroutine receiving lifespan events from the server.
+        :param send: The coroutine sending lifespan events to the server.
+        """
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    self.service = await self.service_factory()
+                except Exception as error:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(error)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.service is not None:
+                    await self.service.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _dispatch(self, scope: dict) -> tuple[int, bytes | Iterator[bytes], Headers]:
+        """
+        Routes a request to its handler and encodes the response.
+
+        :param scope: The connection scope of the request.
+        :return: The status code, the JSON encoded body or the chunks of an NDJSON stream, and additional headers.
+        """
+        if scope['method'] != 'GET':
+            return *self._encode({'message': 'Method Not Allowed'}, 405), []
+        try:
+            endpoint, arguments = URL_MAP.bind('').match(scope['path'])
+        except HTTPException:
+            return *self._encode({'message': 'Not Found'}, 404), []
+
+        try:
+            service = await self._get_service()
+            ndjson = self._wants_ndjson(scope)
+            match endpoint:
+                case 'data':
+                    query = parse_qs(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True)
+                    payload, status = await get_data(service, query, ndjson)
+                    if isinstance(payload, dict):
+                        # /data is a Flask-RESTful resource, which does not sort keys and uses
+                        # the json module's default separators
+                        return status, (json.dumps(payload) + '\n').encode('utf-8'), []
+                    return status, payload, []
+                case 'cache':
+                    return *self._encode(*await get_cache_stats(service)), []
+
+            purchase_query = PURCHASE_QUERIES[endpoint]
+            if ndjson and purchase_query.lines is not None:
+                result = await getattr(service, purchase_query.method)(*arguments.values())
+                return 200, chunk_lines(purchase_query.lines(result)), []
+            return await self._cached(scope, endpoint, arguments)
+        except Exception as error:
+            logging.exception(error)
+            return *self._encode({'message': error.args[0] if error.args else str(error)}, 500), []
+
+    async def _get_service(self) -> AsyncPurchasesService:
+        """
+        Returns the service, creating it on the first request if the server did not send lifespan events.
+        Concurrent first requests wait for a single service to be created.
+
+        :return: The purchases service.
+        """
+        if self.service is None:
+            async with self._service_lock:
+                if self.service is None:
+                    self.service = await self.service_factory()
+        return self.service
+
+    async def _cached(self, scope: dict, endpoint: str, arguments: dict) -> tuple[int, bytes, Headers]:
+        """
+        Serves a purchase query, whose response is a pure function of the current data, like the Flask application's
+        `cached_response`: rendered bodies are cached under the endpoint, its arguments and the data version,
+        every response carries an ETag derived from its body, and a matching If-None-Match header gets a 304.
+
+        :param scope: The connection scope of the request.
+        :param endpoint: The name of the purchase query.
+        :param arguments: The arguments of the route.
+        :return: The status code, the JSON encoded body and the caching headers.
+        """
+        key = (endpoint, tuple(sorted(arguments.items())), await self.service.get_data_version())
+        entry = self.response_cache.get(key)
+        if entry is None:
+            purchase_query = PURCHASE_QUERIES[endpoint]
+            result = await getattr(self.service, purchase_query.method)(*arguments.values())
+            body = await asyncio.to_thread(serializer.dumps, purchase_query.payload(result))
+            entry = self.response_cache.put(key, body)
+
+        body, etag = entry
+        headers = [(b'cache-control', b'no-cache'), (b'etag', f'"{etag}"'.encode()), (b'vary', b'Accept')]
+        if_none_match = next((value for name, value in scope['headers'] if name == b'if-none-match'), None)
+        if if_none_match is not None and parse_etags(if_none_match.decode('latin-1')).contains_weak(etag):
+            return 304, b'', headers
+        return 200, body, headers
+
+    @staticmethod
+    def _wants_ndjson(scope: dict) -> bool:
+        """
+        Checks whether the client prefers a newline-delimited JSON stream to a single JSON document.
+
+        :param scope: The connection scope of the request.
+        :return: True if NDJSON is the best match for the request's Accept header.
+        """
+        accept = next((value for name, value in scope['headers'] if name == b'accept'), b'').decode('latin-1')
+        best_match = parse_accept_header(accept, MIMEAccept).best_match(['application/json', NDJSON_MIMETYPE])
+        return best_match == NDJSON_MIMETYPE
+
+    @staticmethod
+    def _encode(payload: dict, status: int) -> tuple[int, bytes]:
+        """
+        Encodes a response body the same way as Flask's `jsonify`.
+
+        :param payload: The response data.
+        :param status: The status code.
+        :return: The status code and the JSON encoded body.
+        """
+        return status, serializer.dumps(payload)
+
+
+# ======================================================================================================================
+app = PurchasesApplication()
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable
+from src.app.model import Purchase, Customer
+from src.app.utils import MaxMin
+from src.app.service import PurchasesService
+from src.app.data.cache import SnapshotCache
+from src.app.data.async_repository import AsyncRepository
+from src.app.data.repository import NotImplementedOperationsRepository
+logging.basicConfig(level=logging.INFO)
+
+
+class LoadedPurchasesRepository(NotImplementedOperationsRepository[Purchase]):
+    """
+    Repository handing the purchases most recently loaded by an async repository to a synchronous service.
+    """
+
+    def __init__(self) -> None:
+        self.purchase = Purchase(customers_and_their_products={})
+
+    def get_purchases(self) -> Purchase:
+        """
+        Returns the purchases most recently loaded.
+
+        :return: A Purchase object with customer and product data.
+        """
+        return self.purchase
+
+
+@dataclass
+class AsyncPurchasesService:
+    """
+    Async counterpart of PurchasesService.
+
+    Purchases are loaded through an async repository, so waiting for a slow source does not block the worker,
+    and concurrent requests share a single load. The aggregations are computed over the cached snapshot
+    by a synchronous service of `service_type`, so both variants return the same results. They run in a worker
+    thread, like building the index of a new snapshot on first use, so the event loop keeps serving other requests.
+    """
+    repository: AsyncRepository
+    snapshot_cache: SnapshotCache[Purchase] = field(default_factory=SnapshotCache)
+    service_type: type[PurchasesService] = PurchasesService
+    _loaded: LoadedPurchasesRepository = field(default_factory=LoadedPurchasesRepository, init=False, repr=False)
+    _service: PurchasesService = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._service = self.service_type(customer_product_repository=self._loaded, snapshot_cache=self.snapshot_cache)
+
+    async def get_all_purchases(self) -> Purchase:
+        """
+        Retrieves all purchases made by customers, awaiting the repository only when the cached snapshot is stale.
+
+        :return: A Purchase object containing details of all customers and the products they purchased.
+        """
+        return await self._run(self._service.get_all_purchases)
+
+    async def get_purchases_page(self, limit: int, after: int | None = None) -> tuple[Purchase, int | None]:
+        """
+        Retrieves the purchases of at most `limit` customers with an id greater than `after`, in the order of their ids.
+
+        :param limit: The maximum number of customers on the page.
+        :param after: The id of the last customer on the previous page, or None for the first page.
+        :return: A tuple of the Purchase object with the page and the id of its last customer,
+        or None if no customers follow.
+        """
+        return await self._run(self._service.get_purchases_page, limit, after)
+
+    async def get_data_version(self) -> int | None:
+        """
+        Returns the version of the data which the results are computed from,
+        reloading the snapshot first if it is stale.
+
+        :return: The snapshot version.
+        """
+        await self._load()
+        return self.snapshot_cache.version
+
+    async def get_customers_total_spent(self, customer_id: int) -> Decimal:
+        """
+        Calculates the total amount spent by a customer with a given ID.
+
+        :param customer_id: The ID of the customer whose spending is to be calculated.
+        :return: The total amount spent by the customer. Returns 0 if the customer ID is not found.
+        """
+        return await self._run(self._service.get_customers_total_spent, customer_id)
+
+    async def get_customer_who_spent_the_most(self) -> list[Customer]:
+        """
+        Identifies the customer(s) who have spent the most across all categories.
+
+        :return: A list of customers who have spent the maximum amount.
+        """
+        return await self._run(self._service.get_customer_who_spent_the_most)
+
+    async def get_most_spending_in_category(self, category: str) -> list[Customer]:
+        """
+        Finds the customer(s) who have spent the most in a specific category.
+
+        :param category: The category for which to determine the highest spending customer(s).
+        :return: A list of customers who have spent the most in the given category.
+        """
+        return await self._run(self._service.get_most_spending_in_category, category)
+
+    async def get_age_category_preference(self) -> dict[int, str]:
+        """
+        Provides a summary of age groups and their most frequently purchased product categories.
+
+        :return: A dictionary mapping each customer age to the product category they purchased most frequently.
+        """
+        return await self._run(self._service.get_age_category_preference)
+
+    async def get_category_and_avg_price(self) -> dict[str, Decimal]:
+        """
+        Calculates the average price of products in each category.
+
+        :return: A dictionary where the key is the product category and the value is the average price.
+        """
+        return await self._run(self._service.get_category_and_avg_price)
+
+    async def get_most_and_least_expensive_in_category(self) -> dict[str, MaxMin]:
+        """
+        Identifies the most and least expensive products in each category.
+
+        :return: A dictionary where the key is the product category and the value is a MaxMin object.
+        """
+        return await self._run(self._service.get_most_and_least_expensive_in_category)
+
+    async def get_most_frequent_category_for_customers(self) -> dict[str, list[Customer]]:
+        """
+        Determines the most frequently purchased product category for each customer.
+
+        :return: A dictionary mapping categories to the customers who purchased them most frequently.
+        """
+        return await self._run(self._service.get_most_frequent_category_for_customers)
+
+    async def can_customer_pay(self, customer_id: int) -> bool:
+        """
+        Checks if a customer with a given ID can pay for their purchases.
+
+        :param customer_id: The ID of the customer to check.
+        :return: True if the customer can pay for their purchases, False otherwise.
+        """
+        return await self._run(self._service.can_customer_pay, customer_id)
+
+    async def get_customers_debt(self, customer_id: int) -> Decimal:
+        """
+        Calculates the debt of a customer with a given ID.
+
+        :param customer_id: The ID of the customer whose debt is to be calculated.
+        :return: The amount of debt the customer has.
+        """
+        return await self._run(self._service.get_customers_debt, customer_id)
+
+    async def get_customers_with_debts(self) -> dict[int, Decimal]:
+        """
+        Retrieves all customers who have debts.
+
+        :return: A dictionary where the key is the customer ID and the value is the amount of debt they owe.
+        """
+        return await self._run(self._service.get_customers_with_debts)
+
+    async def _load(self) -> None:
+        """
+        Hands the current snapshot to the synchronous service, awaiting the repository if the cached one is stale.
+        """
+        self._loaded.purchase = await self.snapshot_cache.get_async(self.repository.get_purchases)
+
+    async def _run[R](self, method: Callable[..., R], *args) -> R:
+        """
+        Calls a method of the synchronous service over the current snapshot in a worker thread.
+
+        :param method: The method of the synchronous service.
+        :param args: The arguments of the method.
+        :return: The result of the method.
+        """
+        await self._load()
+        return await asyncio.to_thread(method, *args)
+
+    async def aclose(self) -> None:
+        """
+        Releases the connections held by the repository.
+        """
+        await self.repository.aclose()
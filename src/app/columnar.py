@@ -0,0 +1,352 @@
+from dataclasses import dataclass
+from decimal import Decimal
+import numpy as np
+from src.app.model import Purchase, Customer, Product
+from src.app.service import PurchasesService
+from src.app.utils import MaxMin, to_cents, from_cents
+
+
+@dataclass(frozen=True)
+class ColumnarPurchases:
+    """
+    Column-oriented representation of a Purchase snapshot.
+
+    Every purchased item is a row in flat NumPy arrays holding the customer's position, the product's category code,
+    and the price in integer cents together with its decimal exponent. Aggregations are vectorized group-by
+    operations over these arrays. The exponents are tracked so that every amount converted back to Decimal
+    is identical, including its exponent, to the one computed with Decimal arithmetic.
+    Snapshots whose sums might not fit in 64-bit integers are not represented in columns.
+    """
+    customers: list[Customer]
+    customer_positions: dict[int, int]
+    categories: list[str]
+    category_codes: dict[str, int]
+    row_customer: np.ndarray
+    row_category: np.ndarray
+    row_cents: np.ndarray
+    row_exponent: np.ndarray
+    total_cents: np.ndarray
+    total_exponent: np.ndarray
+    debt_cents: np.ndarray
+    debt_exponent: np.ndarray
+    products: list[Product]
+    product_id: np.ndarray
+    product_category: np.ndarray
+    product_cents: np.ndarray
+    product_exponent: np.ndarray
+
+    @classmethod
+    def from_purchase(cls, purchase: Purchase) -> 'ColumnarPurchases | None':
+        """
+        Builds the columns from a Purchase snapshot.
+
+        :param purchase: The Purchase snapshot to convert.
+        :return: The columnar representation, or None if the snapshot cannot be represented exactly,
+        i.e. when an amount has more than two decimal places, a sum might overflow 64-bit integers
+        or customer ids are not unique.
+        """
+        customers = list(purchase.customers_and_their_products)
+        customer_positions = {customer.id: position for position, customer in enumerate(customers)}
+        if len(customer_positions) != len(customers):
+            return None
+
+        categories = {}
+        prices = {}
+        unique_products = {}
+        row_customer, row_category, row_cents, row_exponent = [], [], [], []
+
+        for position, products in enumerate(purchase.customers_and_their_products.values()):
+            for product in products:
+                price = prices.get(id(product))
+                if price is None:
+                    price = prices[id(product)] = to_cents(product.price)
+                    if price is None:
+                        return None
+                row_customer.append(position)
+                row_category.append(categories.setdefault(product.category, len(categories)))
+                row_cents.append(price[0])
+                row_exponent.append(price[1])
+                unique_products[product.id] = product
+
+        cash = [to_cents(customer.cash) for customer in customers]
+        if None in cash:
+            return None
+
+        # Every sum in cents, including the sums per category and the debts, is bounded by the sum
+        # of the absolute prices of all rows and the largest absolute cash
+        bound = sum(map(abs, row_cents)) + max((abs(cents) for cents, _ in cash), default=0)
+        if bound > np.iinfo(np.int64).max:
+            return None
+
+        row_customer = np.array(row_customer, dtype=np.int64)
+        row_cents = np.array(row_cents, dtype=np.int64)
+        row_exponent = np.array(row_exponent, dtype=np.int64)
+
+        # Summing starts from Decimal(0), whose exponent is 0
+        total_cents = np.zeros(len(customers), dtype=np.int64)
+        total_exponent = np.zeros(len(customers), dtype=np.int64)
+        np.add.at(total_cents, row_customer, row_cents)
+        np.minimum.at(total_exponent, row_customer, row_exponent)
+
+        cash_cents = np.array([c for c, _ in cash], dtype=np.int64)
+        cash_exponent = np.array([e for _, e in cash], dtype=np.int64)
+        debt_cents = total_cents - cash_cents
+        # A negative difference becomes Decimal(0), while a zero difference keeps its own exponent
+        debt_exponent = np.where(debt_cents < 0, 0, np.minimum(total_exponent, cash_exponent))
+        debt_cents = np.maximum(debt_cents, 0)
+
+        products = list(unique_products.values())
+        product_prices = [prices[id(product)] for product in products]
+
+        return cls(
+            customers=customers,
+            customer_positions=customer_positions,
+            categories=list(categories),
+            category_codes=categories,
+            row_customer=row_customer,
+            row_category=np.array(row_category, dtype=np.int64),
+            row_cents=row_cents,
+            row_exponent=row_exponent,
+            total_cents=total_cents,
+            total_exponent=total_exponent,
+            debt_cents=debt_cents,
+            debt_exponent=debt_exponent,
+            products=products,
+            product_id=np.array([p.id for p in products], dtype=np.int64),
+            product_category=np.array([categories[p.category] for p in products], dtype=np.int64),
+            product_cents=np.array([c for c, _ in product_prices], dtype=np.int64),
+            product_exponent=np.array([e for _, e in product_prices], dtype=np.int64)
+        )
+
+
+@dataclass
+class ColumnarPurchasesService(PurchasesService):
+    """
+    PurchasesService variant which answers queries from a ColumnarPurchases snapshot using vectorized NumPy operations.
+
+    The results are identical to those of PurchasesService. Snapshots which cannot be represented exactly in integer
+    cents are answered by the PurchasesService implementation instead.
+    """
+
+    def get_customers_total_spent(self, customer_id: int) -> Decimal:
+        """
+        Calculates the total amount spent by a customer with a given ID.
+
+        :param customer_id: The ID of the customer whose spending is to be calculated.
+        :return: The total amount spent by the customer. Returns 0 if the customer ID is not found.
+        """
+        if (columns := self._get_columns()) is None:
+            return super().get_customers_total_spent(customer_id)
+
+        position = columns.customer_positions.get(customer_id)
+        return Decimal(0) if position is None \
+            else from_cents(columns.total_cents[position], columns.total_exponent[position])
+
+    def get_customer_who_spent_the_most(self) -> list[Customer]:
+        """
+        Identifies the customer(s) who have spent the most across all categories.
+
+        :return: A list of customers who have spent the maximum amount. Returns an empty list if no customers are found.
+        """
+        if (columns := self._get_columns()) is None:
+            return super().get_customer_who_spent_the_most()
+
+        if not columns.customers:
+            return []
+        top = np.flatnonzero(columns.total_cents == columns.total_cents.max())
+        return [columns.customers[position] for position in top]
+
+    def get_most_spending_in_category(self, category: str) -> list[Customer]:
+        """
+        Finds the customer(s) who have spent the most in a specific category.
+
+        :param category: The category for which to determine the highest spending customer(s).
+        :return: A list of customers who have spent the most in the given category. Returns an empty list if no spending
+        is recorded in the category.
+        """
+        if (columns := self._get_columns()) is None:
+            return super().get_most_spending_in_category(category)
+
+        code = columns.category_codes.get(category)
+        if code is None:
+            return []
+
+        in_category = columns.row_category == code
+        spent = np.zeros(len(columns.customers), dtype=np.int64)
+        np.add.at(spent, columns.row_customer[in_category], columns.row_cents[in_category])
+        buyers = np.unique(columns.row_customer[in_category])
+        max_spent = spent[buyers].max()
+        return [] if max_spent == 0 \
+            else [columns.customers[position] for position in buyers[spent[buyers] == max_spent]]
+
+    def get_age_category_preference(self) -> dict[int, str]:
+        """
+        Provides a summary of age groups and their most frequently purchased product categories.
+
+        :return: A dictionary mapping each customer age to the product category they purchased most frequently.
+        If no category is purchased for a specific age, the value will be None.
+        """
+        if (columns := self._get_columns()) is None:
+            return super().get_age_category_preference()
+
+        ages = np.array([customer.age for customer in columns.customers], dtype=np.int64)[columns.row_customer]
+        groups, first_rows, counts = self._group(ages, columns.row_category)
+
+        result = {}
+        # Ages and categories are visited in order of their first purchase, so the first maximum wins ties
+        for group in np.argsort(first_rows, kind='stable'):
+            age, category = int(groups[group, 0]), int(groups[group, 1])
+            best = result.get(age)
+            if best is None or counts[group] > best[1]:
+                result[age] = (category, counts[group])
+        return {age: columns.categories[category] for age, (category, _) in result.items()}
+
+    def get_category_and_avg_price(self) -> dict[str, Decimal]:
+        """
+        Calculates the average price of products in each category.
+
+        :return: A dictionary where the key is the product category and the value is the average price of products
+        in that category. Returns 0.00 if a category has no products.
+        """
+        if (columns := self._get_columns()) is None:
+            return super().get_category_and_avg_price()
+
+        sums, exponents, counts = self._category_sums(columns)
+        return {
+            columns.categories[code]: from_cents(sums[code], exponents[code]) / Decimal(int(counts[code]))
+            for code in self._product_category_order(columns)
+        }
+
+    def get_most_and_least_expensive_in_category(self) -> dict[str, MaxMin]:
+        """
+        Identifies the most and least expensive products in each category.
+
+        :return: A dictionary where the key is the product category and the value is an instance of `MaxMin`
+        containing the most and least expensive products in that category.
+        """
+        if (columns := self._get_columns()) is None:
+            return super().get_most_and_least_expensive_in_category()
+
+        result = {}
+        for code in self._product_category_order(columns):
+            positions = np.flatnonzero(columns.product_category == code)
+            prices = columns.product_cents[positions]
+            ids = columns.product_id[positions]
+            # Equally priced products are ordered by their id, so the lower id wins ties like in PurchasesService
+            result[columns.categories[code]] = MaxMin(
+                max=columns.products[positions[np.lexsort((ids, -prices))[0]]],
+                min=columns.products[positions[np.lexsort((ids, prices))[0]]]
+            )
+        return result
+
+    def get_most_frequent_category_for_customers(self) -> dict[str, list[Customer]]:
+        """
+        Determines the most frequently purchased product category for each customer.
+
+        :return: A dictionary where the key is the product category and the value is a list of customers
+        who have purchased that category the most frequently.
+        """
+        if (columns := self._get_columns()) is None:
+            return super().get_most_frequent_category_for_customers()
+
+        groups, first_rows, counts = self._group(columns.row_category, columns.row_customer)
+        max_counts = np.zeros(len(columns.categories), dtype=np.int64)
+        np.maximum.at(max_counts, groups[:, 0], counts)
+
+        result = {}
+        for group in np.argsort(first_rows, kind='stable'):
+            category, position = int(groups[group, 0]), int(groups[group, 1])
+            customers = result.setdefault(columns.categories[category], [])
+            if counts[group] == max_counts[category]:
+                customers.append(columns.customers[position])
+        return result
+
+    def get_customers_debt(self, customer_id: int) -> Decimal:
+        """
+        Calculates the total debt for a customer with the given ID.
+
+        :param customer_id: The ID of the customer whose debt is to be calculated.
+        :return: The amount of debt the customer has.
+        Returns -1 if the customer does not exist.
+        Returns 0 if the customer’s total spending is less than or equal to their cash.
+        """
+        if (columns := self._get_columns()) is None:
+            return super().get_customers_debt(customer_id)
+
+        position = columns.customer_positions.get(customer_id)
+        return Decimal(-1) if position is None \
+            else from_cents(columns.debt_cents[position], columns.debt_exponent[position])
+
+    def get_customers_with_debts(self) -> dict[int, Decimal]:
+        """
+        Gets a dictionary of customers with the amount of debt they owe.
+
+        :return: A dictionary where the key is a customer's id  and the value is the amount of debt they owe.
+        Customers with no debt are not included in the dictionary.
+        """
+        if (columns := self._get_columns()) is None:
+            return super().get_customers_with_debts()
+
+        return {
+            columns.customers[position].id: from_cents(columns.debt_cents[position], columns.debt_exponent[position])
+            for position in np.flatnonzero(columns.debt_cents > 0)
+        }
+
+    def _build_derived(self, purchase: Purchase) -> dict[str, object]:
+        """
+        Builds the columnar representation of a purchase snapshot, and the aggregate index
+        only if the snapshot cannot be represented in columns.
+
+        :param purchase: The purchase snapshot.
+        :return: The derived values by the name they are cached under.
+        """
+        columns = ColumnarPurchases.from_purchase(purchase)
+        return {'columns': columns} if columns is not None else {'columns': None, **super()._build_derived(purchase)}
+
+    def _get_columns(self) -> ColumnarPurchases | None:
+        """
+        Retrieves the columnar representation of the current purchase snapshot, built once per snapshot.
+
+        :return: The ColumnarPurchases of the current snapshot, or None if it cannot be represented exactly.
+        """
+        return self.snapshot_cache.get_derived('columns', self.customer_product_repository.get_purchases,
+                                               ColumnarPurchases.from_purchase)
+
+    @staticmethod
+    def _group(keys: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Groups rows by a pair of columns.
+
+        :param keys: The first column of the pair.
+        :param values: The second column of the pair.
+        :return: A tuple of the distinct pairs, the row at which each pair first occurs, and the number of rows
+        in each group.
+        """
+        pairs = np.stack((keys, values), axis=1).reshape(-1, 2)
+        return np.unique(pairs, axis=0, return_index=True, return_counts=True)
+
+    @staticmethod
+    def _category_sums(columns: ColumnarPurchases) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sums the prices of the unique products in each category.
+
+        :param columns: The columnar snapshot.
+        :return: A tuple of the sums in cents, their exponents and the number of products, indexed by category code.
+        """
+        sums = np.zeros(len(columns.categories), dtype=np.int64)
+        exponents = np.zeros(len(columns.categories), dtype=np.int64)
+        counts = np.bincount(columns.product_category, minlength=len(columns.categories))
+        np.add.at(sums, columns.product_category, columns.product_cents)
+        np.minimum.at(exponents, columns.product_category, columns.product_exponent)
+        return sums, exponents, counts
+
+    @staticmethod
+    def _product_category_order(columns: ColumnarPurchases) -> list[int]:
+        """
+        Lists the category codes in the order in which they first occur among the unique products.
+
+        :param columns: The columnar snapshot.
+        :return: A list of category codes.
+        """
+        codes, first_positions = np.unique(columns.product_category, return_index=True)
+        return [int(code) for code in codes[np.argsort(first_positions)]]
@@ -1,28 +1,100 @@
 import os
-from src.app.data.repository import customer_product_repository_csv, customer_product_repository_json
+from src.app.data.repository import (
+    customer_product_repository_csv,
+    customer_product_repository_json,
+    customer_product_repository_snapshot
+)
+from src.app.data.snapshot import read_snapshot
 from src.app.data.database.repository import customer_product_repository_sql
-from src.app.service import PurchasesService
+from src.app.service import PurchasesService, SQLPurchasesService
+from src.app.data.cache import SnapshotCache
+from src.app.refresher import SnapshotRefresher
+from src.app.metrics import metrics_enabled, instrument_loads
 from dotenv import load_dotenv
 load_dotenv()
 
 repo_type = os.getenv("SOURCE")
+# Number of seconds a loaded purchase snapshot is reused before it is fetched again (0 disables caching)
+snapshot_cache = SnapshotCache(ttl=float(os.getenv("SNAPSHOT_TTL", "60")))
+# Whether the SQL source computes aggregations in the database instead of in memory
+sql_pushdown = os.getenv("SQL_PUSHDOWN", "false").lower() == "true"
+# Engine answering the queries in memory: "python" (Decimal arithmetic) or "columnar" (vectorized NumPy arrays)
+engine = os.getenv("ENGINE", "python")
+# Number of seconds between background snapshot refreshes (0 disables the refresher, so requests load on demand)
+refresh_interval = float(os.getenv("REFRESH_INTERVAL", "0"))
+# Whether a single publisher process (src.app.publisher) loads SOURCE and publishes it to SNAPSHOT_FILE,
+# while the workers only decode the published file and check it for updates every SNAPSHOT_POLL_INTERVAL seconds
+shared_snapshot = os.getenv("SHARED_SNAPSHOT", "false").lower() == "true"
+if shared_snapshot:
+    refresh_interval = float(os.getenv("SNAPSHOT_POLL_INTERVAL", "1"))
+# Number of rows or entries of an upload to /purchases/ingest parsed and written per INSERT statement
+ingest_chunk_size = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
 """
 Create an instance of PurchasesService based on the repository type.
 
 - If the repository type is "sql", use the SQL-based repository.
+- If the repository type is "sqlite", use the SQL-based repository with the local SQLite file at SQLITE_PATH.
 - If the repository type is "csv", use the CSV-based repository.
 - If the repository type is "json", use the JSON-based repository.
+- If the repository type is "snapshot", use the binary snapshot file at SNAPSHOT_FILE.
 - Raise a ValueError if the repository type is unsupported.
 
+When SHARED_SNAPSHOT is enabled, the service reads the snapshot file published from that source instead.
+
+The service type depends on where aggregations are computed:
+- SQLPurchasesService pushes them down into the database for the "sql" and "sqlite" sources
+  when SQL_PUSHDOWN is enabled.
+- ColumnarPurchasesService computes them with NumPy when ENGINE is "columnar".
+- PurchasesService computes them with Decimal arithmetic otherwise.
+
 The PurchasesService is initialized with the appropriate repository, allowing the service
 to interact with different data sources as specified by the environment configuration.
 """
 match repo_type:
-    case "sql":
-        purchase_service = PurchasesService(customer_product_repository=customer_product_repository_sql)
+    case "sql" | "sqlite":
+        source_repository = customer_product_repository_sql
     case "csv":
-        purchase_service = PurchasesService(customer_product_repository=customer_product_repository_csv)
+        source_repository = customer_product_repository_csv
     case "json":
-        purchase_service = PurchasesService(customer_product_repository=customer_product_repository_json)
+        source_repository = customer_product_repository_json
+    case "snapshot":
+        source_repository = customer_product_repository_snapshot
     case _:
         raise ValueError("Unsupported repository type")
+
+# Workers attached to a shared snapshot never load from the source themselves
+repository = customer_product_repository_snapshot if shared_snapshot else source_repository
+
+# Time the loads of the repository and count their rows, only when METRICS_ENABLED is set
+if metrics_enabled:
+    instrument_loads(repository, "snapshot" if shared_snapshot else repo_type)
+
+if repo_type in ("sql", "sqlite") and sql_pushdown and not shared_snapshot:
+    service_type = SQLPurchasesService
+elif engine == "columnar":
+    # NumPy is only needed when the columnar engine is selected
+    from src.app.columnar import ColumnarPurchasesService
+    service_type = ColumnarPurchasesService
+elif engine == "python":
+    service_type = PurchasesService
+else:
+    raise ValueError("Unsupported engine type")
+
+purchase_service = service_type(customer_product_repository=repository, snapshot_cache=snapshot_cache)
+
+# Warm-start from a local snapshot file, so the first requests do not wait for the source to be loaded
+snapshot_file = os.getenv("SNAPSHOT_FILE")
+if repo_type != "snapshot" and not shared_snapshot and snapshot_file and os.path.exists(snapshot_file):
+    snapshot_cache.prime(read_snapshot(snapshot_file))
+
+# Keeps the snapshot current in the background once started by create_app.main
+snapshot_refresher = SnapshotRefresher(
+    service=purchase_service,
+    interval=refresh_interval,
+    jitter=float(os.getenv("REFRESH_JITTER", "0.1")),
+    backoff=float(os.getenv("REFRESH_BACKOFF", "5")),
+    max_backoff=float(os.getenv("REFRESH_MAX_BACKOFF", "300"))
+)
+if refresh_interval > 0:
+    # Requests never reload the snapshot themselves; the last good snapshot is served until a refresh succeeds
+    snapshot_cache.ttl = float("inf")
@@ -1,18 +1,48 @@
 import os
 from pathlib import Path
-import requests
 from flask import Flask, jsonify
 from flask_restful import Api
 import logging
 from src.app.routes.purchases import purchases_blueprint
-from src.app.data.database.configuration import sa
+from src.app.data.database.configuration import sa, configure_sqlite, create_sqlite_schema, sqlite_url
+from src.app.data.http_client import http_session
 from dotenv import load_dotenv
 from src.app.routes.purchases import DataResource
+from src.app.routes.caching import response_cache
+from src.app.routes.metrics import metrics_blueprint
+from src.app.metrics import metrics_enabled
+from src.app.configuration import purchase_service, snapshot_refresher
 
 logging.basicConfig(level=logging.INFO)
 app = Flask(__name__)
 
 
+def configure_database(flask_app: Flask) -> None:
+    """
+    Configures SQLAlchemy with the database URI published at SQLALCHEMY_DATABASE_URL and initializes it
+    with the Flask application.
+
+    For the "sqlite" source, the local database file at SQLITE_PATH is used instead. Its connections are switched
+    to WAL mode, and the missing tables and indexes are created.
+
+    :param flask_app: The Flask application.
+    :raises requests.HTTPError: If the database URI cannot be fetched.
+    """
+    if os.getenv('SOURCE') == 'sqlite':
+        flask_app.config['SQLALCHEMY_DATABASE_URI'] = sqlite_url(os.getenv('SQLITE_PATH'))
+    else:
+        database_url_response = http_session.get(os.getenv('SQLALCHEMY_DATABASE_URL'), timeout=30)
+        database_url_response.raise_for_status()
+        flask_app.config['SQLALCHEMY_DATABASE_URI'] = database_url_response.text.strip()
+    flask_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    sa.init_app(flask_app)
+
+    if os.getenv('SOURCE') == 'sqlite':
+        with flask_app.app_context():
+            configure_sqlite(sa.engine)
+            create_sqlite_schema(sa.engine)
+
+
 def main() -> Flask:
     """
     Main function to set up and run the Flask application.
@@ -21,8 +51,9 @@ def main() -> Flask:
     - Loads environment variables from a .env file.
     - Configures the SQLAlchemy database URI using an environment variable.
     - Initializes SQLAlchemy with the Flask application.
+    - Starts the background snapshot refresher when REFRESH_INTERVAL is set.
     - Defines error handling for the application.
-    - Registers routes and blueprints.
+    - Registers routes and blueprints, and the /metrics route with request instrumentation when METRICS_ENABLED is set.
     - Returns the configured Flask application instance.
     """
     with app.app_context():
@@ -32,9 +63,11 @@ def main() -> Flask:
         load_dotenv(ENV_PATH)
 
         # Configure SQLAlchemy with the database URI
-        app.config['SQLALCHEMY_DATABASE_URI'] = requests.get(os.getenv('SQLALCHEMY_DATABASE_URL')).text.strip()
-        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-        sa.init_app(app)
+        configure_database(app)
+
+        # Reload the purchase snapshot in the background instead of on the request path
+        if snapshot_refresher.interval > 0:
+            snapshot_refresher.start(context=app.app_context)
 
         # Define error handler for the application
         @app.errorhandler(Exception)
@@ -88,6 +121,32 @@ def main() -> Flask:
                 'version': 1.0
             })
 
+        # Define a route to report purchase snapshot cache counters
+        @app.route('/cache')
+        def cache_stats():
+            """
+            Route to get the purchase snapshot cache statistics.
+
+            :return: A JSON response containing cache hits, misses, snapshot version and age,
+            together with the data loading counters of the repository and the response cache counters.
+            """
+            return jsonify({
+                **purchase_service.snapshot_cache.stats(),
+                'repository': purchase_service.customer_product_repository.stats(),
+                'responses': response_cache.stats()
+            })
+
+        # Define a route to report the state of the background snapshot refresher
+        @app.route('/status')
+        def refresher_status():
+            """
+            Route to get the state of the background snapshot refresher.
+
+            :return: A JSON response containing the snapshot version and age, the refresh counters
+            and the time until the next refresh.
+            """
+            return jsonify(snapshot_refresher.status())
+
         # Initialize Flask-RESTful API and add resources
         api = Api(app)
         api.add_resource(DataResource, '/data')
@@ -95,4 +154,8 @@ def main() -> Flask:
         # Register the purchases blueprint
         app.register_blueprint(purchases_blueprint)
 
+        # Expose Prometheus metrics; while disabled the requests are not instrumented at all
+        if metrics_enabled:
+            app.register_blueprint(metrics_blueprint)
+
         return app
\ No newline at end of file
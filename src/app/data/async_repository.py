@@ -0,0 +1,266 @@
+import asyncio
+from abc import ABC, abstractmethod
+from collections import defaultdict
+import httpx
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+from src.app.model import Purchase
+from src.app.data.parsing import CSVRecordParser, JSONArrayParser
+from src.app.data.repository import CustomerProductRepositoryCSV, CustomerProductRepositoryJSON
+from src.app.data.database.repository import CrudRepository, CustomerProductRepositorySQL
+
+# Async drivers replacing the blocking DBAPI drivers of a synchronous database URL
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+
+class AsyncRepository(ABC):
+    """
+    Base class for repositories loading purchases without blocking the event loop.
+    """
+
+    @abstractmethod
+    async def get_purchases(self) -> Purchase:
+        """
+        Retrieves a single Purchase object representing all purchases.
+
+        :return: A Purchase object with customer and product data.
+        """
+        pass
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the data loading counters of the repository.
+
+        :return: A dictionary of counters, empty if the repository does not track any.
+        """
+        return {}
+
+    async def aclose(self) -> None:
+        """
+        Releases the connections held by the repository.
+        """
+        pass
+
+
+class ThreadedRepository(AsyncRepository):
+    """
+    Adapter running a synchronous repository in a worker thread, for sources without an async client,
+    such as local files and snapshot files.
+    """
+
+    def __init__(self, repository: CrudRepository) -> None:
+        """
+        Initializes the adapter with the repository it delegates to.
+
+        :param repository: The synchronous repository.
+        """
+        self.repository = repository
+
+    async def get_purchases(self) -> Purchase:
+        """
+        Retrieves all purchases from the synchronous repository in a worker thread.
+
+        :return: A Purchase object with customer and product data.
+        """
+        return await asyncio.to_thread(self.repository.get_purchases)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the data loading counters of the synchronous repository.
+
+        :return: A dictionary of counters.
+        """
+        return self.repository.stats()
+
+
+class AsyncSourceFileRepository(AsyncRepository):
+    """
+    Base class for repositories streaming customer and product data from a file published at a URL.
+
+    Like `SourceFileRepository`, the last response's ETag and Last-Modified validators are sent back with the next
+    request, and the previously parsed purchases are reused when the server answers 304 Not Modified.
+    """
+
+    def __init__(self, path: str, client: httpx.AsyncClient) -> None:
+        """
+        Initializes the repository with the URL to the file.
+
+        :param path: The URL of the file containing customer and product data.
+        :param client: The HTTP client used to download the file; its timeouts and connection limits apply.
+        """
+        self.path = path
+        self.client = client
+        self.downloads = 0
+        self.not_modified = 0
+        self._etag = None
+        self._last_modified = None
+        self._purchase = None
+
+    async def get_purchases(self) -> Purchase:
+        """
+        Retrieves all purchases from the file, reusing the previously parsed purchases if the file has not changed.
+
+        :return: A Purchase object with customer and product data.
+        :raises httpx.HTTPStatusError: If the server answers with an error status.
+        """
+        async with self.client.stream('GET', self.path, headers=self._conditional_headers()) as response:
+            if response.status_code == 304 and self._purchase is not None:
+                self.not_modified += 1
+                return self._purchase
+
+            response.raise_for_status()
+            purchase = await self._parse(response)
+            self.downloads += 1
+            self._etag = response.headers.get('ETag')
+            self._last_modified = response.headers.get('Last-Modified')
+            self._purchase = purchase if self._etag or self._last_modified else None
+            return purchase
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the number of full downloads and of requests answered with 304 Not Modified.
+
+        :return: A dictionary with the download counters.
+        """
+        return {'downloads': self.downloads, 'not_modified': self.not_modified}
+
+    async def aclose(self) -> None:
+        """
+        Closes the connections of the HTTP client.
+        """
+        await self.client.aclose()
+
+    def _conditional_headers(self) -> dict[str, str]:
+        """
+        Builds the conditional request headers from the validators of the last downloaded file.
+
+        :return: A dictionary with If-None-Match and/or If-Modified-Since headers, empty if nothing is cached.
+        """
+        if self._purchase is None:
+            return {}
+
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+        return headers
+
+    @abstractmethod
+    async def _parse(self, response: httpx.Response) -> Purchase:
+        """
+        Parses the body of a streamed response into a Purchase object.
+
+        :param response: The HTTP response containing the file.
+        :return: A Purchase object with customer and product data.
+        """
+        pass
+
+
+class AsyncCustomerProductRepositoryCSV(AsyncSourceFileRepository):
+    """
+    Async repository for customer and product data stored in a CSV file.
+    """
+
+    async def _parse(self, response: httpx.Response) -> Purchase:
+        """
+        Parses a CSV file row by row while it is downloaded.
+
+        :param response: The HTTP response containing the CSV file.
+        :return: A Purchase object with customer and product data.
+        """
+        customers = {}
+        products = {}
+        purchases = {}
+        parser = CSVRecordParser()
+
+        async for chunk in response.aiter_text():
+            for row in parser.feed(chunk):
+                CustomerProductRepositoryCSV.add_row(customers, products, purchases, row)
+        for row in parser.close():
+            CustomerProductRepositoryCSV.add_row(customers, products, purchases, row)
+
+        return Purchase(customers_and_their_products=purchases)
+
+
+class AsyncCustomerProductRepositoryJSON(AsyncSourceFileRepository):
+    """
+    Async repository for customer and product data stored in a JSON file.
+    """
+
+    async def _parse(self, response: httpx.Response) -> Purchase:
+        """
+        Parses a JSON file entry by entry while it is downloaded.
+
+        :param response: The HTTP response containing the JSON file.
+        :return: A Purchase object with customer and product data.
+        """
+        customers = {}
+        products = {}
+        purchases = {}
+        parser = JSONArrayParser()
+
+        async for chunk in response.aiter_text():
+            for entry in parser.feed(chunk):
+                CustomerProductRepositoryJSON.add_entry(customers, products, purchases, entry)
+        for entry in parser.close():
+            CustomerProductRepositoryJSON.add_entry(customers, products, purchases, entry)
+
+        return Purchase(customers_and_their_products=purchases)
+
+
+class AsyncCustomerProductRepositorySQL(AsyncRepository):
+    """
+    Async repository reading customers and their purchased products from the database
+    through SQLAlchemy's asyncio extension.
+    """
+
+    def __init__(self, engine: AsyncEngine, batch_size: int = 1000) -> None:
+        """
+        Initializes the repository with an async engine.
+
+        :param engine: The async engine connected to the database.
+        :param batch_size: The number of rows fetched from the database at a time.
+        """
+        self.engine = engine
+        self.batch_size = batch_size
+
+    async def get_purchases(self) -> Purchase:
+        """
+        Retrieves all customers and their purchased products with a single streamed query.
+
+        :return: A Purchase object where each customer is mapped to the list of products they bought.
+        """
+        statement = CustomerProductRepositorySQL.purchases_statement().execution_options(yield_per=self.batch_size)
+
+        customers = {}
+        products = {}
+        purchases = defaultdict(list)
+        async with self.engine.connect() as connection:
+            async for row in await connection.stream(statement):
+                CustomerProductRepositorySQL.add_purchase_row(customers, products, purchases, row)
+
+        return Purchase(dict(purchases))
+
+    async def aclose(self) -> None:
+        """
+        Closes the connections of the engine's pool.
+        """
+        await self.engine.dispose()
+
+
+def to_async_url(url: str) -> str:
+    """
+    Replaces the driver of a database URL with its async counterpart, e.g. mysql+pymysql with mysql+aiomysql.
+
+    :param url: The database URL used by the synchronous application.
+    :return: The database URL for SQLAlchemy's asyncio extension.
+    :raises ValueError: If no async driver is known for the database.
+    """
+    url = make_url(url)
+    if url.get_backend_name() not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver available for {url.get_backend_name()}')
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(hide_password=False)
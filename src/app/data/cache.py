@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+
+@dataclass
+class SnapshotCache[T]:
+    """
+    Versioned cache holding a single snapshot of data loaded from a repository.
+
+    The snapshot is reused until it is older than `ttl` seconds or until it is explicitly invalidated.
+    Every load of a different snapshot increments `version`, so callers can tell two snapshots apart without comparing
+    their contents. A load returning the snapshot which is already cached, e.g. after a 304 Not Modified response,
+    only resets its age and keeps its version and derived values.
+    A `ttl` of zero or less disables caching and loads the data on every call.
+    """
+    ttl: float = 60.0
+    hits: int = 0
+    misses: int = 0
+    version: int = 0
+    _value: T | None = field(default=None, repr=False)
+    _loaded_at: float | None = field(default=None, repr=False)
+    _derived: dict[str, object] = field(default_factory=dict, repr=False)
+    _lock: threading.RLock = field(default_factory=threading.RLock, repr=False)
+    _async_lock: asyncio.Lock | None = field(default=None, repr=False)
+
+    def get(self, loader: Callable[[], T]) -> T:
+        """
+        Returns the cached snapshot, loading a new one first if the current one is missing or stale.
+
+        The lock is held while loading, so concurrent callers wait for a single load instead of
+        all hitting the repository at once.
+
+        :param loader: A callable returning a fresh snapshot from the data source.
+        :return: The current snapshot.
+        """
+        with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self._value
+
+            self.misses += 1
+            self.prime(loader())
+            return self._value
+
+    async def get_async(self, loader: Callable[[], Awaitable[T]]) -> T:
+        """
+        Returns the cached snapshot, awaiting a new one first if the current one is missing or stale.
+
+        Concurrent coroutines wait for a single load instead of all hitting the repository at once,
+        and the event loop keeps serving other requests in the meantime.
+
+        The thread lock may be held by a worker thread deriving values from the snapshot, so the event loop
+        never waits for it: a fresh snapshot is returned without it, and a new one is swapped in from a thread.
+
+        :param loader: A coroutine function returning a fresh snapshot from the data source.
+        :return: The current snapshot.
+        """
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+
+        async with self._async_lock:
+            value = self._value
+            if self._is_fresh():
+                self.hits += 1
+                return value
+
+            value = await loader()
+            self.misses += 1
+            await asyncio.to_thread(self.prime, value)
+            return value
+
+    def get_derived[D](self, name: str, loader: Callable[[], T], builder: Callable[[T], D]) -> D:
+        """
+        Returns a value derived from the current snapshot, building it at most once per snapshot version.
+
+        :param name: The name under which the derived value is stored.
+        :param loader: A callable returning a fresh snapshot from the data source.
+        :param builder: A callable computing the derived value from a snapshot.
+        :return: The derived value for the current snapshot.
+        """
+        with self._lock:
+            snapshot = self.get(loader)
+            if name not in self._derived:
+                self._derived[name] = builder(snapshot)
+            return self._derived[name]
+
+    def prime(self, value: T, derived: dict[str, object] | None = None) -> None:
+        """
+        Replaces the cached snapshot with a value loaded elsewhere, e.g. when warm-starting from a local file
+        or when refreshing in the background.
+        The snapshot and its derived values are swapped in together, so readers never see a mix of both versions.
+        Priming with the snapshot which is already cached only resets its age, keeping its version and derived values.
+
+        :param value: The new snapshot.
+        :param derived: Values already derived from the new snapshot, by name.
+        """
+        with self._lock:
+            self._loaded_at = time.monotonic()
+            if value is self._value:
+                return
+            self._value = value
+            self._derived = dict(derived or {})
+            self.version += 1
+
+    def update(self, updater: Callable[[T, dict[str, object]], tuple[T, dict[str, object]] | None]) -> bool:
+        """
+        Replaces the cached snapshot and its derived values with ones updated from them, e.g. to apply a write
+        to the data source without reloading it.
+        The updated snapshot gets a new version, but keeps the age of the snapshot it was updated from.
+
+        :param updater: A callable taking the snapshot and its derived values and returning the updated ones,
+        or None if they cannot be updated.
+        :return: True if the snapshot has been updated, False if no fresh snapshot is cached
+        or the updater returned None.
+        """
+        with self._lock:
+            if not self._is_fresh():
+                return False
+            updated = updater(self._value, self._derived)
+            if updated is None:
+                return False
+            self._value, self._derived = updated[0], dict(updated[1])
+            self.version += 1
+            return True
+
+    def peek(self) -> T | None:
+        """
+        Returns the cached snapshot without loading it, even if it is stale.
+
+        :return: The cached snapshot, or None if nothing has been loaded yet.
+        """
+        return self._value
+
+    def invalidate(self) -> None:
+        """
+        Marks the current snapshot as stale, so the next call to `get` reloads it.
+        """
+        with self._lock:
+            self._loaded_at = None
+
+    def age(self) -> float | None:
+        """
+        Returns the number of seconds since the current snapshot was loaded.
+
+        :return: The snapshot age in seconds, or None if nothing has been loaded yet.
+        """
+        return None if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+    def stats(self) -> dict[str, int | float | None]:
+        """
+        Returns the cache counters.
+
+        :return: A dictionary with hit and miss counts, the snapshot version and its age in seconds.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'version': self.version,
+            'age': self.age()
+        }
+
+    def _is_fresh(self) -> bool:
+        """
+        Checks whether the cached snapshot can still be served.
+
+        :return: True if a snapshot is loaded, caching is enabled and the TTL has not expired.
+        """
+        return self.ttl > 0 and self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
@@ -1,5 +1,12 @@
+import os
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Connection, Engine, event
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+# Applied to every connection of the embedded SQLite source: write-ahead logging lets readers run concurrently
+# with a writer, and NORMAL synchronization is durable in WAL mode without an fsync on every commit
+SQLITE_PRAGMAS = ('PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL', 'PRAGMA foreign_keys=ON')
 
 
 class Base(DeclarativeBase):
@@ -11,5 +18,59 @@ class Base(DeclarativeBase):
     pass
 
 
+def sqlite_url(path: str) -> str:
+    """
+    Builds the database URL of a local SQLite file.
+
+    :param path: The path of the database file, relative to the working directory or absolute.
+    :return: The SQLAlchemy database URL.
+    """
+    return f'sqlite:///{os.path.abspath(path)}'
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    Configures a new SQLite connection with SQLITE_PRAGMAS. Registered as a `connect` event listener.
+
+    :param dbapi_connection: The DBAPI connection.
+    :param connection_record: The pool record of the connection, which is not used.
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def configure_sqlite(engine: Engine) -> None:
+    """
+    Applies SQLITE_PRAGMAS to every connection the engine opens from now on.
+
+    :param engine: The engine of the SQLite database.
+    """
+    if not event.contains(engine, 'connect', set_sqlite_pragmas):
+        event.listen(engine, 'connect', set_sqlite_pragmas)
+
+
+def create_sqlite_schema(bind: Engine | Connection) -> None:
+    """
+    Creates the missing tables of the models and their indexes, including indexes added to the models
+    after the tables have been created.
+
+    Every statement uses IF NOT EXISTS rather than checking for the table or index first, so the workers
+    of a server may all create the schema of the same file when they start.
+
+    :param bind: The engine or connection of the SQLite database.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            create_sqlite_schema(connection)
+        return
+
+    for table in sa.Model.metadata.sorted_tables:
+        bind.execute(CreateTable(table, if_not_exists=True))
+        for index in table.indexes:
+            bind.execute(CreateIndex(index, if_not_exists=True))
+
+
 # Initialize SQLAlchemy with the custom base class
 sa = SQLAlchemy(model_class=Base)
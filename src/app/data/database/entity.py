@@ -23,7 +23,8 @@ class CustomerProductEntity(sa.Model):
     __tablename__ = 'customer_product'
 
     customer_id: Mapped[int] = mapped_column(Integer, ForeignKey('customers.id'), primary_key=True)
-    product_id: Mapped[int] = mapped_column(Integer, ForeignKey('products.id'), primary_key=True)
+    # The primary key serves lookups by customer, this index the joins and deletes by product
+    product_id: Mapped[int] = mapped_column(Integer, ForeignKey('products.id'), primary_key=True, index=True)
 
     def __str__(self):
         """
@@ -87,7 +88,7 @@ class ProductEntity(sa.Model):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(length=255))
-    category: Mapped[str] = mapped_column(String(length=255))
+    category: Mapped[str] = mapped_column(String(length=255), index=True)
     price: Mapped[Decimal] = mapped_column(Numeric(10, 2))
 
     buyers = relationship('CustomerEntity', secondary='customer_product', back_populates='purchases')
@@ -1,6 +1,14 @@
+import sys
+import types
+import weakref
 from abc import ABC, abstractmethod
 from collections import defaultdict
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Column, Row, Select, Table, delete, select, func, inspect, tuple_
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import LoaderCallableStatus
 from src.app.data.database.configuration import sa
 from src.app.data.database.entity import (
     ProductEntity,
@@ -9,10 +17,15 @@ from src.app.data.database.entity import (
 )
 import logging
 
-from src.app.model import Customer, Product, Purchase
+from src.app.model import Customer, Product, Purchase, PurchaseChange
+from src.app.utils import MaxMin
 
 logging.basicConfig(level=logging.INFO)
 
+CUSTOMER_COLUMNS = (CustomerEntity.id, CustomerEntity.first_name, CustomerEntity.last_name, CustomerEntity.age,
+                    CustomerEntity.cash)
+PRODUCT_COLUMNS = (ProductEntity.id, ProductEntity.name, ProductEntity.category, ProductEntity.price)
+
 
 class CrudRepository[T](ABC):
     """
@@ -59,18 +72,31 @@ class CrudRepository[T](ABC):
         pass
 
     @abstractmethod
-    def delete_by_id(self, entity_id: int) -> None:
+    def delete_by_id(self, entity_id: int) -> int:
         """
         Deletes an entity from the data store by its ID.
 
         :param entity_id: The ID of the entity to be deleted.
+        :return: The number of deleted entities.
         """
         pass
 
     @abstractmethod
-    def delete_all(self) -> None:
+    def delete_many(self, entity_ids: Iterable[int]) -> int:
+        """
+        Deletes multiple entities from the data store by their IDs.
+
+        :param entity_ids: The IDs of the entities to be deleted.
+        :return: The number of deleted entities.
+        """
+        pass
+
+    @abstractmethod
+    def delete_all(self) -> int:
         """
         Deletes all entities of this type from the data store.
+
+        :return: The number of deleted entities.
         """
         pass
 
@@ -83,6 +109,25 @@ class CrudRepository[T](ABC):
         """
         pass
 
+    def add_change_listener(self, listener: Callable[[list[PurchaseChange] | None], None]) -> None:
+        """
+        Registers a callback invoked after data in the store has been modified.
+        Read-only data stores never modify their data, so by default the listener is ignored.
+
+        :param listener: A callable taking the purchases added or removed by the modification,
+        or None if they cannot be described, e.g. after all entities have been deleted.
+        """
+        pass
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns counters describing how the repository has loaded its data.
+        Repositories without such counters return an empty dictionary.
+
+        :return: A dictionary mapping counter names to their values.
+        """
+        return {}
+
 
 class CrudRepositoryORM[T: sa.Model](CrudRepository[T]):
     """
@@ -91,13 +136,19 @@ class CrudRepositoryORM[T: sa.Model](CrudRepository[T]):
     entities in a relational database using SQLAlchemy.
     """
 
-    def __init__(self, db: SQLAlchemy) -> None:
+    # Shared by all ORM repositories, since they all write to the same database. Each listener is held by a callable
+    # returning it, or None once an object whose method is registered has been garbage collected.
+    _change_listeners: list[Callable[[], Callable[[list[PurchaseChange] | None], None] | None]] = []
+
+    def __init__(self, db: SQLAlchemy, batch_size: int = 1000) -> None:
         """
         Initializes the repository with a SQLAlchemy database connection.
 
         :param db: The SQLAlchemy instance to be used for database operations.
+        :param batch_size: The maximum number of rows read or deleted by a single statement.
         """
         self.sa = db
+        self.batch_size = batch_size
         # Determines the entity type by inspecting the generic type parameter (T).
         self.entity_type = self.__class__.__orig_bases__[0].__args__[0]
 
@@ -107,8 +158,12 @@ class CrudRepositoryORM[T: sa.Model](CrudRepository[T]):
 
         :param entity: The entity to be saved or updated.
         """
+        inserted = inspect(entity).transient
         self.sa.session.add(entity)
+        self.sa.session.flush()
+        changes = self._describe_inserts([entity]) if inserted else None
         self.sa.session.commit()
+        self._notify_change(changes)
 
     def save_or_update_many(self, entities: list[T]) -> None:
         """
@@ -116,8 +171,12 @@ class CrudRepositoryORM[T: sa.Model](CrudRepository[T]):
 
         :param entities: A list of entities to be saved or updated.
         """
+        inserted = all(inspect(entity).transient for entity in entities)
         self.sa.session.add_all(entities)
+        self.sa.session.flush()
+        changes = self._describe_inserts(entities) if inserted else None
         self.sa.session.commit()
+        self._notify_change(changes)
 
     def find_by_id(self, entity_id: int) -> T | None:
         """
@@ -126,7 +185,7 @@ class CrudRepositoryORM[T: sa.Model](CrudRepository[T]):
         :param entity_id: The ID of the entity to be found.
         :return: The entity if found, otherwise None.
         """
-        return self.sa.session.query(self.entity_type).get(entity_id)
+        return self.sa.session.get(self.entity_type, entity_id)
 
     def find_all(self) -> list[T]:
         """
@@ -136,25 +195,163 @@ class CrudRepositoryORM[T: sa.Model](CrudRepository[T]):
         """
         return sa.session.query(self.entity_type).all()
 
-    def delete_by_id(self, entity_id: int) -> None:
+    def delete_by_id(self, entity_id: int) -> int:
         """
-        Deletes an entity by its ID.
+        Deletes an entity by its ID, without loading it first.
 
         :param entity_id: The ID of the entity to be deleted.
+        :return: The number of deleted entities, 0 if no entity has the ID.
+        """
+        return self.delete_many([entity_id])
+
+    def delete_many(self, entity_ids: Iterable[int]) -> int:
+        """
+        Deletes entities by their IDs with DELETE ... WHERE id IN statements of at most `batch_size` IDs,
+        within a single transaction. The associations of the entities with other entities are deleted with them.
+
+        :param entity_ids: The IDs of the entities to be deleted, tuples of IDs for composite primary keys.
+        :return: The number of deleted entities.
         """
-        entity = self.find_by_id(entity_id)
-        if entity:
-            self.sa.session.delete(entity)
+        ids = list(dict.fromkeys(entity_ids))
+        if not ids:
+            return 0
+
+        changes = self._describe_deletes(ids)
+        deleted = 0
+        try:
+            for start in range(0, len(ids), self.batch_size):
+                deleted += self._delete_chunk(ids[start:start + self.batch_size])
             self.sa.session.commit()
+        except Exception:
+            self.sa.session.rollback()
+            raise
+
+        if deleted:
+            self._notify_change(changes if changes is not None and len(changes) == deleted else None)
+        return deleted
+
+    def delete_all(self, batch_size: int | None = None) -> int:
+        """
+        Deletes all entities from the database for this type, together with their associations with other entities.
+
+        By default, a single DELETE statement removes every row in one transaction. With a batch size, rows are
+        deleted and committed `batch_size` at a time instead, so locks are only held briefly, but a failure leaves
+        the rows of the batches already committed deleted.
+
+        :param batch_size: The number of rows deleted per transaction, or None to delete them all at once.
+        :return: The number of deleted entities.
+        """
+        table = self.entity_type.__table__
+        deleted = 0
+        try:
+            if batch_size is None:
+                for secondary, _ in self._association_keys():
+                    self.sa.session.execute(delete(secondary))
+                deleted = self.sa.session.execute(delete(table)).rowcount
+            else:
+                columns = list(table.primary_key.columns)
+                statement = select(*columns).limit(batch_size)
+                while rows := self.sa.session.execute(statement).all():
+                    deleted += self._delete_chunk([row[0] if len(columns) == 1 else tuple(row) for row in rows])
+                    self.sa.session.commit()
+            self.sa.session.commit()
+        except Exception:
+            self.sa.session.rollback()
+            raise
+        finally:
+            if deleted:
+                self._notify_change(None)
+        return deleted
 
-    def delete_all(self) -> None:
+    def add_change_listener(self, listener: Callable[[list[PurchaseChange] | None], None]) -> None:
         """
-        Deletes all entities from the database for this type.
+        Registers a callback invoked after every committed write made through any ORM repository.
+        Bound methods are held by weak references and unregistered when their object is garbage collected,
+        so e.g. a discarded service does not keep receiving the changes.
 
-        :return: None
+        :param listener: A callable taking the purchases added or removed by the write,
+        or None if they cannot be described.
         """
-        self.sa.session.query(self.entity_type).delete()
-        self.sa.session.commit()
+        listeners = self._change_listeners
+        if isinstance(listener, types.MethodType):
+            listeners.append(weakref.WeakMethod(listener, listeners.remove))
+        else:
+            listeners.append(lambda: listener)
+
+    def _notify_change(self, changes: list[PurchaseChange] | None) -> None:
+        """
+        Invokes all registered change listeners.
+
+        :param changes: The purchases added or removed by the write, or None if they cannot be described.
+        """
+        for reference in tuple(self._change_listeners):
+            listener = reference()
+            if listener is not None:
+                listener(changes)
+
+    def _delete_chunk(self, ids: list) -> int:
+        """
+        Deletes entities and their associations with other entities by their IDs, without committing.
+
+        :param ids: The IDs of the entities.
+        :return: The number of deleted entities.
+        """
+        for secondary, key in self._association_keys():
+            self.sa.session.execute(delete(secondary).where(key.in_(ids)))
+        table = self.entity_type.__table__
+        return self.sa.session.execute(delete(table).where(self._primary_key().in_(ids))).rowcount
+
+    def _primary_key(self):
+        """
+        Returns the primary key of the entity table as a column expression, which is a tuple for composite keys.
+
+        :return: The primary key column, or a tuple of the primary key columns.
+        """
+        columns = list(self.entity_type.__table__.primary_key.columns)
+        return columns[0] if len(columns) == 1 else tuple_(*columns)
+
+    def _association_keys(self) -> list[tuple[Table, Column]]:
+        """
+        Finds the association tables of the many-to-many relationships of the entity, which a bulk DELETE
+        does not clean up the way the ORM does when deleting a loaded entity.
+
+        :return: The association tables, each with its column referencing the entity.
+        """
+        return [(relationship.secondary, secondary_column)
+                for relationship in inspect(self.entity_type).relationships if relationship.secondary is not None
+                for _, secondary_column in relationship.synchronize_pairs]
+
+    def _describe_inserts(self, entities: list[T]) -> list[PurchaseChange] | None:
+        """
+        Describes how inserting new entities changed the purchases, after the entities have been flushed.
+        By default the change cannot be described, so listeners reload all purchases.
+
+        :param entities: The inserted entities.
+        :return: The purchases added by the entities, or None if they cannot be described.
+        """
+        return None
+
+    def _describe_deletes(self, entity_ids: list) -> list[PurchaseChange] | None:
+        """
+        Describes how deleting entities changes the purchases, before the entities are deleted.
+        By default the change cannot be described, so listeners reload all purchases.
+
+        :param entity_ids: The IDs of the entities about to be deleted.
+        :return: The purchases removed with the entities, or None if they cannot be described.
+        """
+        return None
+
+    @staticmethod
+    def _has_related(entity: T, relationship: str) -> bool:
+        """
+        Checks whether related entities have been assigned to a new entity, without loading the relationship.
+
+        :param entity: The new entity.
+        :param relationship: The name of the relationship attribute.
+        :return: True if the relationship has been assigned any entities.
+        """
+        value = inspect(entity).attrs[relationship].loaded_value
+        return value is not LoaderCallableStatus.NO_VALUE and bool(value)
 
     def get_purchases(self) -> Purchase:
         """
@@ -196,6 +393,16 @@ class ProductRepositorySQL(CrudRepositoryORM[ProductEntity]):
             for product in products
         }
 
+    def _describe_inserts(self, entities: list[ProductEntity]) -> list[PurchaseChange] | None:
+        """
+        Describes how inserting new products changed the purchases. Products which nobody has purchased yet
+        do not change them.
+
+        :param entities: The inserted products.
+        :return: An empty list, or None if a product has been inserted together with its buyers.
+        """
+        return None if any(self._has_related(entity, 'buyers') for entity in entities) else []
+
 
 class CustomerRepositorySQL(CrudRepositoryORM[CustomerEntity]):
     """
@@ -228,13 +435,24 @@ class CustomerRepositorySQL(CrudRepositoryORM[CustomerEntity]):
             for customer in customers
         }
 
+    def _describe_inserts(self, entities: list[CustomerEntity]) -> list[PurchaseChange] | None:
+        """
+        Describes how inserting new customers changed the purchases. Customers who have not purchased anything yet
+        do not change them.
+
+        :param entities: The inserted customers.
+        :return: An empty list, or None if a customer has been inserted together with their purchases.
+        """
+        return None if any(self._has_related(entity, 'purchases') for entity in entities) else []
+
 
 class CustomerProductRepositorySQL(CrudRepositoryORM[CustomerProductEntity]):
     """
     A repository for handling the relationship between customers and products using SQLAlchemy ORM.
     """
 
-    def __init__(self, db: SQLAlchemy, product_repository: ProductRepositorySQL, customer_repository: CustomerRepositorySQL):
+    def __init__(self, db: SQLAlchemy, product_repository: ProductRepositorySQL, customer_repository: CustomerRepositorySQL,
+                 batch_size: int = 1000):
         """
         Initializes the customer-product repository with the provided SQLAlchemy database instance,
         product repository, and customer repository.
@@ -242,8 +460,10 @@ class CustomerProductRepositorySQL(CrudRepositoryORM[CustomerProductEntity]):
         :param db: The SQLAlchemy database instance.
         :param product_repository: A repository for fetching product information.
         :param customer_repository: A repository for fetching customer information.
+        :param batch_size: The number of rows fetched from the database cursor at a time when streaming purchases,
+        and the maximum number of associations read or deleted by a single statement.
         """
-        super().__init__(db)
+        super().__init__(db, batch_size)
         self.product_repository = product_repository
         self.customer_repository = customer_repository
 
@@ -251,21 +471,433 @@ class CustomerProductRepositorySQL(CrudRepositoryORM[CustomerProductEntity]):
         """
         Retrieves all purchases by customers, mapping each customer to the products they purchased.
 
+        The purchases are loaded with a single SELECT joining customers, products and their association.
+        Rows are streamed from the cursor in batches as plain tuples, without building ORM entities,
+        and every customer and product is converted to its model object only once.
+
         :return: A Purchase object containing customers and their associated products.
         """
-        customers = self.customer_repository.get_customers()
-        products = self.product_repository.get_products()
+        return self._load_purchases(self.purchases_statement())
+
+    def iter_purchases(self) -> Iterator[tuple[Customer, list[Product]]]:
+        """
+        Iterates over all customers with purchases and the products they purchased, in the order of their ids.
+
+        Rows are streamed from the cursor and every customer is yielded as soon as their last row has been read,
+        so only one customer's purchases are held in memory at a time.
 
-        all_purchases = self.find_all()
+        :return: An iterator over tuples of a customer and the products they purchased.
+        """
+        customers = {}
+        products = {}
+        purchases = defaultdict(list)
+        statement = self.purchases_statement().execution_options(yield_per=self.batch_size)
+        for row in self.sa.session.execute(statement):
+            if purchases and row[0] not in customers:
+                yield from purchases.items()
+                customers.clear()
+                purchases.clear()
+            self.add_purchase_row(customers, products, purchases, row)
+
+        yield from purchases.items()
+
+    def upsert_purchases(self, batches: Iterable[Purchase], chunk_size: int = 1000) -> dict[str, int]:
+        """
+        Writes the customers, products and purchases of the given batches in a single transaction,
+        updating the customers and products which already exist.
+
+        The rows are written through SQLAlchemy Core with multi-row INSERT ... ON DUPLICATE KEY UPDATE statements
+        (INSERT ... ON CONFLICT on SQLite) of at most `chunk_size` rows, without creating ORM entities.
+        Purchases which already exist are left unchanged. The customers and products of a batch are written
+        before its purchases, so their foreign keys are satisfied. If any batch fails, nothing is written.
+
+        The counts are the rows affected as reported by the database. Customers and products repeated in several
+        batches are written, and counted, once per batch. SQLite counts every inserted or updated row once and
+        does not count existing purchases. MySQL counts an inserted row once and a row changed by ON DUPLICATE
+        KEY UPDATE twice. It counts an unchanged row once, including an existing purchase, because SQLAlchemy
+        connects with the CLIENT_FOUND_ROWS flag.
+
+        :param batches: An iterable of Purchase objects, e.g. parsed from an upload batch by batch.
+        :param chunk_size: The maximum number of rows per INSERT statement.
+        :return: The number of customer, product and purchase rows affected.
+        """
+        counts = {'customers': 0, 'products': 0, 'purchases': 0}
+        try:
+            for purchase in batches:
+                customers = {}
+                products = {}
+                purchases = {}
+                for customer, purchased in purchase.customers_and_their_products.items():
+                    customers[customer.id] = {'id': customer.id, 'first_name': customer.first_name,
+                                              'last_name': customer.last_name, 'age': customer.age,
+                                              'cash': customer.cash}
+                    for product in purchased:
+                        products[product.id] = {'id': product.id, 'name': product.name,
+                                                'category': product.category, 'price': product.price}
+                        purchases[customer.id, product.id] = {'customer_id': customer.id, 'product_id': product.id}
+
+                counts['customers'] += self._upsert(CustomerEntity, list(customers.values()), chunk_size)
+                counts['products'] += self._upsert(ProductEntity, list(products.values()), chunk_size)
+                counts['purchases'] += self._upsert(CustomerProductEntity, list(purchases.values()), chunk_size)
+            self.sa.session.commit()
+        except Exception:
+            self.sa.session.rollback()
+            raise
+
+        self._notify_change(None)
+        return counts
+
+    def _upsert(self, entity: type[sa.Model], rows: list[dict], chunk_size: int) -> int:
+        """
+        Writes rows to the table of an entity with multi-row upserts. Rows whose primary key already exists
+        update the other columns, or are skipped if the table has no other columns.
+
+        :param entity: The entity whose table is written.
+        :param rows: The rows, as dictionaries mapping column names to values.
+        :param chunk_size: The maximum number of rows per INSERT statement.
+        :return: The number of rows affected, as reported by the database.
+        :raises NotImplementedError: If the database does not support upserts.
+        """
+        table = entity.__table__
+        dialect = self.sa.session.get_bind().dialect.name
+        updated_columns = [column.name for column in table.columns if not column.primary_key]
+        affected = 0
+        for start in range(0, len(rows), chunk_size):
+            match dialect:
+                case 'mysql':
+                    statement = mysql.insert(table).values(rows[start:start + chunk_size])
+                    # Assigning a key column to itself leaves an existing row unchanged
+                    statement = statement.on_duplicate_key_update({
+                        name: statement.inserted[name] for name in updated_columns or table.primary_key.columns.keys()
+                    })
+                case 'sqlite':
+                    statement = sqlite.insert(table).values(rows[start:start + chunk_size])
+                    statement = statement.on_conflict_do_update(
+                        index_elements=table.primary_key.columns,
+                        set_={name: statement.excluded[name] for name in updated_columns}
+                    ) if updated_columns else statement.on_conflict_do_nothing()
+                case _:
+                    raise NotImplementedError(f"Upserts are not supported by the {dialect} database")
+            affected += self.sa.session.execute(statement).rowcount
+        return affected
+
+    def _describe_inserts(self, entities: list[CustomerProductEntity]) -> list[PurchaseChange] | None:
+        """
+        Describes the purchases recorded by new associations.
+
+        :param entities: The inserted associations.
+        :return: The added purchases, or None if a customer or product cannot be read.
+        """
+        pairs = list(dict.fromkeys((entity.customer_id, entity.product_id) for entity in entities))
+        changes = self._purchase_changes(pairs, added=True)
+        return changes if len(changes) == len(pairs) else None
+
+    def _describe_deletes(self, entity_ids: list[tuple[int, int]]) -> list[PurchaseChange] | None:
+        """
+        Describes the purchases removed together with associations. Associations which do not exist are not
+        described, since deleting them changes nothing.
+
+        :param entity_ids: The (customer ID, product ID) keys of the associations about to be deleted.
+        :return: The removed purchases.
+        """
+        return self._purchase_changes(entity_ids, added=False)
+
+    def _purchase_changes(self, pairs: list[tuple[int, int]], added: bool) -> list[PurchaseChange]:
+        """
+        Reads the customers and products of associations with `purchases_statement`, `batch_size` associations
+        per query, and describes them as purchase changes.
+
+        :param pairs: The distinct (customer ID, product ID) keys of the associations.
+        :param added: Whether the purchases have been added or are being removed.
+        :return: A change per association found in the database.
+        """
+        key = tuple_(CustomerProductEntity.customer_id, CustomerProductEntity.product_id)
+        customers = {}
+        products = {}
         purchases = defaultdict(list)
-        for cp in all_purchases:
-            customer = customers.get(cp.customer_id)
-            product = products.get(cp.product_id)
-            if customer and product:
-                purchases[customer].append(product)
+        for start in range(0, len(pairs), self.batch_size):
+            statement = self.purchases_statement().where(key.in_(pairs[start:start + self.batch_size]))
+            for row in self.sa.session.execute(statement):
+                self.add_purchase_row(customers, products, purchases, row)
+
+        changes = [PurchaseChange(customer, product, added)
+                   for customer, purchased in purchases.items() for product in purchased]
+        return changes
+
+    def get_purchases_page(self, limit: int, after: int | None = None) -> tuple[Purchase, int | None]:
+        """
+        Retrieves the purchases of at most `limit` customers with an id greater than `after`, in the order of their ids.
+
+        The page is selected in the database with keyset pagination: the ids of the customers on the page are read
+        from the association table's index, then only their purchases are loaded, so the cost of a page
+        does not depend on how far into the table it is.
+
+        :param limit: The maximum number of customers on the page.
+        :param after: The id of the last customer on the previous page, or None for the first page.
+        :return: A tuple of the Purchase object with the page and the id of its last customer,
+        or None if no customers follow.
+        """
+        page_ids = (
+            select(CustomerProductEntity.customer_id)
+            .distinct()
+            .order_by(CustomerProductEntity.customer_id)
+            .limit(limit + 1)
+        )
+        if after is not None:
+            page_ids = page_ids.where(CustomerProductEntity.customer_id > after)
+        ids = self.sa.session.scalars(page_ids).all()
+
+        statement = self.purchases_statement().where(CustomerProductEntity.customer_id.in_(ids[:limit]))
+        return self._load_purchases(statement), ids[limit - 1] if len(ids) > limit else None
+
+    def get_totals_spent(self) -> dict[int, Decimal]:
+        """
+        Calculates the total amount spent by every customer with a single GROUP BY query.
+
+        :return: A dictionary where the key is a customer's id and the value is the total amount they spent.
+        Customers without purchases are not included.
+        """
+        statement = (
+            self._purchased_products(CustomerProductEntity.customer_id, func.sum(ProductEntity.price))
+            .group_by(CustomerProductEntity.customer_id)
+        )
+        return {customer_id: total for customer_id, total in self.sa.session.execute(statement)}
+
+    def get_customers_total_spent(self, customer_id: int) -> Decimal:
+        """
+        Calculates the total amount spent by a single customer in the database.
+
+        :param customer_id: The ID of the customer whose spending is to be calculated.
+        :return: The total amount spent by the customer. Returns 0 if the customer has no purchases.
+        """
+        statement = (
+            self._purchased_products(func.sum(ProductEntity.price))
+            .where(CustomerProductEntity.customer_id == customer_id)
+        )
+        total = self.sa.session.execute(statement).scalar()
+        return Decimal(0) if total is None else total
+
+    def get_top_spenders(self) -> list[Customer]:
+        """
+        Finds the customer(s) with the highest total spending, ranking the per-customer sums in the database.
+
+        :return: A list of customers who have spent the maximum amount, ordered by id.
+        """
+        ranking = (
+            self._purchased_products(
+                CustomerProductEntity.customer_id.label('customer_id'),
+                func.rank().over(order_by=func.sum(ProductEntity.price).desc()).label('spent_rank')
+            )
+            .group_by(CustomerProductEntity.customer_id)
+            .subquery()
+        )
+        statement = (
+            select(*CUSTOMER_COLUMNS)
+            .join(ranking, ranking.c.customer_id == CustomerEntity.id)
+            .where(ranking.c.spent_rank == 1)
+            .order_by(CustomerEntity.id)
+        )
+        return [self._to_customer(row) for row in self.sa.session.execute(statement)]
+
+    def get_most_spending_in_category(self, category: str) -> list[Customer]:
+        """
+        Finds the customer(s) who have spent the most in a specific category, ranking the sums in the database.
+
+        :param category: The category for which to determine the highest spending customer(s).
+        :return: A list of customers who have spent the most in the given category, ordered by id.
+        Returns an empty list if no spending is recorded in the category.
+        """
+        ranking = (
+            self._purchased_products(
+                CustomerProductEntity.customer_id.label('customer_id'),
+                func.sum(ProductEntity.price).label('spent'),
+                func.rank().over(order_by=func.sum(ProductEntity.price).desc()).label('spent_rank')
+            )
+            .where(ProductEntity.category == category)
+            .group_by(CustomerProductEntity.customer_id)
+            .subquery()
+        )
+        statement = (
+            select(*CUSTOMER_COLUMNS)
+            .join(ranking, ranking.c.customer_id == CustomerEntity.id)
+            .where(ranking.c.spent_rank == 1, ranking.c.spent != 0)
+            .order_by(CustomerEntity.id)
+        )
+        return [self._to_customer(row) for row in self.sa.session.execute(statement)]
+
+    def get_category_and_avg_price(self) -> dict[str, Decimal]:
+        """
+        Calculates the average price of purchased products in each category.
+        The database returns the exact sum and count of distinct products, and the division is done with Decimal
+        arithmetic, so the result matches the in-memory calculation regardless of the database's rounding rules.
+
+        :return: A dictionary where the key is the product category and the value is the average price.
+        """
+        products = self._purchased_products(*PRODUCT_COLUMNS).distinct().subquery()
+        statement = (
+            select(products.c.category, func.sum(products.c.price), func.count())
+            .group_by(products.c.category)
+        )
+        return {
+            category: total / Decimal(count)
+            for category, total, count in self.sa.session.execute(statement)
+        }
+
+    def get_most_and_least_expensive_in_category(self) -> dict[str, MaxMin]:
+        """
+        Identifies the most and least expensive purchased products in each category using window functions,
+        so only two rows per category are returned. Ties are resolved in favour of the lower product id.
+
+        :return: A dictionary where the key is the product category and the value is an instance of `MaxMin`.
+        """
+        products = self._purchased_products(*PRODUCT_COLUMNS).distinct().subquery()
+        ranked = select(
+            products,
+            func.row_number().over(partition_by=products.c.category,
+                                   order_by=(products.c.price.desc(), products.c.id)).label('max_rank'),
+            func.row_number().over(partition_by=products.c.category,
+                                   order_by=(products.c.price, products.c.id)).label('min_rank')
+        ).subquery()
+        statement = (
+            select(ranked.c.id, ranked.c.name, ranked.c.category, ranked.c.price,
+                   ranked.c.max_rank, ranked.c.min_rank)
+            .where((ranked.c.max_rank == 1) | (ranked.c.min_rank == 1))
+        )
+
+        result = {}
+        for row in self.sa.session.execute(statement):
+            product = self._to_product(row)
+            max_min = result.setdefault(product.category, MaxMin(max=None, min=None))
+            if row.max_rank == 1:
+                max_min.max = product
+            if row.min_rank == 1:
+                max_min.min = product
+        return result
+
+    def get_customers_debt(self, customer_id: int) -> Decimal:
+        """
+        Calculates the debt of a single customer in the database.
+
+        :param customer_id: The ID of the customer whose debt is to be calculated.
+        :return: The amount of debt the customer has. Returns -1 if the customer has no purchases.
+        Returns 0 if the customer's total spending is less than or equal to their cash.
+        """
+        statement = (
+            self._purchased_products(func.sum(ProductEntity.price), CustomerEntity.cash)
+            .where(CustomerEntity.id == customer_id)
+            .group_by(CustomerEntity.id, CustomerEntity.cash)
+        )
+        row = self.sa.session.execute(statement).first()
+        return Decimal(-1) if row is None else max(row[0] - row[1], Decimal(0))
+
+    def get_customers_with_debts(self) -> dict[int, Decimal]:
+        """
+        Finds the customers whose total spending exceeds their cash, filtering with HAVING in the database.
+
+        :return: A dictionary where the key is a customer's id and the value is the amount of debt they owe.
+        """
+        spent = func.sum(ProductEntity.price)
+        statement = (
+            self._purchased_products(CustomerEntity.id, spent - CustomerEntity.cash)
+            .group_by(CustomerEntity.id, CustomerEntity.cash)
+            .having(spent > CustomerEntity.cash)
+            .order_by(CustomerEntity.id)
+        )
+        return {customer_id: debt for customer_id, debt in self.sa.session.execute(statement)}
+
+    @classmethod
+    def purchases_statement(cls) -> Select:
+        """
+        Builds the SELECT returning one row per purchased item, with the customer's and the product's columns,
+        ordered by customer id.
+
+        :return: A Select statement whose rows can be passed to `add_purchase_row`.
+        """
+        return (
+            cls._purchased_products(*CUSTOMER_COLUMNS, *PRODUCT_COLUMNS)
+            .order_by(CustomerProductEntity.customer_id, CustomerProductEntity.product_id)
+        )
+
+    def _load_purchases(self, statement: Select) -> Purchase:
+        """
+        Streams the rows of a statement built with `purchases_statement` into a Purchase object.
+
+        :param statement: The SELECT returning one row per purchased item.
+        :return: A Purchase object containing customers and their associated products.
+        """
+        customers = {}
+        products = {}
+        purchases = defaultdict(list)
+        for row in self.sa.session.execute(statement.execution_options(yield_per=self.batch_size)):
+            self.add_purchase_row(customers, products, purchases, row)
 
         return Purchase(dict(purchases))
 
+    @staticmethod
+    def add_purchase_row(customers: dict[int, Customer], products: dict[int, Product],
+                         purchases: dict[Customer, list[Product]], row: Row) -> None:
+        """
+        Adds a row selected by `purchases_statement` to the purchases being built.
+        Every customer and product is converted to its model object only once.
+
+        :param customers: The customers created so far, by id.
+        :param products: The products created so far, by id.
+        :param purchases: A defaultdict(list) with the products purchased by each customer so far.
+        :param row: The database row.
+        """
+        customer_id, first_name, last_name, age, cash, product_id, name, category, price = row
+        customer = customers.get(customer_id)
+        if customer is None:
+            customer = customers[customer_id] = Customer(
+                id=customer_id,
+                first_name=first_name,
+                last_name=last_name,
+                age=age,
+                cash=cash
+            )
+
+        product = products.get(product_id)
+        if product is None:
+            product = products[product_id] = Product(id=product_id, name=name, category=sys.intern(category),
+                                                     price=price)
+
+        purchases[customer].append(product)
+
+    @staticmethod
+    def _purchased_products(*columns) -> Select:
+        """
+        Builds a SELECT over the customer_product association joined with its customers and products.
+
+        :param columns: The columns or expressions to select.
+        :return: A Select statement which can be further filtered and grouped.
+        """
+        return (
+            select(*columns)
+            .select_from(CustomerProductEntity)
+            .join(CustomerEntity, CustomerEntity.id == CustomerProductEntity.customer_id)
+            .join(ProductEntity, ProductEntity.id == CustomerProductEntity.product_id)
+        )
+
+    @staticmethod
+    def _to_customer(row: Row) -> Customer:
+        """
+        Converts a row selected with CUSTOMER_COLUMNS into a Customer.
+
+        :param row: The database row.
+        :return: A Customer object.
+        """
+        return Customer(id=row.id, first_name=row.first_name, last_name=row.last_name, age=row.age, cash=row.cash)
+
+    @staticmethod
+    def _to_product(row: Row) -> Product:
+        """
+        Converts a row selected with PRODUCT_COLUMNS into a Product.
+
+        :param row: The database row.
+        :return: A Product object.
+        """
+        return Product(id=row.id, name=row.name, category=row.category, price=row.price)
+
 
 # ======================================================================================================================
 customer_product_repository_sql = CustomerProductRepositorySQL(sa, product_repository=ProductRepositorySQL(sa),
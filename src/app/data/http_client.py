@@ -0,0 +1,61 @@
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def create_session(pool_size: int = 10, retries: int = 3, backoff_factor: float = 0.5) -> requests.Session:
+    """
+    Creates an HTTP session which keeps connections alive and reuses them across requests.
+
+    Idempotent requests failing with a connection error or a transient server error are retried
+    with exponential backoff, and compressed responses are requested from the server.
+
+    :param pool_size: The maximum number of connections kept open per host.
+    :param retries: The maximum number of retries of a single request.
+    :param backoff_factor: The base of the exponential delay between retries, in seconds.
+    :return: A configured requests.Session.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    return session
+
+
+def session_stats(session: requests.Session) -> dict[str, int]:
+    """
+    Summarizes connection reuse of a session created by `create_session`.
+
+    :param session: The session to inspect.
+    :return: A dictionary with the number of requests sent, connections opened and connections reused.
+    """
+    sent = opened = 0
+    for adapter in {id(a): a for a in session.adapters.values()}.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            sent += pool.num_requests
+            opened += pool.num_connections
+
+    return {'requests': sent, 'connections_opened': opened, 'connections_reused': max(sent - opened, 0)}
+
+
+# ======================================================================================================================
+http_session = create_session(
+    pool_size=int(os.getenv("HTTP_POOL_SIZE", "10")),
+    retries=int(os.getenv("HTTP_RETRIES", "3")),
+    backoff_factor=float(os.getenv("HTTP_BACKOFF", "0.5"))
+)
@@ -0,0 +1,166 @@
+import csv
+import json
+from typing import Any, Iterable, Iterator
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]'
+
+
+class JSONArrayParser:
+    """
+    Push parser for a JSON document consisting of a top-level array.
+
+    Text is fed in fragments of any size and every complete array element is returned as soon as it has been
+    received. Only the text of the element currently being decoded is kept in memory, so arbitrarily large
+    arrays can be processed while they are still being downloaded.
+    """
+
+    def __init__(self) -> None:
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._state = 'start'
+
+    def feed(self, chunk: str) -> list[Any]:
+        """
+        Parses the next fragment of the document.
+
+        :param chunk: The next text fragment.
+        :return: The array elements completed by this fragment.
+        :raises ValueError: If the document is not a well-formed JSON array.
+        """
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return self._parse(final=False)
+
+    def close(self) -> list[Any]:
+        """
+        Signals the end of the document.
+
+        :return: The array elements which could only be completed at the end of the document.
+        :raises ValueError: If the document ended before the array was closed.
+        """
+        values = self._parse(final=True)
+        if self._state != 'end':
+            raise ValueError('Unexpected end of JSON array')
+        return values
+
+    def _parse(self, final: bool) -> list[Any]:
+        """
+        Decodes as many array elements from the buffer as possible.
+
+        :param final: Whether no more text will follow, so incomplete values are errors.
+        :return: The decoded array elements.
+        """
+        values = []
+        buffer = self._buffer
+        while self._state != 'end':
+            while self._position < len(buffer) and buffer[self._position] in _WHITESPACE:
+                self._position += 1
+            if self._position == len(buffer):
+                break
+
+            char = buffer[self._position]
+            if self._state == 'start':
+                if char != '[':
+                    raise ValueError(f"Expected '[' at the start of a JSON array, found {char!r}")
+                self._position += 1
+                self._state = 'first'
+            elif self._state == 'separator':
+                if char not in ',]':
+                    raise ValueError(f"Expected ',' or ']' in a JSON array, found {char!r}")
+                self._position += 1
+                self._state = 'value' if char == ',' else 'end'
+            elif self._state == 'first' and char == ']':
+                self._position += 1
+                self._state = 'end'
+            else:
+                try:
+                    value, end = self._decoder.raw_decode(buffer, self._position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break
+                # A number followed by anything but a delimiter, or by nothing at all, may be truncated
+                if not final and (end == len(buffer) or buffer[end] not in _DELIMITERS):
+                    break
+                values.append(value)
+                self._position = end
+                self._state = 'separator'
+        return values
+
+
+class CSVRecordParser:
+    """
+    Push parser for a CSV document with a header row, in the default dialect of the csv module.
+
+    Text is fed in fragments of any size and every complete row is returned as a dictionary keyed by the header,
+    like csv.DictReader, as soon as it has been received. A row is only parsed once its line ending is outside
+    of quotes, so quoted fields keep the newlines they contain.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ''
+        self._record: list[str] = []
+        self._quotes = 0
+        self._header: list[str] | None = None
+
+    def feed(self, chunk: str) -> list[dict[str, str]]:
+        """
+        Parses the next fragment of the document.
+
+        :param chunk: The next text fragment.
+        :return: The rows completed by this fragment.
+        """
+        lines = (self._buffer + chunk).split('\n')
+        self._buffer = lines.pop()
+        rows = []
+        for line in lines:
+            rows.extend(self._add_line(line + '\n'))
+        return rows
+
+    def close(self) -> list[dict[str, str]]:
+        """
+        Signals the end of the document.
+
+        :return: The last row, if the document does not end with a line ending.
+        :raises csv.Error: If the document ended inside a quoted field.
+        """
+        rows = self._add_line(self._buffer) if self._buffer else []
+        self._buffer = ''
+        if self._record:
+            raise csv.Error('Unexpected end of CSV data inside a quoted field')
+        return rows
+
+    def _add_line(self, line: str) -> list[dict[str, str]]:
+        """
+        Adds a line to the current record and parses the record once it is complete.
+
+        :param line: The line, including its line ending.
+        :return: The rows of the record, empty while it is incomplete or if it is blank.
+        """
+        self._record.append(line)
+        # Quotes are doubled inside quoted fields, so a record ends at a line ending preceded by an even number
+        self._quotes += line.count('"')
+        if self._quotes % 2:
+            return []
+
+        record, self._record, self._quotes = self._record, [], 0
+        if self._header is None:
+            self._header = next(csv.reader(record), None) or None
+            return []
+        return list(csv.DictReader(record, fieldnames=self._header))
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    """
+    Incrementally parses a JSON document consisting of a top-level array, yielding its elements one by one.
+
+    :param chunks: An iterable of text fragments which together form the JSON document.
+    :return: An iterator over the decoded array elements.
+    :raises ValueError: If the document is not a well-formed JSON array.
+    """
+    parser = JSONArrayParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
@@ -1,9 +1,16 @@
+import itertools
 import os
+import sys
 from decimal import Decimal
-from io import StringIO
+from io import BufferedReader, StringIO, TextIOWrapper
 import requests
 import csv
+import json
+from typing import Iterable, Iterator, TextIO
 from src.app.model import Purchase, Customer, Product
+from src.app.data.parsing import iter_json_array
+from src.app.data.http_client import http_session, session_stats
+from src.app.data.snapshot import read_snapshot
 from src.app.data.database.repository import CrudRepository
 from dotenv import load_dotenv
 
@@ -39,7 +46,7 @@ class NotImplementedOperationsRepository[T](CrudRepository[T]):
         """
         raise NotImplementedError("CSV repository does not support saving data.")
 
-    def delete_by_id(self, entity_id: int) -> None:
+    def delete_by_id(self, entity_id: int) -> int:
         """
         Raises an exception since deleting by ID is not supported for CSV repositories.
 
@@ -48,7 +55,16 @@ class NotImplementedOperationsRepository[T](CrudRepository[T]):
         """
         raise NotImplementedError("CSV repository does not support deleting data.")
 
-    def delete_all(self) -> None:
+    def delete_many(self, entity_ids: Iterable[int]) -> int:
+        """
+        Raises an exception since deleting multiple entities is not supported for CSV repositories.
+
+        :param entity_ids: The IDs of the entities to delete.
+        :raises NotImplementedError: Indicates that this operation is not supported.
+        """
+        raise NotImplementedError("CSV repository does not support deleting data.")
+
+    def delete_all(self) -> int:
         """
         Raises an exception since deleting all data is not supported for CSV repositories.
 
@@ -78,123 +94,365 @@ class NotImplementedOperationsRepository[T](CrudRepository[T]):
         pass
 
 
-class CustomerProductRepositoryCSV(NotImplementedOperationsRepository[Purchase]):
+class SourceFileRepository(NotImplementedOperationsRepository[Purchase]):
     """
-    Repository class for handling customer and product data stored in a CSV file.
+    Base class for repositories reading customer and product data from a file published at a URL
+    or stored on the local file system.
 
-    This class implements CRUD operations for reading data from a CSV file.
+    For URLs, the last response's ETag and Last-Modified validators are remembered and sent back with the next
+    request. When the server answers 304 Not Modified, the previously parsed purchases are reused
+    without downloading or parsing the file again. Local files are likewise parsed again only when they have changed.
     """
 
-    def __init__(self, path: str) -> None:
+    def __init__(self, path: str, stream: bool = True, chunk_size: int = 64 * 1024,
+                 session: requests.Session | None = None, timeout: float | None = 30.0) -> None:
         """
-        Initializes the repository with the path to the CSV file.
+        Initializes the repository with the URL to the file.
 
-        :param path: The file path to the CSV file containing customer and product data.
+        :param path: The URL or local path to the file containing customer and product data.
+        :param stream: Whether to parse the file while it is read instead of reading the whole body first.
+        :param chunk_size: The number of bytes read from the connection at a time when streaming.
+        :param session: The HTTP session used to download the file. Defaults to the shared pooled session.
+        :param timeout: The number of seconds to wait for the server to connect or send data, or None to wait forever.
         """
         self.path = path
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.session = http_session if session is None else session
+        self.timeout = timeout
+        self.downloads = 0
+        self.not_modified = 0
+        self._etag = None
+        self._last_modified = None
+        self._file_id = None
+        self._purchase = None
 
     def find_all(self) -> list[Purchase]:
         """
-        Retrieves all purchases from the CSV file.
+        Retrieves all purchases from the file, reusing the previously parsed purchases if the file has not changed.
 
         :return: A list containing a single Purchase object with customer and product data.
+        :raises requests.HTTPError: If the server answers with an error status.
         """
-        response = requests.get(self.path)
-        csv_content = response.text
-        csv_file = StringIO(csv_content)
-        reader = csv.DictReader(csv_file)
+        if not self.path.startswith(('http://', 'https://')):
+            with open(self.path, encoding='utf-8', newline='') as file:
+                stat = os.fstat(file.fileno())
+                file_id = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                if file_id == self._file_id and self._purchase is not None:
+                    self.not_modified += 1
+                    return [self._purchase]
+
+                self._purchase = self._parse_file(file)
+                self._file_id = file_id
+                return [self._purchase]
+
+        with self.session.get(self.path, stream=self.stream, headers=self._conditional_headers(),
+                              timeout=self.timeout) as response:
+            if response.status_code == 304 and self._purchase is not None:
+                self.not_modified += 1
+                return [self._purchase]
+
+            # Error responses left over once the retries are exhausted must not be parsed as an empty file
+            response.raise_for_status()
+            purchase = self._parse(response)
+            self.downloads += 1
+            self._etag = response.headers.get('ETag')
+            self._last_modified = response.headers.get('Last-Modified')
+            self._purchase = purchase if self._etag or self._last_modified else None
+            return [purchase]
 
-        customers = {}
-        purchases = {}
+    def get_purchases(self) -> Purchase:
+        """
+        Retrieves a single Purchase object representing all purchases.
 
-        for row in reader:
-            customer_id = int(row['ID']) if row['ID'] else None
-            if customer_id is None:
-                continue
-
-            if customer_id not in customers:
-                customers[customer_id] = Customer(
-                    id=customer_id,
-                    first_name=row['FirstName'] if row['FirstName'] else '',
-                    last_name=row['LastName'] if row['LastName'] else '',
-                    age=int(row['Age']) if row['Age'] else 0,
-                    cash=Decimal(row['Salary']) if row['Salary'] else Decimal('0.00')
-                )
-                purchases[customers[customer_id]] = []
+        :return: A Purchase object with customer and product data.
+        """
+        return self.find_all()[0]
 
-            if row['ProductID']:
-                product = Product(
-                    id=int(row['ProductID']),
-                    name=row['Product'] if row['Product'] else '',
-                    category=row['Category'] if row['Category'] else '',
-                    price=Decimal(row['Price']) if row['Price'] else Decimal('0.00')
-                )
-                purchases[customers[customer_id]].append(product)
+    def stats(self) -> dict[str, int | dict[str, int]]:
+        """
+        Returns the number of full downloads, of requests answered with 304 Not Modified,
+        and the connection reuse counters of the HTTP session.
 
-        return [Purchase(customers_and_their_products=purchases)]
+        :return: A dictionary with the download counters.
+        """
+        return {'downloads': self.downloads, 'not_modified': self.not_modified, 'http': session_stats(self.session)}
 
+    def _conditional_headers(self) -> dict[str, str]:
+        """
+        Builds the conditional request headers from the validators of the last downloaded file.
 
-    def get_purchases(self) -> Purchase:
+        :return: A dictionary with If-None-Match and/or If-Modified-Since headers, empty if nothing is cached.
         """
-        Retrieves a single Purchase object representing all purchases.
+        if self._purchase is None:
+            return {}
+
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+        return headers
 
+    def _parse(self, response: requests.Response) -> Purchase:
+        """
+        Parses the body of a response into a Purchase object. Must be overridden by subclasses.
+
+        :param response: The HTTP response containing the file.
         :return: A Purchase object with customer and product data.
         """
-        return self.find_all()[0]
+        raise NotImplementedError
+
+    def _parse_file(self, file: TextIO) -> Purchase:
+        """
+        Parses a local file into a Purchase object. Must be overridden by subclasses.
+
+        :param file: The file opened in text mode.
+        :return: A Purchase object with customer and product data.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def iter_batches(cls, items: Iterable, batch_size: int) -> Iterator[Purchase]:
+        """
+        Builds Purchase objects from the decoded rows or entries of the file format, `batch_size` at a time,
+        e.g. to ingest an upload without holding all of it in memory.
+
+        :param items: An iterable of the rows or entries.
+        :param batch_size: The maximum number of rows or entries per Purchase object.
+        :return: An iterator over Purchase objects, one per batch.
+        """
+        for batch in itertools.batched(items, batch_size):
+            yield cls._build_purchase(batch)
+
+    @classmethod
+    def _build_purchase(cls, items: Iterable) -> Purchase:
+        """
+        Builds a Purchase from the decoded rows or entries of the file format. Must be overridden by subclasses.
+
+        :param items: An iterable of the rows or entries.
+        :return: A Purchase object with customer and product data.
+        """
+        raise NotImplementedError
+
+
+class CustomerProductRepositoryCSV(SourceFileRepository):
+    """
+    Repository class for handling customer and product data stored in a CSV file.
+
+    This class implements CRUD operations for reading data from a CSV file.
+    """
+
+    def _parse(self, response: requests.Response) -> Purchase:
+        """
+        Parses a CSV file, line by line while it is downloaded when streaming is enabled.
+
+        :param response: The HTTP response containing the CSV file.
+        :return: A Purchase object with customer and product data.
+        """
+        if self.stream:
+            # Read as a text file which keeps the line endings, as quoted fields may contain newlines.
+            # The body is closed with the response rather than once it has been read, which the file would fail on
+            response.raw.decode_content = True
+            response.raw.auto_close = False
+            lines = TextIOWrapper(BufferedReader(response.raw, buffer_size=self.chunk_size),
+                                  encoding=response.encoding or 'utf-8', newline='')
+        else:
+            lines = StringIO(response.text)
+        return self._build_purchase(csv.DictReader(lines))
+
+    def _parse_file(self, file: TextIO) -> Purchase:
+        """
+        Parses a local CSV file line by line.
+
+        :param file: The CSV file opened in text mode.
+        :return: A Purchase object with customer and product data.
+        """
+        return self._build_purchase(csv.DictReader(file))
+
+    @classmethod
+    def _build_purchase(cls, rows: Iterable[dict[str, str]]) -> Purchase:
+        """
+        Builds a Purchase from CSV rows, constructing customers and products row by row.
+
+        :param rows: An iterable of CSV rows mapping column names to values.
+        :return: A Purchase object with customer and product data.
+        """
+        customers = {}
+        products = {}
+        purchases = {}
+
+        for row in rows:
+            cls.add_row(customers, products, purchases, row)
+
+        return Purchase(customers_and_their_products=purchases)
 
+    @staticmethod
+    def add_row(customers: dict[int, Customer], products: dict[tuple, Product],
+                purchases: dict[Customer, list[Product]], row: dict[str, str]) -> None:
+        """
+        Adds the customer and the product described by a single CSV row.
+        Rows describing the same product share one Product instance, which is only parsed once.
+
+        :param customers: The customers created so far, by id.
+        :param products: The products created so far, by their raw column values.
+        :param purchases: The products purchased by each customer so far.
+        :param row: A CSV row mapping column names to values.
+        """
+        customer_id = int(row['ID']) if row['ID'] else None
+        if customer_id is None:
+            return
+
+        if customer_id not in customers:
+            customers[customer_id] = Customer(
+                id=customer_id,
+                first_name=row['FirstName'] if row['FirstName'] else '',
+                last_name=row['LastName'] if row['LastName'] else '',
+                age=int(row['Age']) if row['Age'] else 0,
+                cash=Decimal(row['Salary']) if row['Salary'] else Decimal('0.00')
+            )
+            purchases[customers[customer_id]] = []
+
+        if row['ProductID']:
+            key = (row['ProductID'], row['Product'], row['Category'], row['Price'])
+            product = products.get(key)
+            if product is None:
+                product = products[key] = Product(
+                    id=int(row['ProductID']),
+                    name=row['Product'] if row['Product'] else '',
+                    category=sys.intern(row['Category']) if row['Category'] else '',
+                    price=Decimal(row['Price']) if row['Price'] else Decimal('0.00')
+                )
+            purchases[customers[customer_id]].append(product)
 
-class CustomerProductRepositoryJSON(NotImplementedOperationsRepository[Purchase]):
+
+class CustomerProductRepositoryJSON(SourceFileRepository):
     """
     Repository class for handling customer and product data stored in a JSON file.
 
     This class implements CRUD operations for reading data from a JSON file.
     """
 
-    def __init__(self, path: str) -> None:
+    def _parse(self, response: requests.Response) -> Purchase:
         """
-        Initializes the repository with the URL to the JSON file.
+        Parses a JSON file, entry by entry while it is downloaded when streaming is enabled.
 
-        :param path: The URL to the JSON file containing customer and product data.
+        :param response: The HTTP response containing the JSON file.
+        :return: A Purchase object with customer and product data.
         """
-        self.path = path
+        if self.stream:
+            response.encoding = response.encoding or 'utf-8'
+            entries = iter_json_array(response.iter_content(chunk_size=self.chunk_size, decode_unicode=True))
+        else:
+            entries = response.json()
+        return self._build_purchase(entries)
+
+    def _parse_file(self, file: TextIO) -> Purchase:
+        """
+        Parses a local JSON file, entry by entry when streaming is enabled.
 
-    def find_all(self) -> list[Purchase]:
+        :param file: The JSON file opened in text mode.
+        :return: A Purchase object with customer and product data.
         """
-        Retrieves all purchases from the JSON file.
+        entries = iter_json_array(iter(lambda: file.read(self.chunk_size), '')) if self.stream else json.load(file)
+        return self._build_purchase(entries)
 
-        :return: A list containing a single Purchase object with customer and product data.
+    @classmethod
+    def _build_purchase(cls, entries: Iterable[dict]) -> Purchase:
         """
-        response = requests.get(self.path)
-        data = response.json()
+        Builds a Purchase from decoded JSON entries, constructing customers and products entry by entry.
 
+        :param entries: An iterable of JSON objects, each describing a customer and their purchases.
+        :return: A Purchase object with customer and product data.
+        """
         customers = {}
+        products = {}
         purchases = {}
 
-        for entry in data:
+        for entry in entries:
+            cls.add_entry(customers, products, purchases, entry)
 
-            customer_id = entry['ID']
-            if customer_id not in customers:
-                customers[customer_id] = Customer(
-                    id=customer_id,
-                    first_name=entry['FirstName'],
-                    last_name=entry['LastName'],
-                    age=entry['Age'],
-                    cash=Decimal(entry['Salary'])
-                )
+        return Purchase(customers_and_their_products=purchases)
 
-            if customers[customer_id] not in purchases:
-                purchases[customers[customer_id]] = []
+    @staticmethod
+    def add_entry(customers: dict[int, Customer], products: dict[tuple, Product],
+                  purchases: dict[Customer, list[Product]], entry: dict) -> None:
+        """
+        Adds the customer and the products described by a single JSON entry.
+        Purchases describing the same product share one Product instance, which is only parsed once.
 
-            for purchase in entry.get('Purchases', []):
-                product = Product(
+        :param customers: The customers created so far, by id.
+        :param products: The products created so far, by their raw field values.
+        :param purchases: The products purchased by each customer so far.
+        :param entry: A JSON object describing a customer and their purchases.
+        """
+        customer_id = entry['ID']
+        if customer_id not in customers:
+            customers[customer_id] = Customer(
+                id=customer_id,
+                first_name=entry['FirstName'],
+                last_name=entry['LastName'],
+                age=entry['Age'],
+                cash=Decimal(entry['Salary'])
+            )
+
+        if customers[customer_id] not in purchases:
+            purchases[customers[customer_id]] = []
+
+        for purchase in entry.get('Purchases', []):
+            key = (purchase['ProductID'], purchase['Product'], purchase['Category'], purchase['Price'])
+            product = products.get(key)
+            if product is None:
+                product = products[key] = Product(
                     id=purchase['ProductID'],
                     name=purchase['Product'],
-                    category=purchase['Category'],
+                    category=sys.intern(category) if isinstance(category := purchase['Category'], str) else category,
                     price=Decimal(purchase['Price'])
                 )
-                purchases[customers[customer_id]].append(product)
+            purchases[customers[customer_id]].append(product)
+
+
+class CustomerProductRepositorySnapshot(NotImplementedOperationsRepository[Purchase]):
+    """
+    Repository class for handling customer and product data stored in a local binary snapshot file.
+
+    Snapshot files are written with `src.app.data.snapshot.write_snapshot`, converted from CSV and JSON exports
+    with `python -m src.app.data.snapshot`, or published periodically by `python -m src.app.publisher`.
+
+    The file is only mapped and decoded again when it has been replaced, so polling a published snapshot
+    costs a single stat call while it is unchanged. Decoding is much cheaper than parsing a CSV or JSON export,
+    but builds the same objects, so every process reading the file holds its own copy of the purchases.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Initializes the repository with the path to the snapshot file.
+
+        :param path: The local path to the snapshot file.
+        """
+        self.path = path
+        self.loads = 0
+        self.unchanged = 0
+        self._file_id = None
+        self._purchase = None
+
+    def find_all(self) -> list[Purchase]:
+        """
+        Retrieves all purchases from the snapshot file, reusing the previously decoded purchases
+        if the file has not been replaced since.
 
-        return [Purchase(customers_and_their_products=purchases)]
+        :return: A list containing a single Purchase object with customer and product data.
+        """
+        stat = os.stat(self.path)
+        file_id = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if file_id == self._file_id:
+            self.unchanged += 1
+            return [self._purchase]
+
+        self._purchase = read_snapshot(self.path)
+        self._file_id = file_id
+        self.loads += 1
+        return [self._purchase]
 
     def get_purchases(self) -> Purchase:
         """
@@ -204,7 +462,20 @@ class CustomerProductRepositoryJSON(NotImplementedOperationsRepository[Purchase]
         """
         return self.find_all()[0]
 
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the number of times the file was decoded and the number of times it was found unchanged.
+
+        :return: A dictionary with the load counters.
+        """
+        return {'loads': self.loads, 'unchanged': self.unchanged}
+
 
 # ======================================================================================================================
-customer_product_repository_csv = CustomerProductRepositoryCSV(path=os.getenv("CSV_PATH"))
-customer_product_repository_json = CustomerProductRepositoryJSON(path=os.getenv("JSON_PATH"))
+# Remote CSV and JSON files are parsed while they are downloaded unless STREAM_SOURCES is disabled
+stream_sources = os.getenv("STREAM_SOURCES", "true").lower() == "true"
+customer_product_repository_csv = CustomerProductRepositoryCSV(path=os.getenv("CSV_PATH"), stream=stream_sources,
+                                                               timeout=float(os.getenv("CSV_TIMEOUT", "30")))
+customer_product_repository_json = CustomerProductRepositoryJSON(path=os.getenv("JSON_PATH"), stream=stream_sources,
+                                                                 timeout=float(os.getenv("JSON_TIMEOUT", "30")))
+customer_product_repository_snapshot = CustomerProductRepositorySnapshot(path=os.getenv("SNAPSHOT_FILE"))
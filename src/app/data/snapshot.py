@@ -0,0 +1,323 @@
+import argparse
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable
+from src.app.model import Purchase, Customer, Product
+from src.app.data.cache import SnapshotCache
+
+logging.basicConfig(level=logging.INFO)
+
+MAGIC = b'PURSNAP1'
+# Magic bytes followed by the number of customers, products, purchased items and strings
+HEADER = struct.Struct('<8sQQQQ')
+# Exponent marking a decimal whose coefficient does not fit in 64 bits; its string table index is stored instead
+STRING_EXPONENT = -(2 ** 31)
+
+# After the header, every column is stored as a little-endian array starting at an 8-byte aligned offset,
+# in the order listed below. Strings are stored once in a string table and referenced by index.
+# Decimals are split into an integer coefficient and a base-10 exponent, so Decimal('1200.00') is stored
+# as (120000, -2) and restored with its original exponent.
+COLUMNS = (
+    ('customer_id', 'q', 'customers'),
+    ('customer_first_name', 'I', 'customers'),
+    ('customer_last_name', 'I', 'customers'),
+    ('customer_age', 'i', 'customers'),
+    ('customer_cash_coefficient', 'q', 'customers'),
+    ('customer_cash_exponent', 'i', 'customers'),
+    ('customer_purchases_offset', 'Q', 'customers+1'),
+    ('product_id', 'q', 'products'),
+    ('product_name', 'I', 'products'),
+    ('product_category', 'I', 'products'),
+    ('product_price_coefficient', 'q', 'products'),
+    ('product_price_exponent', 'i', 'products'),
+    ('purchase_product', 'I', 'purchases'),
+    ('string_offset', 'Q', 'strings+1'),
+    ('string_data', 'B', 'string_bytes'),
+)
+
+
+def _aligned(offset: int) -> int:
+    """
+    Rounds an offset up to the next multiple of 8 bytes.
+
+    :param offset: The offset in bytes.
+    :return: The aligned offset.
+    """
+    return (offset + 7) & ~7
+
+
+class _StringTable:
+    """
+    Assigns consecutive indexes to distinct strings and collects their UTF-8 encoded bytes.
+    """
+
+    def __init__(self) -> None:
+        self.indexes: dict[str, int] = {}
+        self.offsets = array('Q', [0])
+        self.data = bytearray()
+
+    def add(self, value: str) -> int:
+        """
+        Adds a string to the table unless it is already present.
+
+        :param value: The string to add.
+        :return: The index of the string in the table.
+        """
+        index = self.indexes.get(value)
+        if index is None:
+            index = self.indexes[value] = len(self.indexes)
+            self.data += value.encode('utf-8')
+            self.offsets.append(len(self.data))
+        return index
+
+
+def _encode_decimal(value: Decimal, strings: _StringTable) -> tuple[int, int]:
+    """
+    Splits a decimal into a 64-bit coefficient and an exponent, falling back to the string table
+    for values which cannot be represented that way.
+
+    :param value: The decimal to encode.
+    :param strings: The string table of the snapshot.
+    :return: A tuple of the coefficient and the exponent.
+    """
+    sign, digits, exponent = value.as_tuple()
+    if isinstance(exponent, int) and STRING_EXPONENT < exponent < 2 ** 31 and not (sign and not any(digits)):
+        coefficient = int(''.join(map(str, digits)) or '0')
+        coefficient = -coefficient if sign else coefficient
+        if -2 ** 63 <= coefficient < 2 ** 63:
+            return coefficient, exponent
+    return strings.add(str(value)), STRING_EXPONENT
+
+
+def write_snapshot(purchase: Purchase, path: str) -> None:
+    """
+    Writes purchases to a snapshot file.
+    The file is written under a temporary name and renamed when complete, so readers never see a partial file.
+
+    :param purchase: The purchases to write.
+    :param path: The path of the snapshot file.
+    """
+    if sys.byteorder != 'little':
+        raise NotImplementedError('Snapshot files can only be written on little-endian machines.')
+
+    strings = _StringTable()
+    columns = {name: array(typecode) for name, typecode, _ in COLUMNS}
+    product_indexes = {}
+    columns['customer_purchases_offset'].append(0)
+
+    for customer, products in purchase.customers_and_their_products.items():
+        cash_coefficient, cash_exponent = _encode_decimal(customer.cash, strings)
+        columns['customer_id'].append(customer.id)
+        columns['customer_first_name'].append(strings.add(customer.first_name))
+        columns['customer_last_name'].append(strings.add(customer.last_name))
+        columns['customer_age'].append(customer.age)
+        columns['customer_cash_coefficient'].append(cash_coefficient)
+        columns['customer_cash_exponent'].append(cash_exponent)
+
+        for product in products:
+            index = product_indexes.get(product)
+            if index is None:
+                index = product_indexes[product] = len(product_indexes)
+                price_coefficient, price_exponent = _encode_decimal(product.price, strings)
+                columns['product_id'].append(product.id)
+                columns['product_name'].append(strings.add(product.name))
+                columns['product_category'].append(strings.add(product.category))
+                columns['product_price_coefficient'].append(price_coefficient)
+                columns['product_price_exponent'].append(price_exponent)
+            columns['purchase_product'].append(index)
+
+        columns['customer_purchases_offset'].append(len(columns['purchase_product']))
+
+    columns['string_offset'] = strings.offsets
+    columns['string_data'] = array('B', strings.data)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as file:
+        file.write(HEADER.pack(MAGIC, len(columns['customer_id']), len(product_indexes),
+                               len(columns['purchase_product']), len(strings.indexes)))
+        for name, _, _ in COLUMNS:
+            file.write(b'\0' * (_aligned(file.tell()) - file.tell()))
+            file.write(columns[name].tobytes())
+    # Temporary files are private to their owner, while the snapshot is read by other processes
+    os.chmod(file.name, 0o644)
+    os.replace(file.name, path)
+
+
+class SnapshotFile:
+    """
+    Read-only, memory-mapped view of a snapshot file.
+
+    The columns are exposed as typed memoryviews over the mapped file, so they are paged in lazily
+    and shared with every other process mapping the same file. Only the file is shared: `to_purchase` decodes it
+    into objects on the heap of the calling process, so every worker still holds its own decoded copy.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Maps the snapshot file into memory and locates its columns.
+
+        :param path: The path of the snapshot file.
+        :raises ValueError: If the file is not a snapshot file.
+        """
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, customers, products, purchases, strings = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f'{path} is not a purchase snapshot file.')
+
+        self.counts = {'customers': customers, 'products': products, 'purchases': purchases, 'strings': strings}
+        self.columns: dict[str, memoryview] = {}
+        offset = HEADER.size
+        buffer = memoryview(self._mmap)
+        for name, typecode, count in COLUMNS:
+            if count == 'string_bytes':
+                length = self.columns['string_offset'][-1]
+            else:
+                length = self.counts[count.removesuffix('+1')] + count.endswith('+1')
+            offset = _aligned(offset)
+            size = length * array(typecode).itemsize
+            self.columns[name] = buffer[offset:offset + size].cast(typecode)
+            offset += size
+        buffer.release()
+
+    def string(self, index: int) -> str:
+        """
+        Reads a string from the string table.
+
+        :param index: The index of the string.
+        :return: The decoded string.
+        """
+        offsets = self.columns['string_offset']
+        return str(self.columns['string_data'][offsets[index]:offsets[index + 1]], 'utf-8')
+
+    def decimal(self, coefficient: int, exponent: int) -> Decimal:
+        """
+        Restores a decimal stored as a coefficient and an exponent.
+
+        :param coefficient: The coefficient, or the string table index for values stored as text.
+        :param exponent: The base-10 exponent.
+        :return: The decimal with its original exponent.
+        """
+        return Decimal(self.string(coefficient)) if exponent == STRING_EXPONENT else Decimal(coefficient).scaleb(exponent)
+
+    def to_purchase(self) -> Purchase:
+        """
+        Builds a Purchase from the snapshot. Every distinct product is created once and shared between customers.
+        The objects are created in the calling process, which therefore needs memory for the whole snapshot.
+
+        :return: A Purchase object with customer and product data.
+        """
+        c = self.columns
+        strings = [self.string(i) for i in range(self.counts['strings'])]
+        products = [
+            Product(
+                id=c['product_id'][i],
+                name=strings[c['product_name'][i]],
+                category=strings[c['product_category'][i]],
+                price=self.decimal(c['product_price_coefficient'][i], c['product_price_exponent'][i])
+            )
+            for i in range(self.counts['products'])
+        ]
+
+        purchases = {}
+        offsets, purchase_product = c['customer_purchases_offset'], c['purchase_product']
+        for i in range(self.counts['customers']):
+            customer = Customer(
+                id=c['customer_id'][i],
+                first_name=strings[c['customer_first_name'][i]],
+                last_name=strings[c['customer_last_name'][i]],
+                age=c['customer_age'][i],
+                cash=self.decimal(c['customer_cash_coefficient'][i], c['customer_cash_exponent'][i])
+            )
+            purchases[customer] = [products[p] for p in purchase_product[offsets[i]:offsets[i + 1]]]
+
+        return Purchase(customers_and_their_products=purchases)
+
+    def close(self) -> None:
+        """
+        Releases the column views and unmaps the file.
+        """
+        for column in self.columns.values():
+            column.release()
+        self.columns = {}
+        self._mmap.close()
+
+    def __enter__(self) -> 'SnapshotFile':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def read_snapshot(path: str) -> Purchase:
+    """
+    Reads purchases from a snapshot file.
+
+    :param path: The path of the snapshot file.
+    :return: A Purchase object with customer and product data.
+    """
+    with SnapshotFile(path) as snapshot:
+        return snapshot.to_purchase()
+
+
+@dataclass
+class SnapshotPublisher:
+    """
+    Loads purchases and publishes them to a snapshot file shared by several processes.
+
+    Every process attaching to the file maps the same pages read-only, so only the publisher loads from the source,
+    while each process decodes the file into its own objects.
+    The file is rewritten only when the loader returns a new snapshot, e.g. not after a 304 Not Modified.
+    """
+    loader: Callable[[], Purchase]
+    path: str
+    snapshot_cache: SnapshotCache[Purchase] = field(default_factory=SnapshotCache)
+    published: int = 0
+
+    def refresh(self) -> None:
+        """
+        Loads the purchases and writes them to the snapshot file if they have changed.
+        """
+        version = self.snapshot_cache.version
+        purchase = self.loader()
+        self.snapshot_cache.prime(purchase)
+        if self.snapshot_cache.version != version or not os.path.exists(self.path):
+            write_snapshot(purchase, self.path)
+            self.published += 1
+            logging.info(f'Published {len(purchase.customers_and_their_products)} customers to {self.path}')
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Command line entry point converting a CSV or JSON export, local or remote, to a snapshot file.
+
+    Usage: python -m src.app.data.snapshot {csv,json} SOURCE OUTPUT
+
+    :param argv: The command line arguments, defaults to sys.argv.
+    """
+    from src.app.data.repository import CustomerProductRepositoryCSV, CustomerProductRepositoryJSON
+
+    parser = argparse.ArgumentParser(description='Convert a CSV or JSON purchase export to a binary snapshot file.')
+    parser.add_argument('format', choices=('csv', 'json'), help='format of the export')
+    parser.add_argument('source', help='URL or local path of the export')
+    parser.add_argument('output', help='path of the snapshot file to write')
+    args = parser.parse_args(argv)
+
+    repository_type = CustomerProductRepositoryCSV if args.format == 'csv' else CustomerProductRepositoryJSON
+    purchase = repository_type(path=args.source).get_purchases()
+    write_snapshot(purchase, args.output)
+    logging.info(f'Wrote {len(purchase.customers_and_their_products)} customers to {args.output} '
+                 f'({os.path.getsize(args.output)} bytes)')
+
+
+if __name__ == '__main__':
+    main()
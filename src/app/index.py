@@ -0,0 +1,426 @@
+import bisect
+from collections import defaultdict
+from dataclasses import dataclass, field, fields
+from decimal import Decimal
+from typing import Any, Callable
+from src.app.model import Purchase, Customer, Product, PurchaseChange
+from src.app.utils import MaxMin, to_cents, from_cents
+
+
+@dataclass(frozen=True)
+class PurchaseIndex:
+    """
+    Per-customer and per-category aggregates precomputed from a single Purchase snapshot.
+
+    The index is built once per snapshot, so service queries are answered with dictionary lookups
+    instead of rescanning all customers and products.
+
+    Amounts are summed and compared as integer cents together with their decimal exponents, and converted
+    to Decimal only for the results, which are identical, including their exponents, to those of Decimal arithmetic.
+    Snapshots with an amount which has more than two decimal places are aggregated with Decimal arithmetic instead.
+
+    The index is never changed once it has been shared. A PurchaseIndexMaintainer applies purchases written through
+    the repository to a copy of it.
+    """
+    customers: dict[int, Customer]
+    totals_spent: dict[int, Decimal]
+    top_spenders: list[Customer]
+    category_top_spenders: dict[str, list[Customer]]
+    category_counts: dict[str, dict[Customer, int]]
+    age_category_counts: dict[int, dict[str, int]]
+    debts: dict[int, Decimal]
+    unique_products: dict[int, Product]
+    products_by_category: dict[str, list[Product]]
+    category_avg_price: dict[str, Decimal]
+    most_and_least_expensive: dict[str, MaxMin]
+
+    @classmethod
+    def from_purchase(cls, purchase: Purchase) -> 'PurchaseIndex':
+        """
+        Builds the index in a single pass over the customers and their products.
+
+        :param purchase: The Purchase snapshot to index.
+        :return: A PurchaseIndex containing the aggregates of the given purchases.
+        """
+        return cls._build(purchase, cls._to_cents, from_cents, 0) \
+            or cls._build(purchase, cls._to_decimal, lambda amount, exponent: amount, Decimal(0))
+
+    @classmethod
+    def _build(cls, purchase: Purchase, to_amount: Callable[[Decimal], tuple | None],
+               to_decimal: Callable[[Any, int], Decimal], zero: Any) -> 'PurchaseIndex | None':
+        """
+        Builds the index with amounts in the given representation.
+
+        :param purchase: The Purchase snapshot to index.
+        :param to_amount: Converts a decimal to a tuple of the amount and its exponent, or returns None
+        if it cannot be represented.
+        :param to_decimal: Converts an amount and an exponent back to a decimal.
+        :param zero: The amount zero.
+        :return: A PurchaseIndex, or None if an amount cannot be represented.
+        """
+        customers = {}
+        totals = {}
+        amounts = {}
+        category_spent = defaultdict(dict)
+        category_counts = defaultdict(dict)
+        age_category_counts = defaultdict(dict)
+        unique_products = {}
+
+        for customer, products in purchase.customers_and_their_products.items():
+            customers.setdefault(customer.id, customer)
+            # Summing starts from Decimal(0), whose exponent is 0
+            total, total_exponent = zero, 0
+            # Aggregated by category first, so each customer is hashed once per category rather than per product
+            spent, counts = {}, {}
+
+            for product in products:
+                amount = amounts.get(id(product))
+                if amount is None:
+                    amount = amounts[id(product)] = to_amount(product.price)
+                    if amount is None:
+                        return None
+                price, exponent = amount
+                total += price
+                if exponent < total_exponent:
+                    total_exponent = exponent
+
+                category = product.category
+                spent[category] = spent.get(category, zero) + price
+                counts[category] = counts.get(category, 0) + 1
+                unique_products[product.id] = product
+
+            for category, count in counts.items():
+                category_spent[category][customer] = spent[category]
+                category_counts[category][customer] = count
+                age_counts = age_category_counts[customer.age]
+                age_counts[category] = age_counts.get(category, 0) + count
+            totals[customer.id] = (total, total_exponent)
+
+        max_total = max((total for total, _ in totals.values()), default=zero)
+        debts = {}
+        for customer_id, customer in customers.items():
+            cash = to_amount(customer.cash)
+            if cash is None:
+                return None
+            (total, total_exponent), (cash, cash_exponent) = totals[customer_id], cash
+            # A negative difference becomes Decimal(0), while a zero difference keeps its own exponent
+            debts[customer_id] = Decimal(0) if total < cash \
+                else to_decimal(total - cash, min(total_exponent, cash_exponent))
+
+        category_top_spenders = {}
+        for category, spent in category_spent.items():
+            max_spent = max(spent.values())
+            category_top_spenders[category] = [] if max_spent == 0 \
+                else [customer for customer, amount in spent.items() if amount == max_spent]
+
+        products_by_category = defaultdict(list)
+        for product in unique_products.values():
+            products_by_category[product.category].append(product)
+
+        category_avg_price = {}
+        most_and_least_expensive = {}
+        for category, products in products_by_category.items():
+            prices = [amounts[id(product)] for product in products]
+            # Summing starts from 0, whose exponent is 0
+            price_sum = to_decimal(sum(price for price, _ in prices), min(0, *(exponent for _, exponent in prices)))
+            category_avg_price[category] = price_sum / Decimal(len(products))
+            # Ties are resolved in favour of the lower product id, as in the database
+            most_and_least_expensive[category] = MaxMin(
+                max=max(products, key=lambda product: (amounts[id(product)][0], -product.id)),
+                min=min(products, key=lambda product: (amounts[id(product)][0], product.id))
+            )
+
+        return cls(
+            customers=customers,
+            totals_spent={customer_id: to_decimal(*total) for customer_id, total in totals.items()},
+            top_spenders=[c for c in customers.values() if totals[c.id][0] == max_total],
+            category_top_spenders=category_top_spenders,
+            category_counts=dict(category_counts),
+            age_category_counts=dict(age_category_counts),
+            debts=debts,
+            unique_products=unique_products,
+            products_by_category=dict(products_by_category),
+            category_avg_price=category_avg_price,
+            most_and_least_expensive=most_and_least_expensive
+        )
+
+    @staticmethod
+    def _to_cents(value: Decimal) -> tuple[int, int] | None:
+        """
+        Converts an amount to integer cents.
+
+        :param value: The decimal amount.
+        :return: A tuple of the amount in cents and the decimal's exponent, or None if it has more than
+        two decimal places or is not a Decimal.
+        """
+        return to_cents(value) if isinstance(value, Decimal) else None
+
+    @staticmethod
+    def _to_decimal(value: Decimal) -> tuple[Decimal, int]:
+        """
+        Keeps an amount as a decimal, which carries its own exponent.
+
+        :param value: The decimal amount.
+        :return: A tuple of the amount and the exponent 0, which is not used.
+        """
+        return value, 0
+
+
+@dataclass
+class PurchaseIndexMaintainer:
+    """
+    Keeps a PurchaseIndex up to date with purchases added to or removed from its snapshot,
+    instead of rebuilding it from all purchases after every write.
+
+    Per-customer totals and debts, per-category spending and counts, and per-category price sums are updated
+    with the delta of each purchase. Customers ranked by total spending and by spending in each category,
+    and products ranked by price in each category, are kept in sorted lists, so the top spenders and
+    the most and least expensive products are found with binary searches instead of scans.
+    The rankings are built from the snapshot once, when the first change is applied.
+
+    The snapshot and the index are both replaced by updated copies, so responses being rendered from the previous
+    versions are not affected. Each batch of changes copies the dictionaries of the index, and the nested
+    dictionaries it changes, once, which is still much cheaper than a rebuild.
+    Amounts are summed as Decimals, so the results equal those of a rebuild for amounts with the same number
+    of decimal places, as stored in the database. Customers with the same total may be ordered differently, by id.
+    """
+    index: PurchaseIndex
+    _purchase_counts: dict[int, int] = field(default_factory=dict, repr=False)
+    _spend_ranking: list[tuple[Decimal, int]] = field(default_factory=list, repr=False)
+    _category_spent: dict[str, dict[int, Decimal]] = field(default_factory=dict, repr=False)
+    _category_rankings: dict[str, list[tuple[Decimal, int]]] = field(default_factory=dict, repr=False)
+    _product_buyers: dict[int, int] = field(default_factory=dict, repr=False)
+    _price_rankings: dict[str, list[tuple[Decimal, int]]] = field(default_factory=dict, repr=False)
+    _price_sums: dict[str, Decimal] = field(default_factory=dict, repr=False)
+    _copied: set[tuple[str, object]] = field(default_factory=set, repr=False)
+
+    @classmethod
+    def from_index(cls, index: PurchaseIndex, purchase: Purchase) -> 'PurchaseIndexMaintainer':
+        """
+        Builds the rankings and counters of an index from the snapshot it was built from.
+
+        :param index: The index to maintain.
+        :param purchase: The snapshot the index was built from.
+        :return: A PurchaseIndexMaintainer updating the given index.
+        """
+        maintainer = cls(index)
+        for customer, products in purchase.customers_and_their_products.items():
+            maintainer._purchase_counts[customer.id] = len(products)
+            for product in products:
+                spent = maintainer._category_spent.setdefault(product.category, {})
+                spent[customer.id] = spent.get(customer.id, Decimal(0)) + product.price
+                maintainer._product_buyers[product.id] = maintainer._product_buyers.get(product.id, 0) + 1
+
+        maintainer._spend_ranking = sorted((total, customer_id) for customer_id, total in index.totals_spent.items())
+        maintainer._category_rankings = {
+            category: sorted((amount, customer_id) for customer_id, amount in spent.items())
+            for category, spent in maintainer._category_spent.items()
+        }
+        for category, products in index.products_by_category.items():
+            maintainer._price_rankings[category] = sorted((product.price, product.id) for product in products)
+            maintainer._price_sums[category] = sum((product.price for product in products), Decimal(0))
+        return maintainer
+
+    def apply(self, purchase: Purchase, changes: list[PurchaseChange]) -> Purchase | None:
+        """
+        Applies changes to the snapshot the index was built from, and to the index.
+
+        The snapshot and the index reuse the Customer and Product objects they already hold for the ids
+        of the changes, so the changes are rejected if those differ, e.g. because a customer's cash
+        has been changed since the snapshot was loaded.
+
+        :param purchase: The snapshot the index reflects.
+        :param changes: The purchases added or removed.
+        :return: The updated snapshot, or None if the changes do not match the snapshot, in which case
+        neither the snapshot nor the index has been changed.
+        :raises ValueError: If the rankings of the maintainer do not match the index, in which case the maintainer
+        must be discarded.
+        """
+        customers = {}
+        products = {}
+        purchases = dict(purchase.customers_and_their_products)
+        copied = set()
+        resolved = []
+        for change in changes:
+            customer = customers.setdefault(change.customer.id,
+                                            self.index.customers.get(change.customer.id, change.customer))
+            product = products.setdefault(change.product.id,
+                                          self.index.unique_products.get(change.product.id, change.product))
+            if customer != change.customer or product != change.product:
+                return None
+
+            purchased = purchases.get(customer, [])
+            if customer not in copied:
+                purchased = purchases[customer] = list(purchased)
+                copied.add(customer)
+            if change.added:
+                purchased.append(product)
+            elif product in purchased:
+                purchased.remove(product)
+            else:
+                return None
+            resolved.append((customer, product, change.added))
+
+        for customer in copied:
+            if not purchases[customer]:
+                del purchases[customer]
+        self.index = PurchaseIndex(**{item.name: getattr(self.index, item.name).copy() for item in fields(self.index)})
+        self._copied.clear()
+        for customer, product, added in resolved:
+            self._apply_purchase(customer, product, added)
+        return Purchase(purchases)
+
+    def _apply_purchase(self, customer: Customer, product: Product, added: bool) -> None:
+        """
+        Applies the delta of a single purchase to the index.
+
+        :param customer: The customer who purchased the product.
+        :param product: The purchased product.
+        :param added: Whether the purchase has been added or removed.
+        """
+        index = self.index
+        price = product.price if added else -product.price
+        step = 1 if added else -1
+
+        old_total = index.totals_spent.get(customer.id)
+        if old_total is not None:
+            self._discard(self._spend_ranking, (old_total, customer.id))
+        count = self._purchase_counts.get(customer.id, 0) + step
+        if count:
+            # Summing starts from Decimal(0), as in a rebuild
+            total = (Decimal(0) if old_total is None else old_total) + price
+            self._purchase_counts[customer.id] = count
+            index.customers.setdefault(customer.id, customer)
+            index.totals_spent[customer.id] = total
+            index.debts[customer.id] = Decimal(0) if total < customer.cash else total - customer.cash
+            bisect.insort(self._spend_ranking, (total, customer.id))
+        else:
+            del self._purchase_counts[customer.id], index.customers[customer.id]
+            del index.totals_spent[customer.id], index.debts[customer.id]
+        index.top_spenders[:] = self._leaders(self._spend_ranking)
+
+        self._apply_category(customer, product.category, price, step)
+        self._apply_product(product, step)
+
+    def _apply_category(self, customer: Customer, category: str, price: Decimal, step: int) -> None:
+        """
+        Applies the delta of a purchase to the spending and counts of a customer in a category,
+        and of the customer's age group.
+
+        :param customer: The customer who purchased the product.
+        :param category: The category of the product.
+        :param price: The price of the product, negated if the purchase has been removed.
+        :param step: 1 if the purchase has been added, -1 if it has been removed.
+        """
+        index = self.index
+        spent = self._category_spent.setdefault(category, {})
+        ranking = self._category_rankings.setdefault(category, [])
+        counts = self._writable('category_counts', category)
+        old_spent = spent.get(customer.id)
+        if old_spent is not None:
+            self._discard(ranking, (old_spent, customer.id))
+
+        count = counts.get(customer, 0) + step
+        if count:
+            spent[customer.id] = (Decimal(0) if old_spent is None else old_spent) + price
+            counts[customer] = count
+            bisect.insort(ranking, (spent[customer.id], customer.id))
+        else:
+            del spent[customer.id], counts[customer]
+
+        if ranking:
+            index.category_top_spenders[category] = [] if ranking[-1][0] == 0 else self._leaders(ranking)
+        else:
+            del self._category_spent[category], self._category_rankings[category]
+            del index.category_counts[category], index.category_top_spenders[category]
+
+        age_counts = self._writable('age_category_counts', customer.age)
+        age_count = age_counts.get(category, 0) + step
+        if age_count:
+            age_counts[category] = age_count
+        else:
+            del age_counts[category]
+            if not age_counts:
+                del index.age_category_counts[customer.age]
+
+    def _apply_product(self, product: Product, step: int) -> None:
+        """
+        Applies a purchase to the number of buyers of a product. Products gaining their first buyer or losing
+        their last one are added to or removed from the prices of their category.
+
+        :param product: The purchased product.
+        :param step: 1 if the purchase has been added, -1 if it has been removed.
+        """
+        index = self.index
+        category = product.category
+        buyers = self._product_buyers.get(product.id, 0) + step
+        if buyers:
+            self._product_buyers[product.id] = buyers
+        else:
+            del self._product_buyers[product.id]
+
+        if step > 0 and buyers == 1:
+            index.unique_products[product.id] = product
+            index.products_by_category[category] = index.products_by_category.get(category, []) + [product]
+            bisect.insort(self._price_rankings.setdefault(category, []), (product.price, product.id))
+            self._price_sums[category] = self._price_sums.get(category, Decimal(0)) + product.price
+        elif step < 0 and buyers == 0:
+            del index.unique_products[product.id]
+            index.products_by_category[category] = [p for p in index.products_by_category[category]
+                                                    if p.id != product.id]
+            self._discard(self._price_rankings[category], (product.price, product.id))
+            self._price_sums[category] -= product.price
+        else:
+            return
+
+        ranking = self._price_rankings[category]
+        if not ranking:
+            del self._price_rankings[category], self._price_sums[category], index.products_by_category[category]
+            del index.category_avg_price[category], index.most_and_least_expensive[category]
+            return
+        index.category_avg_price[category] = self._price_sums[category] / Decimal(len(ranking))
+        # The most expensive product with the lowest id, as in a rebuild
+        most_expensive = ranking[bisect.bisect_left(ranking, (ranking[-1][0],))]
+        index.most_and_least_expensive[category] = MaxMin(max=index.unique_products[most_expensive[1]],
+                                                          min=index.unique_products[ranking[0][1]])
+
+    def _leaders(self, ranking: list[tuple[Decimal, int]]) -> list[Customer]:
+        """
+        Returns the customers sharing the highest amount of a ranking.
+
+        :param ranking: A sorted list of amounts and customer ids.
+        :return: The customers with the highest amount, ordered by id.
+        """
+        if not ranking:
+            return []
+        start = bisect.bisect_left(ranking, (ranking[-1][0],))
+        return [self.index.customers[customer_id] for _, customer_id in ranking[start:]]
+
+    def _writable(self, name: str, key: object) -> dict:
+        """
+        Returns a nested dictionary of the index which may be changed, copying it the first time it is changed
+        by a batch of changes, as the previous version of the index still holds it.
+
+        :param name: The name of the dictionary of the index holding the nested dictionaries.
+        :param key: The key of the nested dictionary, which is created if it does not exist.
+        :return: The nested dictionary.
+        """
+        mapping = getattr(self.index, name)
+        if key not in mapping or (name, key) not in self._copied:
+            mapping[key] = dict(mapping.get(key, {}))
+            self._copied.add((name, key))
+        return mapping[key]
+
+    @staticmethod
+    def _discard(ranking: list[tuple], entry: tuple) -> None:
+        """
+        Removes an entry from a sorted ranking.
+
+        :param ranking: The sorted list.
+        :param entry: The entry to remove.
+        :raises ValueError: If the entry is not in the list.
+        """
+        position = bisect.bisect_left(ranking, entry)
+        if position == len(ranking) or ranking[position] != entry:
+            raise ValueError(f'{entry!r} is not in the ranking')
+        del ranking[position]
@@ -0,0 +1,100 @@
+import functools
+import os
+import time
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from src.app.model import Purchase
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOAD_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+
+def render_metrics() -> bytes:
+    """
+    Renders the metrics in the Prometheus text format.
+
+    When PROMETHEUS_MULTIPROC_DIR is set, e.g. under gunicorn, every worker process writes its samples
+    to files in that directory, and the samples of all workers are aggregated here, whichever worker
+    answers the scrape. Otherwise only the metrics of this process are rendered.
+
+    :return: The exposition text.
+    """
+    multiprocess_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not multiprocess_dir:
+        return generate_latest(registry)
+
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry, path=multiprocess_dir)
+    return generate_latest(collector_registry)
+
+
+def instrument_loads(repository, source: str) -> None:
+    """
+    Records the duration and the number of rows of every `get_purchases()` call of a repository,
+    by replacing the method of the given instance with a timed one.
+
+    :param repository: The repository whose loads are recorded.
+    :param source: The name of the source, which labels the metrics, e.g. "csv".
+    """
+    get_purchases = repository.get_purchases
+
+    @functools.wraps(get_purchases)
+    def timed_get_purchases() -> Purchase:
+        start = time.perf_counter()
+        try:
+            purchase = get_purchases()
+        except Exception:
+            repository_load_errors.labels(source).inc()
+            raise
+        repository_load_seconds.labels(source).observe(time.perf_counter() - start)
+        repository_rows.labels(source).set(sum(map(len, purchase.customers_and_their_products.values())))
+        return purchase
+
+    repository.get_purchases = timed_get_purchases
+
+
+# ======================================================================================================================
+# The metrics are always defined, but are only recorded when METRICS_ENABLED is set, since the instrumentation
+# is installed only then; disabled metrics cost nothing on the request path
+metrics_enabled = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+
+# The metrics of this process. In multiprocess mode their samples are also written to PROMETHEUS_MULTIPROC_DIR,
+# where counters and histograms are summed over all workers, and gauges are reported per worker with a pid label
+registry = CollectorRegistry()
+
+request_seconds = Histogram(
+    'purchases_request_duration_seconds', 'Time spent handling requests until the response is returned.',
+    ('method', 'route', 'status'), registry=registry
+)
+repository_load_seconds = Histogram(
+    'purchases_repository_load_duration_seconds', 'Time spent in get_purchases() of the repository.',
+    ('source',), buckets=LOAD_BUCKETS, registry=registry
+)
+repository_rows = Gauge(
+    'purchases_repository_rows', 'Number of purchased products returned by the last get_purchases() call.',
+    ('source',), multiprocess_mode='liveall', registry=registry
+)
+repository_load_errors = Counter(
+    'purchases_repository_load_errors_total', 'Number of get_purchases() calls which raised an exception.',
+    ('source',), registry=registry
+)
+sql_queries = Counter(
+    'purchases_sql_queries_total', 'Number of SQL statements executed.', registry=registry
+)
+request_sql_queries = Histogram(
+    'purchases_request_sql_queries', 'Number of SQL statements executed per request.',
+    ('route',), buckets=QUERY_COUNT_BUCKETS, registry=registry
+)
+cache_hits = Counter(
+    'purchases_cache_hits_total', 'Number of cache lookups answered from the cache.', ('cache',), registry=registry
+)
+cache_misses = Counter(
+    'purchases_cache_misses_total', 'Number of cache lookups which were not answered from the cache.', ('cache',),
+    registry=registry
+)
+cache_hit_ratio = Gauge(
+    'purchases_cache_hit_ratio', 'Share of cache lookups answered from the cache.', ('cache',),
+    multiprocess_mode='liveall', registry=registry
+)
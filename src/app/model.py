@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from decimal import Decimal
 
 
-@dataclass(frozen=True, eq=True)
+@dataclass(frozen=True, eq=True, slots=True)
 class Customer:
     """
     Represents a customer with their personal details and cash balance.
@@ -28,10 +28,11 @@ class Customer:
         }
 
 
-@dataclass(frozen=True, eq=True)
+@dataclass(frozen=True, eq=True, slots=True)
 class Product:
     """
     Represents a product with its details.
+    Loaders create a single instance per product and share it between all customers who purchased it.
     """
     id: int
     name: str
@@ -70,3 +71,13 @@ class Purchase:
             for customer, products in self.customers_and_their_products.items()
         }
 
+
+@dataclass(frozen=True, slots=True)
+class PurchaseChange:
+    """
+    Represents a purchase which has been added to or removed from a data store,
+    so derived data can be updated without reloading all purchases.
+    """
+    customer: Customer
+    product: Product
+    added: bool
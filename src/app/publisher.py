@@ -0,0 +1,75 @@
+import argparse
+import contextlib
+import logging
+import os
+import signal
+import threading
+from flask import Flask
+from dotenv import load_dotenv
+from src.app.data.snapshot import SnapshotPublisher
+from src.app.refresher import SnapshotRefresher
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Command line entry point of the snapshot publisher, the single process loading purchases from SOURCE
+    when SHARED_SNAPSHOT is enabled. It publishes them to SNAPSHOT_FILE every REFRESH_INTERVAL seconds,
+    and the workers attach to that file instead of loading the source themselves.
+
+    The publisher is started by the gunicorn master (see gunicorn.conf.py) or can run as a sidecar process.
+
+    Usage: python -m src.app.publisher [--once]
+
+    :param argv: The command line arguments, defaults to sys.argv.
+    :raises ValueError: If SNAPSHOT_FILE is not set or SOURCE is itself a snapshot file.
+    """
+    parser = argparse.ArgumentParser(description='Publish purchases loaded from SOURCE to the shared SNAPSHOT_FILE.')
+    parser.add_argument('--once', action='store_true', help='publish a single snapshot and exit')
+    args = parser.parse_args(argv)
+
+    from src.app.configuration import repo_type, source_repository
+
+    snapshot_file = os.getenv("SNAPSHOT_FILE")
+    if not snapshot_file:
+        raise ValueError("SNAPSHOT_FILE must be set to publish a shared snapshot")
+    if repo_type == "snapshot":
+        raise ValueError("A snapshot file source cannot be published")
+
+    context = contextlib.nullcontext
+    if repo_type in ("sql", "sqlite"):
+        # The SQL repository needs an application context with a configured database
+        from src.app.create_app import configure_database
+        app = Flask(__name__)
+        configure_database(app)
+        context = app.app_context
+
+    publisher = SnapshotPublisher(loader=source_repository.get_purchases, path=snapshot_file)
+    if args.once:
+        with context():
+            publisher.refresh()
+        return
+
+    refresher = SnapshotRefresher(
+        service=publisher,
+        interval=float(os.getenv("REFRESH_INTERVAL") or "60") or 60.0,
+        jitter=float(os.getenv("REFRESH_JITTER", "0.1")),
+        backoff=float(os.getenv("REFRESH_BACKOFF", "5")),
+        max_backoff=float(os.getenv("REFRESH_MAX_BACKOFF", "300"))
+    )
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+
+    refresher.start(context=context)
+    try:
+        stopped.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        refresher.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import contextlib
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, ContextManager
+from src.app.service import PurchasesService
+from src.app.data.snapshot import SnapshotPublisher
+logging.basicConfig(level=logging.INFO)
+
+
+@dataclass
+class SnapshotRefresher:
+    """
+    Background thread which periodically reloads the purchase snapshot of a service and swaps it in,
+    so request handlers never wait for the data source. A SnapshotPublisher can be refreshed the same way
+    to publish the snapshot to other processes.
+
+    Refreshes are spaced `interval` seconds apart, randomly shifted by up to `jitter` of the interval
+    so that several workers do not hit the source at the same moment. After a failed refresh the previous
+    snapshot keeps being served and the next attempt is delayed by `backoff` seconds, doubling
+    with every consecutive failure up to `max_backoff`.
+    """
+    service: PurchasesService | SnapshotPublisher
+    interval: float = 60.0
+    jitter: float = 0.1
+    backoff: float = 5.0
+    max_backoff: float = 300.0
+    refreshes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    last_error: str | None = None
+    _last_success: float | None = field(default=None, repr=False)
+    _next_refresh: float | None = field(default=None, repr=False)
+    _stop: threading.Event = field(default_factory=threading.Event, repr=False)
+    _thread: threading.Thread | None = field(default=None, repr=False)
+
+    def start(self, context: Callable[[], ContextManager] = contextlib.nullcontext) -> None:
+        """
+        Starts refreshing in a daemon thread. The first refresh happens immediately.
+
+        :param context: A callable returning the context every refresh runs in, e.g. a Flask app's `app_context`,
+        which the SQL repository needs.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(context,), name='snapshot-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stops the refresher thread after the refresh in progress, if any, has finished.
+
+        :param timeout: The maximum number of seconds to wait for the thread to finish.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def refresh(self) -> bool:
+        """
+        Reloads the snapshot once, keeping the current snapshot if loading fails.
+
+        :return: True if the new snapshot was swapped in, False if loading failed.
+        """
+        try:
+            self.service.refresh()
+        except Exception as error:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error)
+            logging.exception(f'Refreshing the purchase snapshot failed {self.consecutive_failures} time(s) in a row')
+            return False
+
+        self.refreshes += 1
+        self.consecutive_failures = 0
+        self.last_error = None
+        self._last_success = time.monotonic()
+        return True
+
+    def next_delay(self) -> float:
+        """
+        Computes the number of seconds until the next refresh, based on the outcome of the last one.
+
+        :return: The delay in seconds, including jitter.
+        """
+        if self.consecutive_failures:
+            delay = min(self.backoff * 2 ** (self.consecutive_failures - 1), self.max_backoff)
+        else:
+            delay = self.interval
+        return max(delay * (1 + random.uniform(-self.jitter, self.jitter)), 0.0)
+
+    def status(self) -> dict[str, object]:
+        """
+        Describes the state of the refresher and of the snapshot it maintains.
+
+        :return: A dictionary with the snapshot version and age, the refresh counters, the seconds since
+        the last successful refresh and until the next one, and the last error message.
+        """
+        now = time.monotonic()
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'interval': self.interval,
+            'snapshot_version': self.service.snapshot_cache.version,
+            'snapshot_age': self.service.snapshot_cache.age(),
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'last_success_age': None if self._last_success is None else now - self._last_success,
+            'next_refresh_in': None if self._next_refresh is None else max(self._next_refresh - now, 0.0),
+            'last_error': self.last_error
+        }
+
+    def _run(self, context: Callable[[], ContextManager]) -> None:
+        """
+        Refreshes the snapshot until the refresher is stopped.
+
+        :param context: A callable returning the context every refresh runs in.
+        """
+        while not self._stop.is_set():
+            with context():
+                self.refresh()
+            delay = self.next_delay()
+            self._next_refresh = time.monotonic() + delay
+            self._stop.wait(delay)
+        self._next_refresh = None
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Derives an entity tag from a rendered response body.
+
+    The tag depends only on the body, so every worker process, whatever its own snapshot version,
+    tags identical responses identically.
+
+    :param body: The response body.
+    :return: The entity tag, without quotes.
+    """
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+@dataclass
+class ResponseCache:
+    """
+    Bounded LRU cache of rendered response bodies and their entity tags, keyed on (route, arguments, version).
+
+    The snapshot version is part of the key, so bodies rendered from a previous snapshot are never served again
+    and are evicted as new ones are added. A `maxsize` of zero or less disables caching.
+    """
+    maxsize: int = 256
+    hits: int = 0
+    misses: int = 0
+    _entries: OrderedDict[tuple, tuple[bytes, str]] = field(default_factory=OrderedDict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get(self, key: tuple) -> tuple[bytes, str] | None:
+        """
+        Returns a cached response and marks it as recently used.
+
+        :param key: The (route, arguments, version) key of the response.
+        :return: A tuple of the body and its entity tag, or None if the response is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, body: bytes) -> tuple[bytes, str]:
+        """
+        Stores a rendered response, evicting the least recently used ones beyond `maxsize`.
+
+        :param key: The (route, arguments, version) key of the response.
+        :param body: The rendered response body.
+        :return: A tuple of the body and its entity tag.
+        """
+        entry = (body, make_etag(body))
+        if self.maxsize <= 0:
+            return entry
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        """
+        Removes all cached responses.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the cache counters.
+
+        :return: A dictionary with hit and miss counts, the number of cached responses and the maximum size.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize
+        }
+
+
+# ======================================================================================================================
+response_cache = ResponseCache(maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "256")))
@@ -0,0 +1,123 @@
+import threading
+import time
+from flask import Blueprint, Response, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.app.configuration import purchase_service
+from src.app.metrics import (
+    cache_hit_ratio,
+    cache_hits,
+    cache_misses,
+    render_metrics,
+    request_seconds,
+    request_sql_queries,
+    sql_queries
+)
+from src.app.routes.caching import response_cache
+
+metrics_blueprint = Blueprint('metrics', __name__)
+
+
+def cache_stats() -> dict[str, dict]:
+    """
+    Collects the counters of the caches on the request path.
+
+    :return: The counters of the snapshot cache and of the response cache by the name of the cache.
+    """
+    return {'snapshot': purchase_service.snapshot_cache.stats(), 'responses': response_cache.stats()}
+
+
+def hit_ratio(stats: dict) -> float:
+    """
+    Computes the share of cache lookups answered from the cache.
+
+    :param stats: The counters of a cache.
+    :return: The hit ratio, or 0 if the cache has not been used.
+    """
+    lookups = stats['hits'] + stats['misses']
+    return stats['hits'] / lookups if lookups else 0
+
+
+def record_cache_stats() -> None:
+    """
+    Adds the cache lookups since the last call to the cache counters, and sets the hit ratios.
+
+    The caches keep their own counters, which are read here rather than counted on the lookup path. The lookups
+    are added as increments, so in multiprocess mode the counters are summed over the caches of all workers.
+    A cache counter which went backwards, e.g. after the cache was cleared, is taken as the new baseline.
+    """
+    with recorded_cache_lock:
+        for name, stats in cache_stats().items():
+            recorded = recorded_cache_stats.get(name, {'hits': 0, 'misses': 0})
+            cache_hits.labels(name).inc(max(stats['hits'] - recorded['hits'], 0))
+            cache_misses.labels(name).inc(max(stats['misses'] - recorded['misses'], 0))
+            cache_hit_ratio.labels(name).set(hit_ratio(stats))
+            recorded_cache_stats[name] = {'hits': stats['hits'], 'misses': stats['misses']}
+
+
+def count_query(*args) -> None:
+    """
+    Counts an SQL statement executed by any engine, and the statements of the current request.
+    Registered as a `before_cursor_execute` event listener, whose arguments are not used.
+    """
+    sql_queries.inc()
+    if has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+
+
+def listen_to_queries(state) -> None:
+    """
+    Starts counting SQL statements when the blueprint is registered, so they are not counted while metrics are disabled.
+
+    :param state: The registration state of the blueprint, which is not used.
+    """
+    if not event.contains(Engine, 'before_cursor_execute', count_query):
+        event.listen(Engine, 'before_cursor_execute', count_query)
+
+
+@metrics_blueprint.before_app_request
+def start_request_timer() -> None:
+    """
+    Records the start of a request and resets its SQL statement count.
+    """
+    g.metrics_start = time.perf_counter()
+    g.sql_queries = 0
+
+
+@metrics_blueprint.after_app_request
+def observe_request(response: Response) -> Response:
+    """
+    Records the latency of a request and the number of SQL statements it executed by its route,
+    and the cache lookups it made. Streamed responses are measured until they are returned, not until they are sent.
+
+    :param response: The response of the request.
+    :return: The same response.
+    """
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        request_seconds.labels(request.method, route, str(response.status_code)).observe(time.perf_counter() - start)
+        request_sql_queries.labels(route).observe(g.pop('sql_queries', 0))
+    record_cache_stats()
+    return response
+
+
+@metrics_blueprint.route('/metrics')
+def metrics() -> Response:
+    """
+    Route to get the metrics of the application in the Prometheus text format.
+
+    :return: A plain text response with the request latencies, repository loads, SQL statement counts
+    and cache hit rates, aggregated over all worker processes in multiprocess mode.
+    """
+    record_cache_stats()
+    return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
+# ======================================================================================================================
+metrics_blueprint.record_once(listen_to_queries)
+
+# The cache counters already added to the cache metrics, by the name of the cache
+recorded_cache_stats: dict[str, dict] = {}
+recorded_cache_lock = threading.Lock()
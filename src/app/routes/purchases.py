@@ -1,11 +1,98 @@
-from flask import jsonify, Response, Blueprint
+import csv
+import functools
+import json
+import time
+from typing import Callable, Iterable, Iterator
+from flask import current_app, jsonify, request, stream_with_context, Response, Blueprint
 import logging
-from src.app.configuration import purchase_service
+from src.app.configuration import purchase_service, ingest_chunk_size, repo_type
+from src.app.data.database.repository import customer_product_repository_sql
+from src.app.data.repository import CustomerProductRepositoryCSV, CustomerProductRepositoryJSON
+from src.app.serializer import serializer
+from src.app.routes.caching import make_etag, response_cache
+from src.app.routes.queries import PURCHASE_QUERIES
+from src.app.utils import encode_cursor, parse_page_arguments
+from src.app.routes.streaming import NDJSON_MIMETYPE, chunk_lines
 from flask_restful import Resource
 
 logging.basicConfig(level=logging.INFO)
 
 
+def wants_ndjson() -> bool:
+    """
+    Checks whether the client prefers a newline-delimited JSON stream to a single JSON document.
+
+    :return: True if NDJSON is the best match for the request's Accept header.
+    """
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def ndjson_response(lines: Iterable[bytes]) -> Response:
+    """
+    Creates a streamed NDJSON response. The lines are serialized while the response is sent.
+
+    :param lines: An iterable of serialized lines, each ending with a newline.
+    :return: A streamed response with the NDJSON mimetype.
+    """
+    return Response(stream_with_context(chunk_lines(lines)), mimetype=NDJSON_MIMETYPE)
+
+
+def json_response(payload: dict, status: int = 200) -> Response:
+    """
+    Creates a JSON response with the serializer, which produces the same body as `jsonify` without debug mode.
+    In debug mode `jsonify` pretty-prints the response, so it is used instead.
+
+    :param payload: The response data.
+    :param status: The status code.
+    :return: The JSON response.
+    """
+    if current_app.debug:
+        response = jsonify(payload)
+        response.status_code = status
+        return response
+    return Response(serializer.dumps(payload), status=status, mimetype='application/json')
+
+
+def cached_response(view: Callable[..., Response]) -> Callable[..., Response]:
+    """
+    Decorates a view returning a JSON response which is a pure function of the current data.
+
+    Rendered bodies are kept in the response cache under the route, its arguments and the data version, and
+    every response carries an ETag derived from its body. Requests whose If-None-Match header contains the current
+    ETag receive an empty 304 response. NDJSON streams and responses of services without a data version,
+    i.e. pushed down to the database, are not stored, and debug mode disables both.
+
+    :param view: The view function.
+    :return: The decorated view function.
+    """
+    @functools.wraps(view)
+    def wrapper(**kwargs) -> Response:
+        if current_app.debug or wants_ndjson():
+            response = view(**kwargs)
+            response.vary.add('Accept')
+            return response
+
+        version = purchase_service.get_data_version()
+        key = (request.endpoint, tuple(sorted(kwargs.items())), version)
+        entry = response_cache.get(key) if version is not None else None
+        if entry is None:
+            rendered = view(**kwargs)
+            if rendered.status_code != 200:
+                return rendered
+            entry = response_cache.put(key, rendered.get_data()) if version is not None \
+                else (rendered.get_data(), make_etag(rendered.get_data()))
+
+        body, etag = entry
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        # Clients and proxies revalidate with If-None-Match before reusing a response
+        response.cache_control.no_cache = True
+        response.vary.add('Accept')
+        return response.make_conditional(request)
+
+    return wrapper
+
+
 class DataResource(Resource):
     """
     Resource class for handling requests related to purchase data.
@@ -17,18 +104,53 @@ class DataResource(Resource):
         """
         Handles GET requests to retrieve purchase data.
 
+        Without query parameters, all purchases are returned. With a `limit` and/or a `cursor`, a page of customers
+        ordered by id is returned together with a `next_cursor`, which is passed as `cursor` to get the next page
+        and is null on the last page.
+
+        Without pagination, clients accepting `application/x-ndjson` receive a stream with one line per customer,
+        {"customer_id": ..., "products": [...]}, serialized while it is sent.
+
         :return: A JSON response containing the purchase data if available, or a message indicating no data is available.
         """
+        if 'limit' in request.args or 'cursor' in request.args:
+            return self._get_page()
+        if wants_ndjson():
+            return ndjson_response(serializer.purchase_lines(purchase_service.iter_purchases()))
+
         data = purchase_service.get_all_purchases()
-        if data:
+        if not data:
+            return {'message': 'No SQL data available'}, 500
+        # Flask-RESTful pretty-prints responses in debug mode, which the serializer does not
+        if current_app.debug:
             return {'purchases': data.to_dict()}, 200
-        return {'message': 'No SQL data available'}, 500
+        return Response(serializer.purchases(data), mimetype='application/json')
+
+    @staticmethod
+    def _get_page() -> Response:
+        """
+        Handles GET requests for a page of purchase data.
+
+        :return: A JSON response containing the page and the cursor of the next page,
+        or a message and a 400 status code if the limit or the cursor is invalid.
+        """
+        try:
+            limit, after = parse_page_arguments(request.args.get('limit'), request.args.get('cursor'))
+        except ValueError as error:
+            return {'message': str(error)}, 400
+
+        page, last_id = purchase_service.get_purchases_page(limit, after)
+        next_cursor = None if last_id is None else encode_cursor(last_id)
+        if current_app.debug:
+            return {'purchases': page.to_dict(), 'next_cursor': next_cursor}, 200
+        return Response(serializer.purchases_page(page, next_cursor), mimetype='application/json')
 
 
 purchases_blueprint = Blueprint('purchases', __name__, url_prefix='/purchases')
 
 
 @purchases_blueprint.route('/total_spent/<int:id>', methods=['GET'])
+@cached_response
 def get_customers_total_spent(id: int) -> Response:
     """
     Returns the total amount spent by a customer with the given ID.
@@ -38,10 +160,11 @@ def get_customers_total_spent(id: int) -> Response:
     """
 
     total_spent = purchase_service.get_customers_total_spent(id)
-    return jsonify({'total_spent': float(total_spent)}), 200
+    return json_response(PURCHASE_QUERIES['get_customers_total_spent'].payload(total_spent))
 
 
 @purchases_blueprint.route('/most_spending', methods=['GET'])
+@cached_response
 def get_customers_who_spent_most() -> Response:
     """
     Returns the customer(s) who have spent the most across all categories.
@@ -50,10 +173,11 @@ def get_customers_who_spent_most() -> Response:
     """
 
     top_spenders = purchase_service.get_customer_who_spent_the_most()
-    return jsonify({'top_spenders': [customer.to_dict() for customer in top_spenders]}), 200
+    return json_response(PURCHASE_QUERIES['get_customers_who_spent_most'].payload(top_spenders))
 
 
 @purchases_blueprint.route('/most_spending_in_category/<string:category>', methods=['GET'])
+@cached_response
 def get_most_spending_in_category(category: str) -> Response:
     """
     Returns the customer(s) who have spent the most in a specific category.
@@ -63,10 +187,11 @@ def get_most_spending_in_category(category: str) -> Response:
     """
 
     top_spenders = purchase_service.get_most_spending_in_category(category)
-    return jsonify({'top_spenders': [customer.to_dict() for customer in top_spenders]}), 200
+    return json_response(PURCHASE_QUERIES['get_most_spending_in_category'].payload(top_spenders))
 
 
 @purchases_blueprint.route('/age_category_preference', methods=['GET'])
+@cached_response
 def get_age_category_preference() -> Response:
     """
     Returns a summary of age groups and their most frequently purchased product categories.
@@ -74,10 +199,12 @@ def get_age_category_preference() -> Response:
     :return: JSON response with the age-category preferences.
     """
 
-    return jsonify({'age_category_preference': purchase_service.get_age_category_preference()}), 200
+    preferences = purchase_service.get_age_category_preference()
+    return json_response(PURCHASE_QUERIES['get_age_category_preference'].payload(preferences))
 
 
 @purchases_blueprint.route('/category_avg_price', methods=['GET'])
+@cached_response
 def get_category_and_avg_price() -> Response:
     """
     Returns the average price of products in each category.
@@ -85,10 +212,12 @@ def get_category_and_avg_price() -> Response:
     :return: JSON response with category average prices.
     """
 
-    return jsonify({'category_avg_price': purchase_service.get_category_and_avg_price()}), 200
+    avg_prices = purchase_service.get_category_and_avg_price()
+    return json_response(PURCHASE_QUERIES['get_category_and_avg_price'].payload(avg_prices))
 
 
 @purchases_blueprint.route('/most_and_least_expensive', methods=['GET'])
+@cached_response
 def get_most_and_least_expensive_in_category() -> Response:
     """
     Returns the most and least expensive products in each category.
@@ -96,10 +225,12 @@ def get_most_and_least_expensive_in_category() -> Response:
     :return: JSON response with most and least expensive products.
     """
 
-    return jsonify({'most_and_least_expensive': purchase_service.get_most_and_least_expensive_in_category()}), 200
+    products = purchase_service.get_most_and_least_expensive_in_category()
+    return json_response(PURCHASE_QUERIES['get_most_and_least_expensive_in_category'].payload(products))
 
 
 @purchases_blueprint.route('/most_frequent_category', methods=['GET'])
+@cached_response
 def get_most_frequent_category_for_customers() -> Response:
     """
     Returns the most frequently purchased product category for each customer.
@@ -107,11 +238,12 @@ def get_most_frequent_category_for_customers() -> Response:
     :return: JSON response with most frequently purchased categories.
     """
 
-    return jsonify(
-        {'most_frequent_category_for_customer': purchase_service.get_most_frequent_category_for_customers()}), 200
+    most_frequent = purchase_service.get_most_frequent_category_for_customers()
+    return json_response(PURCHASE_QUERIES['get_most_frequent_category_for_customers'].payload(most_frequent))
 
 
 @purchases_blueprint.route('/can_pay/<int:customer_id>', methods=['GET'])
+@cached_response
 def can_customer_pay(customer_id: int) -> Response:
     """
     Checks whether a customer with the given ID has enough cash to pay for their purchases.
@@ -120,10 +252,12 @@ def can_customer_pay(customer_id: int) -> Response:
     :return: JSON response indicating if the customer can pay or not.
     """
 
-    return jsonify({'can_pay': purchase_service.can_customer_pay(customer_id)}), 200
+    can_pay = purchase_service.can_customer_pay(customer_id)
+    return json_response(PURCHASE_QUERIES['can_customer_pay'].payload(can_pay))
 
 
 @purchases_blueprint.route('/get_debt/<int:customer_id>', methods=['GET'])
+@cached_response
 def get_customers_debt(customer_id: int) -> Response:
     """
     Returns the total debt for a customer with the given ID.
@@ -132,16 +266,87 @@ def get_customers_debt(customer_id: int) -> Response:
     :return: JSON response with the customer's debt or an error message.
     """
 
-    return jsonify({'debt': purchase_service.get_customers_debt(customer_id)}), 200
+    debt = purchase_service.get_customers_debt(customer_id)
+    return json_response(PURCHASE_QUERIES['get_customers_debt'].payload(debt))
 
 
 @purchases_blueprint.route('/indebted_customers', methods=['GET'])
+@cached_response
 def get_customers_with_debts() -> Response:
     """
     Returns a dictionary of customers with the amount of debt they owe.
+    Clients accepting `application/x-ndjson` receive one line per customer, {"customer_id": ..., "debt": ...}.
 
     :param source: The data source type ('csv', 'json', 'sql').
     :return: JSON response with customers and their debts.
     """
 
-    return jsonify({'indebted_customers': purchase_service.get_customers_with_debts()}), 200
+    debts = purchase_service.get_customers_with_debts()
+    if wants_ndjson():
+        return ndjson_response(PURCHASE_QUERIES['get_customers_with_debts'].lines(debts))
+    return json_response(PURCHASE_QUERIES['get_customers_with_debts'].payload(debts))
+
+
+def csv_upload_lines(stream: Iterable[bytes]) -> Iterator[str]:
+    """
+    Decodes the lines of a CSV upload.
+
+    :param stream: The lines of the request body.
+    :return: An iterator over the decoded lines.
+    :raises csv.Error: If a line contains a NUL byte, which the csv module no longer rejects itself.
+    """
+    for line in stream:
+        if b'\0' in line:
+            raise csv.Error('line contains NUL')
+        yield line.decode('utf-8')
+
+
+@purchases_blueprint.route('/ingest', methods=['POST'])
+def ingest_purchases() -> Response:
+    """
+    Writes a batch of purchases to the database, updating the customers and products which already exist.
+
+    The body is either CSV (`text/csv`) with the columns of the CSV source, or NDJSON (`application/x-ndjson`)
+    with one entry of the JSON source per line. It is parsed and written `chunk_size` rows or entries at a time,
+    a query parameter defaulting to INGEST_CHUNK_SIZE, all within a single transaction. Only the "sql" and
+    "sqlite" sources read the database written to, so the other sources refuse the upload.
+
+    :return: JSON response with the number of customer, product and purchase rows affected as reported by
+    the database, their total, the seconds taken and the rows affected per second, or a message with a 409 status
+    code if the source is not a database, or with a 400 or 415 status code if the chunk size or the body is invalid.
+    """
+    if repo_type not in ("sql", "sqlite"):
+        return json_response({'message': f'Purchases cannot be ingested into the {repo_type} source'}, 409)
+
+    try:
+        chunk_size = int(request.args.get('chunk_size', ingest_chunk_size))
+    except ValueError:
+        chunk_size = 0
+    if chunk_size < 1:
+        return json_response({'message': 'The chunk size must be a positive number'}, 400)
+
+    if request.mimetype == 'text/csv':
+        repository_type = CustomerProductRepositoryCSV
+        # Strict parsing rejects malformed quoting, e.g. an unterminated quoted field, instead of guessing
+        items = csv.DictReader(csv_upload_lines(request.stream), strict=True)
+    elif request.mimetype == NDJSON_MIMETYPE:
+        repository_type = CustomerProductRepositoryJSON
+        items = (json.loads(line) for line in request.stream if line.strip())
+    else:
+        return json_response({'message': f'Expected text/csv or {NDJSON_MIMETYPE}'}, 415)
+
+    start = time.perf_counter()
+    try:
+        counts = customer_product_repository_sql.upsert_purchases(repository_type.iter_batches(items, chunk_size),
+                                                                  chunk_size)
+    except (KeyError, ValueError, TypeError, ArithmeticError, csv.Error) as error:
+        return json_response({'message': f'Invalid purchase data: {error!r}'}, 400)
+    seconds = time.perf_counter() - start
+
+    rows = sum(counts.values())
+    return json_response({
+        **counts,
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(rows / seconds) if seconds > 0 else None
+    })
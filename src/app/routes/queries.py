@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+from src.app.model import Customer
+from src.app.serializer import serializer
+
+
+def customers_to_dict(customers: list[Customer]) -> list[dict]:
+    """
+    Converts a list of customers to their JSON representation.
+
+    :param customers: The customers.
+    :return: A list of dictionaries, one per customer.
+    """
+    return [customer.to_dict() for customer in customers]
+
+
+@dataclass(frozen=True)
+class PurchaseQuery:
+    """
+    A /purchases route answered by a single method of the purchases service, whose response is a pure function
+    of the current data.
+
+    The route functions of the Flask application build their payloads with the queries in PURCHASE_QUERIES,
+    and the ASGI application serves the same rules from them, so both respond with the same payloads.
+    """
+    rule: str
+    method: str
+    key: str
+    to_json: Callable[[Any], Any] | None = None
+    lines: Callable[[Any], Iterator[bytes]] | None = None
+
+    def payload(self, result: Any) -> dict:
+        """
+        Builds the response payload from the result of the service method.
+
+        :param result: The result of the service method.
+        :return: A dictionary with the result, converted by `to_json` if given, under `key`.
+        """
+        return {self.key: result if self.to_json is None else self.to_json(result)}
+
+
+# The /purchases queries by the endpoint of their Flask route function. The rules are relative to /purchases,
+# and their arguments are passed to the service method in order. Queries with `lines` are streamed as NDJSON
+# to clients preferring it.
+PURCHASE_QUERIES: dict[str, PurchaseQuery] = {
+    'get_customers_total_spent': PurchaseQuery(
+        '/total_spent/<int:id>', 'get_customers_total_spent', 'total_spent', float
+    ),
+    'get_customers_who_spent_most': PurchaseQuery(
+        '/most_spending', 'get_customer_who_spent_the_most', 'top_spenders', customers_to_dict
+    ),
+    'get_most_spending_in_category': PurchaseQuery(
+        '/most_spending_in_category/<string:category>', 'get_most_spending_in_category', 'top_spenders',
+        customers_to_dict
+    ),
+    'get_age_category_preference': PurchaseQuery(
+        '/age_category_preference', 'get_age_category_preference', 'age_category_preference'
+    ),
+    'get_category_and_avg_price': PurchaseQuery(
+        '/category_avg_price', 'get_category_and_avg_price', 'category_avg_price'
+    ),
+    'get_most_and_least_expensive_in_category': PurchaseQuery(
+        '/most_and_least_expensive', 'get_most_and_least_expensive_in_category', 'most_and_least_expensive'
+    ),
+    'get_most_frequent_category_for_customers': PurchaseQuery(
+        '/most_frequent_category', 'get_most_frequent_category_for_customers', 'most_frequent_category_for_customer'
+    ),
+    'can_customer_pay': PurchaseQuery(
+        '/can_pay/<int:customer_id>', 'can_customer_pay', 'can_pay'
+    ),
+    'get_customers_debt': PurchaseQuery(
+        '/get_debt/<int:customer_id>', 'get_customers_debt', 'debt'
+    ),
+    'get_customers_with_debts': PurchaseQuery(
+        '/indebted_customers', 'get_customers_with_debts', 'indebted_customers', lines=serializer.debt_lines
+    )
+}
@@ -0,0 +1,27 @@
+from typing import Iterable, Iterator
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+# Number of bytes of serialized lines collected before they are sent as one chunk
+CHUNK_SIZE = 64 * 1024
+
+
+def chunk_lines(lines: Iterable[bytes], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Collects serialized lines into chunks of about `chunk_size` bytes.
+
+    :param lines: An iterable of complete lines, each ending with a newline.
+    :param chunk_size: The number of bytes collected before a chunk is yielded.
+    :return: An iterator over chunks of complete lines.
+    """
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+
+    if chunk:
+        yield b''.join(chunk)
@@ -0,0 +1,262 @@
+import dataclasses
+import json
+import os
+import threading
+from decimal import Decimal
+from json.encoder import encode_basestring_ascii
+from typing import Any, Iterable, Iterator
+from src.app.model import Purchase, Customer, Product
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def default(o: Any) -> Any:
+    """
+    Converts the values the json module cannot serialize, the same way as Flask's JSON provider.
+
+    :param o: The value to convert.
+    :return: A JSON serializable value.
+    :raises TypeError: If the value cannot be converted.
+    """
+    if isinstance(o, Decimal):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class JSONBackend:
+    """
+    Encoder producing the same bytes as Flask's `jsonify`: sorted keys, compact separators, ASCII only,
+    decimals as strings and dataclasses as dictionaries. This implementation uses the json module.
+    """
+
+    def __init__(self) -> None:
+        self._encoder = json.JSONEncoder(sort_keys=True, separators=(',', ':'), default=default)
+
+    def dumps(self, payload: dict) -> bytes:
+        """
+        Encodes a response payload.
+
+        :param payload: The response data.
+        :return: The JSON encoded payload, without a trailing newline.
+        """
+        return self._encoder.encode(payload).encode('ascii')
+
+
+class OrjsonBackend(JSONBackend):
+    """
+    JSONBackend encoding with orjson where it is known to produce identical bytes,
+    and with the json module otherwise.
+
+    orjson does not escape non-ASCII characters and DEL, sorts non-string keys as strings and formats floats
+    in exponent notation differently, so payloads with top-level floats, nested non-string keys or any such
+    character in the output are encoded with the json module. Mappings of integers to scalars, like the debts
+    of customers by id, are sorted numerically and embedded as precomputed fragments instead.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        import orjson
+        self._orjson = orjson
+        self._options = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def dumps(self, payload: dict) -> bytes:
+        """
+        Encodes a response payload.
+
+        :param payload: The response data.
+        :return: The JSON encoded payload, without a trailing newline.
+        """
+        if any(isinstance(value, float) for value in payload.values()):
+            return super().dumps(payload)
+        try:
+            encoded = self._orjson.dumps(
+                {key: self._int_mapping_fragment(value) for key, value in payload.items()},
+                default=default, option=self._options
+            )
+        except TypeError:
+            return super().dumps(payload)
+        return encoded if encoded.isascii() and b'\x7f' not in encoded else super().dumps(payload)
+
+    def _int_mapping_fragment(self, value: Any) -> Any:
+        """
+        Encodes a mapping of integers to strings, integers or decimals in the order of the json module,
+        which sorts integer keys numerically rather than as strings.
+
+        :param value: A top-level value of the payload.
+        :return: The encoded mapping as an orjson fragment, or the value itself if it is not such a mapping.
+        """
+        if not isinstance(value, dict) or not value or not all(type(key) is int for key in value):
+            return value
+        if not all(isinstance(item, (str, Decimal)) or type(item) is int for item in value.values()):
+            return value
+        return self._orjson.Fragment(self._orjson.dumps({
+            str(key): str(item) if isinstance(item, Decimal) else item for key, item in sorted(value.items())
+        }))
+
+
+def create_backend(name: str) -> JSONBackend:
+    """
+    Creates the JSON backend with the given name.
+
+    :param name: "json" for the json module or "orjson" for orjson, which must be installed.
+    :return: The JSON backend.
+    :raises ValueError: If the backend name is unknown.
+    """
+    match name:
+        case "json":
+            return JSONBackend()
+        case "orjson":
+            return OrjsonBackend()
+        case _:
+            raise ValueError(f"Unsupported JSON backend: {name}")
+
+
+class PurchaseSerializer:
+    """
+    Serializes purchases directly to JSON bytes, without building the intermediate dictionaries of `to_dict`.
+
+    Every product is encoded once per serialized snapshot and its fragment is reused for each customer who bought it.
+    The body of /data is kept for the last serialized snapshot, so it is only encoded again after a reload.
+    The output is identical to that of Flask-RESTful (`/data`) and Flask's `jsonify` (everything else).
+    """
+
+    def __init__(self, backend: JSONBackend | None = None) -> None:
+        """
+        Initializes the serializer.
+
+        :param backend: The backend encoding aggregation payloads, the json module by default.
+        """
+        self.backend = JSONBackend() if backend is None else backend
+        self._lock = threading.Lock()
+        self._last_purchase = None
+        self._last_body = None
+
+    def purchases(self, purchase: Purchase) -> bytes:
+        """
+        Encodes all purchases as the body of /data, `{"purchases": {...}}`.
+
+        :param purchase: The purchases to encode.
+        :return: The JSON encoded body followed by a newline.
+        """
+        with self._lock:
+            if purchase is self._last_purchase:
+                return self._last_body
+
+        body = b'{"purchases": ' + self._purchases(purchase) + b'}\n'
+        with self._lock:
+            self._last_purchase, self._last_body = purchase, body
+        return body
+
+    def purchases_page(self, page: Purchase, next_cursor: str | None) -> bytes:
+        """
+        Encodes a page of purchases as the body of /data, `{"purchases": {...}, "next_cursor": ...}`.
+
+        :param page: The purchases on the page.
+        :param next_cursor: The cursor of the next page, or None on the last page.
+        :return: The JSON encoded body followed by a newline.
+        """
+        cursor = b'null' if next_cursor is None else encode_basestring_ascii(next_cursor).encode('ascii')
+        return b'{"purchases": ' + self._purchases(page) + b', "next_cursor": ' + cursor + b'}\n'
+
+    def purchase_lines(self, purchases: Iterable[tuple[Customer, list[Product]]]) -> Iterator[bytes]:
+        """
+        Encodes customers and their products as NDJSON lines, `{"customer_id":...,"products":[...]}`.
+
+        :param purchases: An iterable of tuples of a customer and the products they purchased.
+        :return: An iterator over the lines, each ending with a newline.
+        """
+        fragments = {}
+        for customer, products in purchases:
+            encoded = b','.join([self._fragment(fragments, product, self._compact_product) for product in products])
+            yield b'{"customer_id":%d,"products":[%b]}\n' % (customer.id, encoded)
+
+    def debt_lines(self, debts: dict[int, Decimal]) -> Iterator[bytes]:
+        """
+        Encodes customers' debts as NDJSON lines, `{"customer_id":...,"debt":"..."}`.
+
+        :param debts: A dictionary mapping customer ids to the amount of debt they owe.
+        :return: An iterator over the lines, each ending with a newline.
+        """
+        for customer_id, debt in debts.items():
+            yield b'{"customer_id":%d,"debt":"%b"}\n' % (customer_id, str(debt).encode('ascii'))
+
+    def dumps(self, payload: dict) -> bytes:
+        """
+        Encodes a response payload exactly like Flask's `jsonify`.
+
+        :param payload: The response data.
+        :return: The JSON encoded payload followed by a newline.
+        """
+        return self.backend.dumps(payload) + b'\n'
+
+    def _purchases(self, purchase: Purchase) -> bytes:
+        """
+        Encodes purchases like `json.dumps(purchase.to_dict())`.
+
+        :param purchase: The purchases to encode.
+        :return: The JSON encoded mapping of customer ids to their products.
+        """
+        fragments = {}
+        # Like the dictionary built by Purchase.to_dict, a repeated customer id keeps its first position
+        # and its last list of products
+        customers = {
+            str(customer.id): b', '.join([self._fragment(fragments, product, self._product) for product in products])
+            for customer, products in purchase.customers_and_their_products.items()
+        }
+        return b'{' + b', '.join([
+            b'%b: [%b]' % (encode_basestring_ascii(customer_id).encode('ascii'), products)
+            for customer_id, products in customers.items()
+        ]) + b'}'
+
+    @staticmethod
+    def _fragment(fragments: dict[int, bytes], product: Product, encode) -> bytes:
+        """
+        Returns the encoded product, encoding it only the first time it is seen during a serialization.
+
+        :param fragments: The fragments encoded so far during this serialization, by object id.
+        :param product: The product to encode.
+        :param encode: The function encoding a product.
+        :return: The encoded product.
+        """
+        fragment = fragments.get(id(product))
+        if fragment is None:
+            fragment = fragments[id(product)] = encode(product)
+        return fragment
+
+    @staticmethod
+    def _product(product: Product) -> bytes:
+        """
+        Encodes a product like `json.dumps(product.to_dict())`.
+
+        :param product: The product to encode.
+        :return: The encoded product.
+        """
+        return ('{"id": %d, "name": %s, "category": %s, "price": %s}' % (
+            product.id,
+            encode_basestring_ascii(product.name),
+            encode_basestring_ascii(product.category),
+            encode_basestring_ascii(str(product.price))
+        )).encode('ascii')
+
+    @staticmethod
+    def _compact_product(product: Product) -> bytes:
+        """
+        Encodes a product like `json.dumps(product.to_dict(), separators=(',', ':'))`.
+
+        :param product: The product to encode.
+        :return: The encoded product.
+        """
+        return ('{"id":%d,"name":%s,"category":%s,"price":%s}' % (
+            product.id,
+            encode_basestring_ascii(product.name),
+            encode_basestring_ascii(product.category),
+            encode_basestring_ascii(str(product.price))
+        )).encode('ascii')
+
+
+# ======================================================================================================================
+# Backend encoding aggregation responses: "json" (the json module) or "orjson" (faster, must be installed)
+serializer = PurchaseSerializer(create_backend(os.getenv("JSON_BACKEND", "json")))
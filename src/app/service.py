@@ -1,24 +1,94 @@
+import bisect
 import logging
-from dataclasses import dataclass
-from src.app.model import Purchase, Customer, Product
+from dataclasses import dataclass, field
+from typing import Iterator
+from src.app.model import Purchase, Customer, Product, PurchaseChange
 from decimal import Decimal
-from collections import defaultdict
 from src.app.utils import MaxMin
-from src.app.data.database.repository import CrudRepository
+from src.app.data.cache import SnapshotCache
+from src.app.index import PurchaseIndex, PurchaseIndexMaintainer
+from src.app.data.database.repository import CrudRepository, CustomerProductRepositorySQL
 logging.basicConfig(level=logging.INFO)
 
 
 @dataclass
 class PurchasesService:
     customer_product_repository: CrudRepository
+    snapshot_cache: SnapshotCache[Purchase] = field(default_factory=SnapshotCache)
+
+    def __post_init__(self) -> None:
+        """
+        Subscribes the service to changes made through the repository, so writes are visible immediately.
+        """
+        self.customer_product_repository.add_change_listener(self.apply_changes)
 
     def get_all_purchases(self) -> Purchase:
         """
         Retrieves all purchases made by customers.
+        The data is served from the snapshot cache and reloaded from the repository only when the snapshot is stale.
 
         :return: A Purchase object containing details of all customers and the products they purchased.
         """
-        return self.customer_product_repository.get_purchases()
+        return self.snapshot_cache.get(self.customer_product_repository.get_purchases)
+
+    def iter_purchases(self) -> Iterator[tuple[Customer, list[Product]]]:
+        """
+        Iterates over the customers and the products they purchased one by one, e.g. to stream them in a response.
+        The customers are taken from the cached snapshot.
+
+        :return: An iterator over tuples of a customer and the products they purchased.
+        """
+        return iter(self.get_all_purchases().customers_and_their_products.items())
+
+    def get_purchases_page(self, limit: int, after: int | None = None) -> tuple[Purchase, int | None]:
+        """
+        Retrieves the purchases of at most `limit` customers with an id greater than `after`, in the order of their ids.
+        Pages are cut from the cached snapshot, whose customers are sorted once per snapshot.
+
+        :param limit: The maximum number of customers on the page.
+        :param after: The id of the last customer on the previous page, or None for the first page.
+        :return: A tuple of the Purchase object with the page and the id of its last customer,
+        or None if no customers follow.
+        """
+        ids, entries = self.snapshot_cache.get_derived('customer_order', self.customer_product_repository.get_purchases,
+                                                       self._order_by_customer_id)
+        start = 0 if after is None else bisect.bisect_right(ids, after)
+        end = start + limit
+        return Purchase(dict(entries[start:end])), ids[end - 1] if end < len(entries) else None
+
+    def apply_changes(self, changes: list[PurchaseChange] | None) -> None:
+        """
+        Brings the cached snapshot up to date with a write made through the repository.
+
+        Added and removed purchases are applied to the snapshot and its aggregate index as deltas, so a write
+        does not cost a reload and a rebuild of the index. Writes which cannot be described as purchases,
+        or which cannot be applied to the cached values, invalidate the snapshot instead.
+        The write has already been committed, so errors while applying it only invalidate the snapshot.
+
+        :param changes: The purchases added or removed by the write, or None if they cannot be described.
+        """
+        if changes == []:
+            return
+        try:
+            updated = changes is not None and self.snapshot_cache.update(
+                lambda purchase, derived: self._apply_changes(purchase, derived, changes)
+            )
+        except Exception:
+            logging.exception("Applying changes to the purchase snapshot failed")
+            updated = False
+        if not updated:
+            self.snapshot_cache.invalidate()
+
+    def get_data_version(self) -> int | None:
+        """
+        Returns the version of the data which the results are computed from,
+        reloading the snapshot first if it is stale.
+        Results computed from the same version are identical, so they can be cached under it.
+
+        :return: The snapshot version.
+        """
+        self.get_all_purchases()
+        return self.snapshot_cache.version
 
     def get_customers_total_spent(self, customer_id: int) -> Decimal:
         """
@@ -27,8 +97,7 @@ class PurchasesService:
         :param customer_id: The ID of the customer whose spending is to be calculated.
         :return: The total amount spent by the customer. Returns 0 if the customer ID is not found.
         """
-        customer_id_with_products = {c.id: p for c, p in self.get_all_purchases().customers_and_their_products.items()}
-        return sum((Decimal(p.price) for p in customer_id_with_products.get(customer_id, [])), Decimal(0))
+        return self._get_index().totals_spent.get(customer_id, Decimal(0))
 
     def get_customer_who_spent_the_most(self) -> list[Customer]:
         """
@@ -36,10 +105,7 @@ class PurchasesService:
 
         :return: A list of customers who have spent the maximum amount. Returns an empty list if no customers are found.
         """
-        customers_with_spent = {c: self.get_customers_total_spent(c.id)
-                                for c, p in self.get_all_purchases().customers_and_their_products.items()}
-        max_spent = max(customers_with_spent.values(), default=Decimal(0))
-        return [c for c, spent in customers_with_spent.items() if spent.compare(max_spent) == 0]
+        return list(self._get_index().top_spenders)
 
     def get_most_spending_in_category(self, category: str) -> list[Customer]:
         """
@@ -49,13 +115,7 @@ class PurchasesService:
         :return: A list of customers who have spent the most in the given category. Returns an empty list if no spending
         is recorded in the category.
         """
-        customer_and_category_spent = {
-            customer: sum(p.price for p in products if p.category == category)
-            for customer, products in self.get_all_purchases().customers_and_their_products.items()
-        }
-        max_spent = max(customer_and_category_spent.values(), default=Decimal(0))
-        return [] if max_spent == 0 \
-            else [customer for customer, spent in customer_and_category_spent.items() if spent == max_spent]
+        return list(self._get_index().category_top_spenders.get(category, []))
 
     def get_age_category_preference(self) -> dict[int, str]:
         """
@@ -64,15 +124,9 @@ class PurchasesService:
         :return: A dictionary mapping each customer age to the product category they purchased most frequently.
         If no category is purchased for a specific age, the value will be None.
         """
-        age_and_category_counts = defaultdict(lambda: defaultdict(int))
-
-        for customer, products in self.get_all_purchases().customers_and_their_products.items():
-            for product in products:
-                age_and_category_counts[customer.age][product.category] += 1
-
         return {
-            age: max(category_count.items(), key=lambda x: x[1], default=(None, 0))[0]
-            for age, category_count in age_and_category_counts.items()
+            age: max(dict(category_count).items(), key=lambda x: x[1], default=(None, 0))[0]
+            for age, category_count in dict(self._get_index().age_category_counts).items()
         }
 
     def get_category_and_avg_price(self) -> dict[str, Decimal]:
@@ -82,34 +136,18 @@ class PurchasesService:
         :return: A dictionary where the key is the product category and the value is the average price of products
         in that category. Returns 0.00 if a category has no products.
         """
-        category_with_prices = defaultdict(list)
-        for product in self._get_unique_products().values():
-            category_with_prices[product.category].append(product.price)
-
-        return {
-            cat: sum(prices) / Decimal(len(prices)) if prices else Decimal(0.00)
-            for cat, prices in category_with_prices.items()
-        }
+        return dict(self._get_index().category_avg_price)
 
     def get_most_and_least_expensive_in_category(self) -> dict[str, MaxMin]:
         """
         Identifies the most and least expensive products in each category.
+        Ties are resolved in favour of the lower product id.
 
         :return: A dictionary where the key is the product category and the value is an instance of `MaxMin`
         containing the most and least expensive products in that category. Returns None for both values
         if a category has no products.
         """
-        category_with_products = defaultdict(list)
-        for product in self._get_unique_products().values():
-            category_with_products[product.category].append(product)
-
-        return {
-            category: MaxMin(
-                max=max(products, key=lambda p: p.price, default=None),
-                min=min(products, key=lambda p: p.price, default=None)
-            )
-            for category, products in category_with_products.items()
-        }
+        return dict(self._get_index().most_and_least_expensive)
 
     def get_most_frequent_category_for_customers(self) -> dict[str, list[Customer]]:
         """
@@ -119,15 +157,12 @@ class PurchasesService:
         who have purchased that category the most frequently.
         Returns an empty list if no customers have purchased a category.
         """
-        category_customer_count = defaultdict(lambda: defaultdict(int))
-        for customer, products in self.get_all_purchases().customers_and_their_products.items():
-            for product in products:
-                category_customer_count[product.category][customer] += 1
-
-        return {
-            category: [c for c, count in customer_count.items() if count == max(customer_count.values())]
-            for category, customer_count in category_customer_count.items()
-        }
+        result = {}
+        for category, customer_count in dict(self._get_index().category_counts).items():
+            customer_count = dict(customer_count)
+            max_count = max(customer_count.values())
+            result[category] = [c for c, count in customer_count.items() if count == max_count]
+        return result
 
     def can_customer_pay(self, customer_id: int) -> bool:
         """
@@ -147,10 +182,7 @@ class PurchasesService:
         Returns -1 if the customer does not exist.
         Returns 0 if the customer’s total spending is less than or equal to their cash.
         """
-        customer = next((c for c in self.customer_product_repository.get_purchases().customers_and_their_products
-                         if customer_id == c.id), None)
-
-        return Decimal(-1) if not customer else max(self.get_customers_total_spent(customer_id) - customer.cash, Decimal(0))
+        return self._get_index().debts.get(customer_id, Decimal(-1))
 
     def get_customers_with_debts(self) -> dict[int, Decimal]:
         """
@@ -160,22 +192,172 @@ class PurchasesService:
         Customers with no debt are not included in the dictionary.
 
         """
-        return {
-            customer.id: debt
-            for customer, products in self.get_all_purchases().customers_and_their_products.items()
-            if (debt := self.get_customers_debt(customer_id=customer.id)) > Decimal(0)
-        }
+        return {customer_id: debt for customer_id, debt in dict(self._get_index().debts).items() if debt > Decimal(0)}
+
+    def refresh(self) -> None:
+        """
+        Reloads the purchase snapshot from the repository and builds its aggregates before swapping both in,
+        so requests keep being served from the previous snapshot until the new one is complete.
+        When the repository returns the snapshot already cached, e.g. because its source has not changed,
+        the aggregates are not rebuilt.
+        """
+        purchase = self.customer_product_repository.get_purchases()
+        unchanged = purchase is self.snapshot_cache.peek()
+        self.snapshot_cache.prime(purchase, None if unchanged else self._build_derived(purchase))
+
+    def _build_derived(self, purchase: Purchase) -> dict[str, object]:
+        """
+        Builds the values the service derives from a purchase snapshot.
+
+        :param purchase: The purchase snapshot.
+        :return: The derived values by the name they are cached under.
+        """
+        return {'index': PurchaseIndex.from_purchase(purchase)}
+
+    @staticmethod
+    def _apply_changes(purchase: Purchase, derived: dict[str, object],
+                       changes: list[PurchaseChange]) -> tuple[Purchase, dict[str, object]] | None:
+        """
+        Applies changes to a snapshot and to its aggregate index, which is maintained incrementally from then on.
+        Other derived values are dropped and built again when they are needed.
+
+        :param purchase: The cached snapshot.
+        :param derived: The values derived from the snapshot.
+        :param changes: The purchases added or removed.
+        :return: The updated snapshot and derived values, or None if the index has not been built yet,
+        or derived values which cannot be rebuilt on demand would be lost.
+        """
+        if 'index' not in derived or derived.keys() - {'index', 'index_maintainer', 'customer_order'}:
+            return None
+        maintainer = derived.get('index_maintainer') or PurchaseIndexMaintainer.from_index(derived['index'], purchase)
+        updated = maintainer.apply(purchase, changes)
+        return None if updated is None else (updated, {'index': maintainer.index, 'index_maintainer': maintainer})
+
+    @staticmethod
+    def _order_by_customer_id(purchase: Purchase) -> tuple[list[int], list[tuple[Customer, list[Product]]]]:
+        """
+        Sorts the customers of a snapshot by id, for keyset pagination.
+
+        :param purchase: The purchase snapshot.
+        :return: A tuple of the sorted customer ids and the matching (customer, products) entries.
+        """
+        entries = sorted(purchase.customers_and_their_products.items(), key=lambda entry: entry[0].id)
+        return [customer.id for customer, _ in entries], entries
+
+    def _get_index(self) -> PurchaseIndex:
+        """
+        Retrieves the aggregate index of the current purchase snapshot.
+        The index is built on first use and reused until the snapshot is reloaded.
+        Writes through the repository replace it with an updated copy.
+
+        :return: A PurchaseIndex built from the current snapshot.
+        """
+        return self.snapshot_cache.get_derived('index', self.customer_product_repository.get_purchases,
+                                               PurchaseIndex.from_purchase)
+
+
+@dataclass
+class SQLPurchasesService(PurchasesService):
+    """
+    PurchasesService variant which pushes the aggregations down into the database.
+
+    Totals, top spenders, category prices and debts are computed with GROUP BY and window queries,
+    so only the final rows are transferred instead of the whole purchase history. The remaining
+    methods fall back to the in-memory snapshot.
+    """
+    customer_product_repository: CustomerProductRepositorySQL
+
+    def iter_purchases(self) -> Iterator[tuple[Customer, list[Product]]]:
+        """
+        Streams the customers and the products they purchased from the database one by one,
+        without loading the whole snapshot.
+
+        :return: An iterator over tuples of a customer and the products they purchased.
+        """
+        return self.customer_product_repository.iter_purchases()
+
+    def get_purchases_page(self, limit: int, after: int | None = None) -> tuple[Purchase, int | None]:
+        """
+        Retrieves a page of purchases with keyset pagination in the database.
+
+        :param limit: The maximum number of customers on the page.
+        :param after: The id of the last customer on the previous page, or None for the first page.
+        :return: A tuple of the Purchase object with the page and the id of its last customer,
+        or None if no customers follow.
+        """
+        return self.customer_product_repository.get_purchases_page(limit, after)
+
+    def get_data_version(self) -> int | None:
+        """
+        Returns None, since the pushed down results are read from the database, which may change between requests
+        without the snapshot being reloaded.
+
+        :return: None.
+        """
+        return None
+
+    def get_customers_total_spent(self, customer_id: int) -> Decimal:
+        """
+        Calculates the total amount spent by a customer with a given ID in the database.
+
+        :param customer_id: The ID of the customer whose spending is to be calculated.
+        :return: The total amount spent by the customer. Returns 0 if the customer ID is not found.
+        """
+        return self.customer_product_repository.get_customers_total_spent(customer_id)
+
+    def get_customer_who_spent_the_most(self) -> list[Customer]:
+        """
+        Identifies the customer(s) who have spent the most across all categories in the database.
+
+        :return: A list of customers who have spent the maximum amount. Returns an empty list if no customers are found.
+        """
+        return self.customer_product_repository.get_top_spenders()
+
+    def get_most_spending_in_category(self, category: str) -> list[Customer]:
+        """
+        Finds the customer(s) who have spent the most in a specific category in the database.
+
+        :param category: The category for which to determine the highest spending customer(s).
+        :return: A list of customers who have spent the most in the given category. Returns an empty list if no spending
+        is recorded in the category.
+        """
+        return self.customer_product_repository.get_most_spending_in_category(category)
+
+    def get_category_and_avg_price(self) -> dict[str, Decimal]:
+        """
+        Calculates the average price of products in each category in the database.
+
+        :return: A dictionary where the key is the product category and the value is the average price of products
+        in that category.
+        """
+        return self.customer_product_repository.get_category_and_avg_price()
+
+    def get_most_and_least_expensive_in_category(self) -> dict[str, MaxMin]:
+        """
+        Identifies the most and least expensive products in each category in the database.
+        Ties are resolved in favour of the lower product id.
 
-    def _get_unique_products(self) -> dict[int, Product]:
+        :return: A dictionary where the key is the product category and the value is an instance of `MaxMin`
+        containing the most and least expensive products in that category.
         """
-        Retrieves all unique products across all customers.
+        return self.customer_product_repository.get_most_and_least_expensive_in_category()
 
-        :return: A dictionary where the key is the product ID and the value is the `Product` object.
-        Each product ID is unique in the dictionary.
+    def get_customers_debt(self, customer_id: int) -> Decimal:
         """
-        all_products = [p for products in self.get_all_purchases().customers_and_their_products.values()
-                        for p in products]
-        return {p.id: p for p in all_products}
+        Calculates the total debt for a customer with the given ID in the database.
 
+        :param customer_id: The ID of the customer whose debt is to be calculated.
+        :return: The amount of debt the customer has.
+        Returns -1 if the customer does not exist.
+        Returns 0 if the customer’s total spending is less than or equal to their cash.
+        """
+        return self.customer_product_repository.get_customers_debt(customer_id)
 
+    def get_customers_with_debts(self) -> dict[int, Decimal]:
+        """
+        Gets a dictionary of customers with the amount of debt they owe, filtered in the database.
 
+        :return: A dictionary where the key is a customer's id  and the value is the amount of debt they owe.
+        Customers with no debt are not included in the dictionary.
+        """
+        return self.customer_product_repository.get_customers_with_debts()
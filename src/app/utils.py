@@ -1,6 +1,13 @@
+import base64
 from dataclasses import dataclass
+from decimal import Decimal
 from src.app.model import Product
 
+# Number of customers on a page when a cursor is given without a limit
+DEFAULT_PAGE_LIMIT = 100
+# Maximum number of customers on a page
+MAX_PAGE_LIMIT = 1000
+
 
 @dataclass
 class MaxMin:
@@ -9,3 +16,76 @@ class MaxMin:
     """
     max: Product
     min: Product
+
+
+def to_cents(value: Decimal) -> tuple[int, int] | None:
+    """
+    Converts a decimal amount to an integer number of cents, keeping its exponent
+    so the exact Decimal can be restored later with `from_cents`.
+
+    :param value: The decimal amount.
+    :return: A tuple of the amount in cents and the decimal's exponent, or None if the amount
+    has more than two decimal places or does not fit in 62 bits.
+    """
+    exponent = value.as_tuple().exponent
+    if not isinstance(exponent, int) or not -2 <= exponent <= 16:
+        return None
+
+    cents = int(value.scaleb(2))
+    return (cents, exponent) if -2 ** 62 < cents < 2 ** 62 else None
+
+
+def from_cents(cents: int, exponent: int) -> Decimal:
+    """
+    Converts an integer number of cents back to a decimal with the given exponent.
+    The sum of several decimals has the smallest exponent among them, so passing that exponent
+    restores exactly the Decimal which summing the original values would produce.
+
+    :param cents: The amount in cents, which must be a multiple of 10 ** (exponent + 2).
+    :param exponent: The exponent of the resulting decimal, at least -2.
+    :return: The decimal amount.
+    """
+    exponent = int(exponent)
+    return Decimal(int(cents) // 10 ** (exponent + 2)).scaleb(exponent)
+
+
+def encode_cursor(customer_id: int) -> str:
+    """
+    Encodes the id of the last customer on a page as an opaque pagination cursor.
+
+    :param customer_id: The id of the last customer on the page.
+    :return: The URL-safe cursor token.
+    """
+    return base64.urlsafe_b64encode(str(customer_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decodes a pagination cursor created by `encode_cursor`.
+
+    :param cursor: The cursor token.
+    :return: The id of the last customer on the previous page.
+    :raises ValueError: If the cursor is not a valid token.
+    """
+    try:
+        return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError) as error:
+        raise ValueError(f'Invalid cursor: {cursor}') from error
+
+
+def parse_page_arguments(limit: str | None, cursor: str | None) -> tuple[int, int | None]:
+    """
+    Parses the `limit` and `cursor` query parameters of a paginated request.
+
+    :param limit: The requested number of customers on the page, or None for the default.
+    :param cursor: The cursor returned with the previous page, or None for the first page.
+    :return: A tuple of the page size, capped at MAX_PAGE_LIMIT, and the id of the last customer on the previous page.
+    :raises ValueError: If the limit is not a positive number or the cursor is invalid.
+    """
+    try:
+        page_limit = DEFAULT_PAGE_LIMIT if limit is None else int(limit)
+    except ValueError as error:
+        raise ValueError(f'Invalid limit: {limit}') from error
+    if page_limit < 1:
+        raise ValueError('The limit must be a positive number')
+    return min(page_limit, MAX_PAGE_LIMIT), decode_cursor(cursor) if cursor else None
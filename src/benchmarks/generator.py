@@ -0,0 +1,224 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Iterator
+from sqlalchemy import create_engine, insert
+from src.app.data.database.configuration import sa
+from src.app.data.database.entity import CustomerEntity, ProductEntity, CustomerProductEntity
+from src.app.data.snapshot import write_snapshot
+from src.app.model import Customer, Product, Purchase
+
+logging.basicConfig(level=logging.INFO)
+
+FIRST_NAMES = ('John', 'Jane', 'Sam', 'Ann', 'Max', 'Eve', 'Tom', 'Kate', 'Paul', 'Mia', 'Adam', 'Lena')
+LAST_NAMES = ('Doe', 'Smith', 'Lee', 'Brown', 'Stone', 'Ray', 'Nowak', 'Kowalski', 'Miller', 'Clark')
+CATEGORIES = ('Electronics', 'Clothing', 'Sports', 'Books', 'Garden', 'Toys', 'Food', 'Beauty', 'Music', 'Home',
+              'Office', 'Automotive')
+CSV_COLUMNS = ('ID', 'FirstName', 'LastName', 'Age', 'Salary', 'ProductID', 'Product', 'Category', 'Price')
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """
+    Describes a synthetic purchase dataset. The same spec always generates the same data.
+
+    `rows` is the number of purchases, i.e. of customer_product rows. Customers buy between 0 and
+    twice `purchases_per_customer` distinct products, so some of them have not purchased anything,
+    and `products` is derived from the number of rows unless given.
+    """
+    rows: int
+    seed: int = 42
+    purchases_per_customer: int = 5
+    products: int | None = None
+
+    @property
+    def product_count(self) -> int:
+        """
+        :return: The number of products in the catalogue.
+        """
+        return self.products or max(self.rows // 50, 2 * self.purchases_per_customer, 1)
+
+    @property
+    def name(self) -> str:
+        """
+        :return: A name identifying the dataset, used for its file names.
+        """
+        return f'purchases-{self.rows}-{self.seed}'
+
+
+def generate_products(spec: DatasetSpec, rng: random.Random) -> list[Product]:
+    """
+    Generates the product catalogue of a dataset.
+
+    :param spec: The dataset spec.
+    :param rng: The random number generator of the dataset.
+    :return: The products, with ids starting at 1.
+    """
+    return [Product(id=product_id, name=f'Product {product_id}', category=rng.choice(CATEGORIES),
+                    price=Decimal(rng.randint(100, 200_000)).scaleb(-2))
+            for product_id in range(1, spec.product_count + 1)]
+
+
+def iter_purchases(spec: DatasetSpec) -> Iterator[tuple[Customer, list[Product]]]:
+    """
+    Generates the customers of a dataset and the products they purchased one by one, so datasets larger
+    than memory can be written without building them first.
+
+    :param spec: The dataset spec.
+    :return: An iterator over tuples of a customer and the products they purchased, in the order of customer ids,
+    together holding exactly `spec.rows` purchases.
+    """
+    rng = random.Random(spec.seed)
+    products = generate_products(spec, rng)
+    remaining = spec.rows
+    customer_id = 0
+    while remaining > 0:
+        customer_id += 1
+        customer = Customer(id=customer_id, first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                            age=rng.randint(18, 80), cash=Decimal(rng.randint(0, 500_000)).scaleb(-2))
+        count = min(rng.randint(0, 2 * spec.purchases_per_customer), remaining, len(products))
+        remaining -= count
+        yield customer, rng.sample(products, count)
+
+
+def write_csv(spec: DatasetSpec, path: str) -> None:
+    """
+    Writes a dataset in the format of the CSV source, one row per purchase and one row without a product
+    for each customer who has not purchased anything.
+
+    :param spec: The dataset spec.
+    :param path: The path of the CSV file.
+    """
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_COLUMNS)
+        for customer, products in iter_purchases(spec):
+            columns = (customer.id, customer.first_name, customer.last_name, customer.age, customer.cash)
+            if not products:
+                writer.writerow(columns + ('', '', '', ''))
+            for product in products:
+                writer.writerow(columns + (product.id, product.name, product.category, product.price))
+
+
+def write_json(spec: DatasetSpec, path: str) -> None:
+    """
+    Writes a dataset in the format of the JSON source, an array with one entry per customer.
+
+    :param spec: The dataset spec.
+    :param path: The path of the JSON file.
+    """
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('[')
+        for index, (customer, products) in enumerate(iter_purchases(spec)):
+            entry = {
+                'ID': customer.id, 'FirstName': customer.first_name, 'LastName': customer.last_name,
+                'Age': customer.age, 'Salary': str(customer.cash),
+                'Purchases': [{'ProductID': product.id, 'Product': product.name, 'Category': product.category,
+                               'Price': str(product.price)} for product in products]
+            }
+            file.write((',\n' if index else '\n') + json.dumps(entry))
+        file.write('\n]\n')
+
+
+def write_sqlite(spec: DatasetSpec, path: str, chunk_size: int = 10_000) -> None:
+    """
+    Writes a dataset to a new SQLite database with the tables of the SQL source.
+
+    :param spec: The dataset spec.
+    :param path: The path of the database file, which is replaced if it exists.
+    :param chunk_size: The number of rows inserted per statement.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    engine = create_engine(f'sqlite:///{path}')
+    sa.Model.metadata.create_all(engine)
+    products = generate_products(spec, random.Random(spec.seed))
+    with engine.begin() as connection:
+        for start in range(0, len(products), chunk_size):
+            connection.execute(insert(ProductEntity.__table__), [
+                {'id': product.id, 'name': product.name, 'category': product.category, 'price': product.price}
+                for product in products[start:start + chunk_size]
+            ])
+
+        customers = []
+        purchases = []
+        for customer, purchased in iter_purchases(spec):
+            customers.append({'id': customer.id, 'first_name': customer.first_name, 'last_name': customer.last_name,
+                              'age': customer.age, 'cash': customer.cash})
+            purchases.extend({'customer_id': customer.id, 'product_id': product.id} for product in purchased)
+            if len(customers) >= chunk_size or len(purchases) >= chunk_size:
+                connection.execute(insert(CustomerEntity.__table__), customers)
+                if purchases:
+                    connection.execute(insert(CustomerProductEntity.__table__), purchases)
+                customers, purchases = [], []
+        if customers:
+            connection.execute(insert(CustomerEntity.__table__), customers)
+        if purchases:
+            connection.execute(insert(CustomerProductEntity.__table__), purchases)
+    engine.dispose()
+
+
+def write_snapshot_file(spec: DatasetSpec, path: str) -> None:
+    """
+    Writes a dataset as a binary snapshot file, the format published to the workers when SHARED_SNAPSHOT is enabled.
+    Unlike the other formats, the dataset is built in memory first.
+
+    :param spec: The dataset spec.
+    :param path: The path of the snapshot file.
+    """
+    write_snapshot(Purchase(customers_and_their_products=dict(iter_purchases(spec))), path)
+
+
+def write_dataset(spec: DatasetSpec, directory: str,
+                  formats: tuple[str, ...] = ('csv', 'json', 'sqlite', 'snapshot')) -> dict:
+    """
+    Writes a dataset in the given formats, skipping files which have already been generated from the same spec.
+
+    :param spec: The dataset spec.
+    :param directory: The directory of the files, which is created if it does not exist.
+    :param formats: The formats to write, any of "csv", "json", "sqlite" and "snapshot".
+    :return: A dictionary mapping each format to the path of its file.
+    """
+    writers = {'csv': write_csv, 'json': write_json, 'sqlite': write_sqlite, 'snapshot': write_snapshot_file}
+    extensions = {'csv': 'csv', 'json': 'json', 'sqlite': 'db', 'snapshot': 'bin'}
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for data_format in formats:
+        path = paths[data_format] = os.path.join(directory, f'{spec.name}.{extensions[data_format]}')
+        if not os.path.exists(path):
+            # Written under a temporary name, so an interrupted run does not leave a partial file to be reused
+            writers[data_format](spec, f'{path}.tmp')
+            os.replace(f'{path}.tmp', path)
+            logging.info(f'Wrote {spec.rows} purchases to {path} ({os.path.getsize(path)} bytes)')
+    return paths
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Command line entry point writing synthetic datasets for benchmarks.
+
+    Usage: python -m src.benchmarks.generator [--rows ROWS ...] [--seed SEED] [--formats FORMAT ...] DIRECTORY
+
+    :param argv: The command line arguments, defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description='Write seeded synthetic purchase datasets as CSV, JSON, SQLite '
+                                                 'and snapshot files.')
+    parser.add_argument('directory', help='directory of the generated files')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000], help='numbers of purchases per dataset')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the random number generator')
+    parser.add_argument('--formats', nargs='+', choices=('csv', 'json', 'sqlite', 'snapshot'),
+                        default=['csv', 'json', 'sqlite', 'snapshot'], help='formats to write')
+    args = parser.parse_args(argv)
+
+    for rows in args.rows:
+        write_dataset(DatasetSpec(rows=rows, seed=args.seed), args.directory, tuple(args.formats))
+
+
+if __name__ == '__main__':
+    main()
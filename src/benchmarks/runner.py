@@ -0,0 +1,294 @@
+import argparse
+import collections
+import datetime
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+from typing import Callable
+from flask import Flask
+from flask_restful import Api
+from src.app.data.database.configuration import sa, configure_sqlite, create_sqlite_schema, sqlite_url
+from src.app.data.database.repository import customer_product_repository_sql
+from src.app.data.cache import SnapshotCache
+from src.app.data.repository import (
+    CustomerProductRepositoryCSV,
+    CustomerProductRepositoryJSON,
+    CustomerProductRepositorySnapshot
+)
+from src.app.routes import purchases
+from src.app.routes.caching import response_cache
+from src.app.service import PurchasesService, SQLPurchasesService
+from src.benchmarks.generator import CATEGORIES, DatasetSpec, write_dataset
+
+logging.basicConfig(level=logging.INFO)
+
+# The load of the "snapshot" source is the time every worker spends decoding a published snapshot file
+SOURCES = ('csv', 'json', 'sqlite', 'sqlite-pushdown', 'snapshot')
+ROUTES = (
+    '/data',
+    '/data?limit=100',
+    '/purchases/total_spent/{customer_id}',
+    '/purchases/most_spending',
+    '/purchases/most_spending_in_category/{category}',
+    '/purchases/age_category_preference',
+    '/purchases/category_avg_price',
+    '/purchases/most_and_least_expensive',
+    '/purchases/most_frequent_category',
+    '/purchases/can_pay/{customer_id}',
+    '/purchases/get_debt/{customer_id}',
+    '/purchases/indebted_customers'
+)
+
+
+def measure(call: Callable[[], object], repeat: int) -> dict[str, float]:
+    """
+    Times a call once and then `repeat` more times.
+
+    :param call: The call to time.
+    :param repeat: The number of repeated calls.
+    :return: A dictionary with the seconds taken by the first call and the median of the repeated calls.
+    """
+    start = time.perf_counter()
+    call()
+    first = time.perf_counter() - start
+
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        seconds.append(time.perf_counter() - start)
+    return {'first': first, 'median': statistics.median(seconds) if seconds else first}
+
+
+def service_calls(service: PurchasesService, customer_id: int, category: str) -> dict[str, Callable[[], object]]:
+    """
+    Lists a call of every public method of a purchases service.
+
+    :param service: The service.
+    :param customer_id: The id of the customer passed to the methods taking one.
+    :param category: The category passed to the methods taking one.
+    :return: A dictionary mapping method names to calls without arguments.
+    """
+    return {
+        'get_all_purchases': service.get_all_purchases,
+        'iter_purchases': lambda: collections.deque(service.iter_purchases(), maxlen=0),
+        'get_purchases_page': lambda: service.get_purchases_page(100),
+        'get_customers_total_spent': lambda: service.get_customers_total_spent(customer_id),
+        'get_customer_who_spent_the_most': service.get_customer_who_spent_the_most,
+        'get_most_spending_in_category': lambda: service.get_most_spending_in_category(category),
+        'get_age_category_preference': service.get_age_category_preference,
+        'get_category_and_avg_price': service.get_category_and_avg_price,
+        'get_most_and_least_expensive_in_category': service.get_most_and_least_expensive_in_category,
+        'get_most_frequent_category_for_customers': service.get_most_frequent_category_for_customers,
+        'can_customer_pay': lambda: service.can_customer_pay(customer_id),
+        'get_customers_debt': lambda: service.get_customers_debt(customer_id),
+        'get_customers_with_debts': service.get_customers_with_debts
+    }
+
+
+def create_service(source: str, paths: dict[str, str]) -> PurchasesService:
+    """
+    Creates a purchases service reading a generated dataset, with a snapshot cache which never expires
+    during a benchmark.
+
+    :param source: The name of the source, one of SOURCES.
+    :param paths: The paths of the dataset files by format.
+    :return: The service.
+    :raises ValueError: If the source is not supported.
+    """
+    snapshot_cache = SnapshotCache(ttl=float('inf'))
+    match source:
+        case 'csv':
+            return PurchasesService(CustomerProductRepositoryCSV(path=paths['csv']), snapshot_cache)
+        case 'json':
+            return PurchasesService(CustomerProductRepositoryJSON(path=paths['json']), snapshot_cache)
+        case 'sqlite':
+            return PurchasesService(customer_product_repository_sql, snapshot_cache)
+        case 'sqlite-pushdown':
+            return SQLPurchasesService(customer_product_repository_sql, snapshot_cache)
+        case 'snapshot':
+            return PurchasesService(CustomerProductRepositorySnapshot(path=paths['snapshot']), snapshot_cache)
+        case _:
+            raise ValueError(f"Unsupported benchmark source: {source}")
+
+
+def create_app(source: str, paths: dict[str, str]) -> Flask:
+    """
+    Creates a Flask application serving the purchase routes, with the SQLite database of the dataset
+    configured like the "sqlite" source for the SQLite sources.
+
+    :param source: The name of the source, one of SOURCES.
+    :param paths: The paths of the dataset files by format.
+    :return: The application.
+    """
+    app = Flask(__name__)
+    Api(app).add_resource(purchases.DataResource, '/data')
+    app.register_blueprint(purchases.purchases_blueprint)
+    if source.startswith('sqlite'):
+        app.config['SQLALCHEMY_DATABASE_URI'] = sqlite_url(paths['sqlite'])
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        sa.init_app(app)
+        with app.app_context():
+            configure_sqlite(sa.engine)
+            create_sqlite_schema(sa.engine)
+    return app
+
+
+def benchmark_source(source: str, paths: dict[str, str], repeat: int, customer_id: int = 1,
+                     category: str = CATEGORIES[0]) -> dict:
+    """
+    Times the first load of a dataset, every service method and every route against a source.
+
+    Methods and routes are timed once the snapshot has been loaded, so their first call includes building
+    the values derived from the snapshot, and their repeated calls are answered from the snapshot cache
+    and the response cache like in production.
+
+    :param source: The name of the source, one of SOURCES.
+    :param paths: The paths of the dataset files by format.
+    :param repeat: The number of repeated calls of every method and route.
+    :param customer_id: The id of the customer passed to the methods and routes taking one.
+    :param category: The category passed to the methods and routes taking one.
+    :return: A dictionary with the seconds taken by the first load, and the timings of the methods and routes
+    by their name.
+    :raises RuntimeError: If a route does not respond with 200 OK.
+    """
+    app = create_app(source, paths)
+    service = create_service(source, paths)
+    previous_service = purchases.purchase_service
+    purchases.purchase_service = service
+    response_cache.clear()
+    try:
+        with app.app_context():
+            load = measure(service.get_all_purchases, 0)['first']
+            methods = {name: measure(call, repeat)
+                       for name, call in service_calls(service, customer_id, category).items()}
+
+            client = app.test_client()
+            routes = {}
+            for route in ROUTES:
+                url = route.format(customer_id=customer_id, category=category)
+
+                def get() -> None:
+                    response = client.get(url)
+                    if response.status_code != 200:
+                        raise RuntimeError(f'{url} responded with {response.status}')
+
+                routes[route] = measure(get, repeat)
+            if source.startswith('sqlite'):
+                sa.engine.dispose()
+    finally:
+        purchases.purchase_service = previous_service
+        response_cache.clear()
+    return {'load': load, 'methods': methods, 'routes': routes}
+
+
+def run_benchmarks(rows: list[int], sources: list[str], directory: str, seed: int = 42, repeat: int = 5) -> dict:
+    """
+    Generates a dataset for every scale, or reuses one generated earlier, and benchmarks every source against it.
+
+    :param rows: The numbers of purchases of the datasets.
+    :param sources: The names of the sources, any of SOURCES.
+    :param directory: The directory of the dataset files.
+    :param seed: The seed of the datasets.
+    :param repeat: The number of repeated calls of every method and route.
+    :return: The results, with the environment under "meta" and the timings by number of rows and source
+    under "results".
+    """
+    formats = tuple(dict.fromkeys('sqlite' if source.startswith('sqlite') else source for source in sources))
+    results = {}
+    for count in rows:
+        paths = write_dataset(DatasetSpec(rows=count, seed=seed), directory, formats)
+        for source in sources:
+            timings = results.setdefault(str(count), {})[source] = benchmark_source(source, paths, repeat)
+            logging.info(f'{count} rows from {source}: loaded in {timings["load"]:.4f}s')
+    return {
+        'meta': {
+            'seed': seed,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+        },
+        'results': results
+    }
+
+
+def flatten(results: dict, prefix: str = '') -> dict[str, float]:
+    """
+    Flattens nested timings into a dictionary keyed by their path, e.g. "1000/csv/methods/can_customer_pay/median".
+
+    :param results: The nested timings.
+    :param prefix: The path of the timings.
+    :return: A dictionary mapping paths to seconds.
+    """
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}/'))
+        else:
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25, min_seconds: float = 0.001) -> list[str]:
+    """
+    Compares benchmark results to a baseline recorded with the same scales and sources.
+    Timings missing from either side are ignored.
+
+    :param results: The current results.
+    :param baseline: The baseline results.
+    :param tolerance: The relative slowdown allowed before a timing counts as a regression.
+    :param min_seconds: The absolute slowdown below which differences are treated as noise.
+    :return: A description of every regression, empty if there are none.
+    """
+    current = flatten(results['results'])
+    regressions = []
+    for path, before in flatten(baseline['results']).items():
+        after = current.get(path)
+        if after is not None and after > before * (1 + tolerance) and after - before > min_seconds:
+            regressions.append(f'{path}: {before:.6f}s -> {after:.6f}s (+{(after / before - 1) * 100:.0f}%)')
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Command line entry point of the benchmarks. Writes the results to a JSON file, which serves as the baseline
+    of later runs, and exits with status 1 if a timing regressed against a given baseline.
+
+    Usage: python -m src.benchmarks.runner [--rows ROWS ...] [--sources SOURCE ...] [--repeat N]
+    [--output RESULTS] [--baseline BASELINE] [--tolerance RATIO]
+
+    :param argv: The command line arguments, defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the purchases service and routes on synthetic datasets.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000], help='numbers of purchases per dataset')
+    parser.add_argument('--sources', nargs='+', choices=SOURCES, default=list(SOURCES), help='sources to benchmark')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the datasets')
+    parser.add_argument('--repeat', type=int, default=5, help='repeated calls of every method and route')
+    parser.add_argument('--data-dir', default='.benchmarks', help='directory of the generated datasets')
+    parser.add_argument('--output', help='path of the JSON file to write the results to')
+    parser.add_argument('--baseline', help='path of the JSON results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative slowdown counted as a regression')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.rows, args.sources, args.data_dir, args.seed, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            logging.warning(f'Regression: {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
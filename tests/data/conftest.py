@@ -0,0 +1,75 @@
+import io
+import requests
+import pytest
+from decimal import Decimal
+from flask import Flask
+from src.app.data.database.configuration import sa
+from src.app.data.http_client import http_session
+from src.app.data.database.entity import CustomerEntity, ProductEntity, CustomerProductEntity
+
+
+@pytest.fixture
+def sql_app() -> Flask:
+    """
+    Fixture for creating a Flask application backed by an in-memory SQLite database with sample purchases.
+
+    :return: A Flask application with an active application context.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    sa.init_app(app)
+
+    with app.app_context():
+        sa.create_all()
+        sa.session.add_all([
+            CustomerEntity(id=1, first_name="John", last_name="Doe", age=30, cash=Decimal('1000.00')),
+            CustomerEntity(id=2, first_name="Jane", last_name="Doe", age=25, cash=Decimal('1500.00')),
+            CustomerEntity(id=3, first_name="Sam", last_name="Smith", age=28, cash=Decimal('100.00')),
+            CustomerEntity(id=4, first_name="Ann", last_name="Lee", age=30, cash=Decimal('50.00')),
+            ProductEntity(id=1, name="Laptop", category="Electronics", price=Decimal('1200.00')),
+            ProductEntity(id=2, name="Smartphone", category="Electronics", price=Decimal('800.00')),
+            ProductEntity(id=3, name="Shoes", category="Clothing", price=Decimal('100.00')),
+            ProductEntity(id=4, name="Hat", category="Clothing", price=Decimal('100.00')),
+        ])
+        sa.session.flush()
+        sa.session.add_all([
+            CustomerProductEntity(customer_id=1, product_id=1),
+            CustomerProductEntity(customer_id=1, product_id=2),
+            CustomerProductEntity(customer_id=2, product_id=3),
+            CustomerProductEntity(customer_id=4, product_id=4),
+        ])
+        sa.session.commit()
+        yield app
+        sa.session.remove()
+        sa.drop_all()
+
+
+@pytest.fixture
+def remote_file(mocker):
+    """
+    Fixture for serving a file body through a mocked `get` of the shared HTTP session used by the CSV and JSON
+    repositories.
+    When an ETag is given, requests carrying a matching If-None-Match header are answered with 304.
+
+    :return: A function which takes the file body, an optional ETag and an optional status code
+    and returns the mock of `get`.
+    """
+    def serve(body: str, etag: str | None = None, status: int = 200):
+        def get(url, headers=None, **kwargs):
+            response = requests.Response()
+            response.url = url
+            if etag and (headers or {}).get('If-None-Match') == etag:
+                response.status_code = 304
+                response.raw = io.BytesIO(b'')
+                return response
+
+            response.status_code = status
+            response.raw = io.BytesIO(body.encode('utf-8'))
+            if etag:
+                response.headers['ETag'] = etag
+            return response
+
+        return mocker.patch.object(http_session, 'get', side_effect=get)
+
+    return serve
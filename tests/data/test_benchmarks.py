@@ -0,0 +1,46 @@
+import filecmp
+from flask import Flask
+from src.app.data.database.configuration import sa
+from src.app.data.database.repository import customer_product_repository_sql
+from src.app.data.repository import CustomerProductRepositoryCSV, CustomerProductRepositoryJSON
+from src.app.data.snapshot import read_snapshot
+from src.app.model import Purchase
+from src.benchmarks.generator import DatasetSpec, iter_purchases, write_dataset
+from src.benchmarks.runner import ROUTES, compare, run_benchmarks
+
+
+def purchased_ids(purchase: Purchase) -> dict:
+    return {customer: sorted(product.id for product in products)
+            for customer, products in purchase.customers_and_their_products.items() if products}
+
+
+def test_datasets_are_reproducible_and_identical_across_formats(tmp_path):
+    spec = DatasetSpec(rows=500, seed=7)
+    paths = write_dataset(spec, str(tmp_path / 'first'))
+    assert filecmp.cmp(write_dataset(spec, str(tmp_path / 'second'), ('csv',))['csv'], paths['csv'], shallow=False)
+    assert sum(len(products) for _, products in iter_purchases(spec)) == 500
+
+    from_csv = CustomerProductRepositoryCSV(path=paths['csv']).get_purchases()
+    assert CustomerProductRepositoryJSON(path=paths['json']).get_purchases() == from_csv
+    assert read_snapshot(paths['snapshot']) == from_csv
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{paths["sqlite"]}'
+    sa.init_app(app)
+    with app.app_context():
+        assert purchased_ids(customer_product_repository_sql.get_purchases()) == purchased_ids(from_csv)
+        sa.engine.dispose()
+
+
+def test_every_method_and_route_is_timed_and_regressions_are_reported(tmp_path, mocker):
+    mocker.patch('src.app.data.database.repository.CrudRepositoryORM._change_listeners', [])
+    results = run_benchmarks([200], ['csv', 'sqlite-pushdown', 'snapshot'], str(tmp_path), repeat=1)
+
+    timings = results['results']['200']
+    assert set(timings) == {'csv', 'sqlite-pushdown', 'snapshot'}
+    assert set(timings['csv']['routes']) == set(ROUTES)
+    assert len(timings['sqlite-pushdown']['methods']) == 13
+
+    slower = {'results': {'200': {'csv': {'load': timings['csv']['load'] + 1}}}}
+    assert compare(results, results) == []
+    assert [regression.split(':')[0] for regression in compare(slower, results)] == ['200/csv/load']
@@ -0,0 +1,80 @@
+import gzip
+import threading
+import pytest
+import requests
+from flask import Flask
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.app.data.http_client import create_session, session_stats
+from src.app.data.repository import CustomerProductRepositoryCSV
+from tests.data.test_remote_repositories import CSV_BODY, EXPECTED
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    failures = 0
+
+    def do_GET(self):
+        if Handler.failures:
+            Handler.failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = gzip.compress(CSV_BODY.encode('utf-8'))
+        self.send_response(200)
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url() -> str:
+    """
+    Fixture for running a local keep-alive HTTP server serving a gzip-compressed CSV file.
+
+    :return: The URL of the file.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/data.csv'
+    server.shutdown()
+    server.server_close()
+
+
+def test_connections_are_reused(server_url: str):
+    session = create_session()
+    repository = CustomerProductRepositoryCSV(path=server_url, session=session, timeout=5)
+    for _ in range(3):
+        assert repository.get_purchases().customers_and_their_products == EXPECTED
+    assert session_stats(session) == {'requests': 3, 'connections_opened': 1, 'connections_reused': 2}
+
+
+def test_transient_errors_are_retried(server_url: str):
+    Handler.failures = 2
+    session = create_session(retries=3, backoff_factor=0)
+    repository = CustomerProductRepositoryCSV(path=server_url, session=session, timeout=5)
+    assert repository.get_purchases().customers_and_their_products == EXPECTED
+    assert session_stats(session)['requests'] == 3
+
+
+def test_persistent_errors_are_raised_after_the_retries(server_url: str, monkeypatch, mocker):
+    from src.app.create_app import configure_database
+
+    Handler.failures = 10
+    session = create_session(retries=1, backoff_factor=0)
+    mocker.patch('src.app.create_app.http_session', session)
+    monkeypatch.setenv('SOURCE', 'sql')
+    monkeypatch.setenv('SQLALCHEMY_DATABASE_URL', server_url)
+    try:
+        with pytest.raises(requests.HTTPError):
+            CustomerProductRepositoryCSV(path=server_url, session=session, timeout=5).get_purchases()
+        with pytest.raises(requests.HTTPError):
+            configure_database(Flask(__name__))
+    finally:
+        Handler.failures = 0
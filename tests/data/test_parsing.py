@@ -0,0 +1,46 @@
+import csv
+import io
+import json
+import pytest
+from src.app.data.parsing import CSVRecordParser, iter_json_array
+
+
+def chunked(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_yields_elements_across_chunk_boundaries(size: int):
+    data = [{"ID": 1, "Purchases": [{"Price": 12.5}]}, 12345, "a, ]", [], {"ID": 2}, 0.25]
+    text = ' [\n' + ',\n  '.join(json.dumps(element) for element in data) + ' ]\n'
+    assert list(iter_json_array(chunked(text, size))) == data
+
+
+@pytest.mark.parametrize("text", ["[]", " [ ] "])
+def test_empty_array(text: str):
+    assert list(iter_json_array(chunked(text, 1))) == []
+
+
+@pytest.mark.parametrize("text", ["", "{}", "[1, 2", "[1 2]", '[{"ID": 1}'])
+def test_malformed_array(text: str):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked(text, 2)))
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+@pytest.mark.parametrize("text", [
+    'ID,Product\r\n1,"Laptop\r\n15"""\r\n\r\n2,"a,\nb"\r\n3,\r\n',
+    'ID,Product\n1,Laptop\n2,"Phone ""X"""',
+    'ID,Product\n1\n2,Hat,extra\n'
+])
+def test_csv_rows_match_dict_reader(size: int, text: str):
+    parser = CSVRecordParser()
+    rows = [row for chunk in chunked(text, size) for row in parser.feed(chunk)] + parser.close()
+    assert rows == list(csv.DictReader(io.StringIO(text, newline='')))
+
+
+def test_csv_ending_inside_a_quoted_field():
+    parser = CSVRecordParser()
+    parser.feed('ID,Product\n1,"Laptop\n')
+    with pytest.raises(csv.Error):
+        parser.close()
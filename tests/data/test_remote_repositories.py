@@ -0,0 +1,145 @@
+import json
+import pytest
+from decimal import Decimal
+from src.app.data.repository import CustomerProductRepositoryCSV, CustomerProductRepositoryJSON
+from src.app.data.cache import SnapshotCache
+from src.app.model import Customer, Product
+from src.app.refresher import SnapshotRefresher
+from src.app.service import PurchasesService
+
+CSV_BODY = (
+    "ID,FirstName,LastName,Age,Salary,ProductID,Product,Category,Price\r\n"
+    "1,John,Doe,30,1000.00,1,Laptop,Electronics,1200.00\r\n"
+    "2,Jane,Doe,25,1500.00,3,Shoes,Clothing,100.00\r\n"
+    "1,John,Doe,30,1000.00,2,Smartphone,Electronics,800.00\r\n"
+    "3,Sam,Smith,28,100.00,,,,\r\n"
+)
+
+JSON_BODY = json.dumps([
+    {"ID": 1, "FirstName": "John", "LastName": "Doe", "Age": 30, "Salary": "1000.00", "Purchases": [
+        {"ProductID": 1, "Product": "Laptop", "Category": "Electronics", "Price": "1200.00"},
+        {"ProductID": 2, "Product": "Smartphone", "Category": "Electronics", "Price": "800.00"}
+    ]},
+    {"ID": 2, "FirstName": "Jane", "LastName": "Doe", "Age": 25, "Salary": "1500.00", "Purchases": [
+        {"ProductID": 3, "Product": "Shoes", "Category": "Clothing", "Price": "100.00"}
+    ]},
+    {"ID": 3, "FirstName": "Sam", "LastName": "Smith", "Age": 28, "Salary": "100.00", "Purchases": []}
+])
+
+EXPECTED = {
+    Customer(id=1, first_name="John", last_name="Doe", age=30, cash=Decimal('1000.00')): [
+        Product(id=1, name="Laptop", category="Electronics", price=Decimal('1200.00')),
+        Product(id=2, name="Smartphone", category="Electronics", price=Decimal('800.00'))
+    ],
+    Customer(id=2, first_name="Jane", last_name="Doe", age=25, cash=Decimal('1500.00')): [
+        Product(id=3, name="Shoes", category="Clothing", price=Decimal('100.00'))
+    ],
+    Customer(id=3, first_name="Sam", last_name="Smith", age=28, cash=Decimal('100.00')): []
+}
+
+
+@pytest.mark.parametrize("stream, chunk_size", [(False, 1), (True, 1), (True, 16), (True, 64 * 1024)])
+def test_csv_repository(remote_file, stream: bool, chunk_size: int):
+    remote_file(CSV_BODY)
+    repository = CustomerProductRepositoryCSV(path='http://example.com/data.csv', stream=stream, chunk_size=chunk_size)
+    assert repository.get_purchases().customers_and_their_products == EXPECTED
+
+
+@pytest.mark.parametrize("stream, chunk_size", [(False, 1), (True, 1), (True, 16), (True, 64 * 1024)])
+def test_csv_quoted_fields_keep_their_newlines(remote_file, stream: bool, chunk_size: int):
+    remote_file(CSV_BODY.replace('Laptop', '"Laptop\r\n15\u2033"').replace('Shoes', '"Running\nshoes"'))
+    repository = CustomerProductRepositoryCSV(path='http://example.com/data.csv', stream=stream, chunk_size=chunk_size)
+
+    products = {product.id: product.name
+                for products in repository.get_purchases().customers_and_their_products.values() for product in products}
+    assert products == {1: 'Laptop\r\n15\u2033', 2: 'Smartphone', 3: 'Running\nshoes'}
+
+
+@pytest.mark.parametrize("stream, chunk_size", [(False, 1), (True, 1), (True, 16), (True, 64 * 1024)])
+def test_json_repository(remote_file, stream: bool, chunk_size: int):
+    remote_file(JSON_BODY)
+    repository = CustomerProductRepositoryJSON(path='http://example.com/data.json', stream=stream, chunk_size=chunk_size)
+    assert repository.get_purchases().customers_and_their_products == EXPECTED
+
+
+@pytest.mark.parametrize(
+    "repository_type, body",
+    [
+        (CustomerProductRepositoryCSV, CSV_BODY),
+        (CustomerProductRepositoryJSON, JSON_BODY)
+    ]
+)
+def test_not_modified_reuses_parsed_purchases(remote_file, repository_type: type, body: str):
+    get = remote_file(body, etag='"v1"')
+    repository = repository_type(path='http://example.com/data')
+    first = repository.get_purchases()
+    second = repository.get_purchases()
+
+    assert second is first
+    assert repository.stats()['downloads'] == 1
+    assert repository.stats()['not_modified'] == 1
+    assert 'If-None-Match' not in get.call_args_list[0].kwargs['headers']
+    assert get.call_args_list[1].kwargs['headers'] == {'If-None-Match': '"v1"'}
+
+
+def test_changed_file_is_downloaded_again(remote_file):
+    remote_file(CSV_BODY, etag='"v1"')
+    repository = CustomerProductRepositoryCSV(path='http://example.com/data.csv')
+    repository.get_purchases()
+    remote_file(CSV_BODY.replace('Laptop', 'Tablet'), etag='"v2"')
+    purchases = repository.get_purchases()
+
+    assert repository.stats()['downloads'] == 2
+    assert repository.stats()['not_modified'] == 0
+    assert purchases.customers_and_their_products[Customer(1, "John", "Doe", 30, Decimal('1000.00'))][0].name == 'Tablet'
+
+
+@pytest.mark.parametrize(
+    "repository_type, body",
+    [
+        (CustomerProductRepositoryCSV, CSV_BODY),
+        (CustomerProductRepositoryJSON, JSON_BODY)
+    ]
+)
+def test_persistent_server_error_keeps_last_good_snapshot(remote_file, repository_type: type, body: str):
+    remote_file(body)
+    service = PurchasesService(customer_product_repository=repository_type(path='http://example.com/data'),
+                               snapshot_cache=SnapshotCache(ttl=float('inf')))
+    refresher = SnapshotRefresher(service=service)
+    assert refresher.refresh()
+
+    remote_file('<html>Service Unavailable</html>', status=503)
+    assert not refresher.refresh()
+    assert service.get_all_purchases().customers_and_their_products == EXPECTED
+    assert '503' in refresher.status()['last_error']
+
+
+def test_unchanged_local_file_is_not_parsed_again(tmp_path):
+    path = tmp_path / 'purchases.csv'
+    path.write_text(CSV_BODY, encoding='utf-8')
+    repository = CustomerProductRepositoryCSV(path=str(path))
+    first = repository.get_purchases()
+
+    assert repository.get_purchases() is first
+    (tmp_path / 'replacement.csv').write_text(CSV_BODY.replace('Laptop', 'Tablet'), encoding='utf-8')
+    (tmp_path / 'replacement.csv').replace(path)
+    assert repository.get_purchases() is not first
+    assert repository.stats()['not_modified'] == 1
+
+
+@pytest.mark.parametrize(
+    "repository_type, body",
+    [
+        (CustomerProductRepositoryCSV, CSV_BODY + "3,Sam,Smith,28,100.00,1,Laptop,Electronics,1200.00\r\n"),
+        (CustomerProductRepositoryJSON, JSON_BODY.replace('"Purchases": []', '"Purchases": [{"ProductID": 1, '
+                                                          '"Product": "Laptop", "Category": "Electronics", '
+                                                          '"Price": "1200.00"}]'))
+    ]
+)
+def test_products_are_shared_between_customers(remote_file, repository_type: type, body: str):
+    remote_file(body)
+    purchases = list(repository_type(path='http://example.com/data').get_purchases().customers_and_their_products.values())
+
+    assert purchases[2][0] is purchases[0][0]
+    assert purchases[0][0].category is purchases[0][1].category
+    assert not hasattr(purchases[0][0], '__dict__')
@@ -0,0 +1,78 @@
+import pytest
+from decimal import Decimal
+from unittest.mock import MagicMock
+from src.app.data.repository import CustomerProductRepositorySnapshot
+from src.app.data.snapshot import SnapshotFile, SnapshotPublisher, main, read_snapshot, write_snapshot
+from src.app.service import PurchasesService
+from src.app.model import Customer, Product, Purchase
+from tests.data.test_remote_repositories import CSV_BODY, JSON_BODY, EXPECTED
+
+
+def test_round_trip_preserves_values_and_exponents(tmp_path):
+    laptop = Product(id=1, name="Laptop", category="Electronics", price=Decimal('1200.00'))
+    purchase = Purchase(customers_and_their_products={
+        Customer(id=1, first_name="Zoë", last_name="Łukasiewicz", age=30, cash=Decimal('1E+3')): [
+            laptop,
+            Product(id=2, name="Cable", category="Electronics", price=Decimal('0.5'))
+        ],
+        Customer(id=2, first_name="Jane", last_name="Doe", age=25, cash=Decimal(19.99)): [laptop],
+        Customer(id=3, first_name="", last_name="", age=0, cash=Decimal('-0.00')): []
+    })
+    path = tmp_path / 'purchases.bin'
+    write_snapshot(purchase, str(path))
+    result = read_snapshot(str(path))
+
+    assert [(repr(c), [repr(p) for p in products]) for c, products in result.customers_and_their_products.items()] \
+        == [(repr(c), [repr(p) for p in products]) for c, products in purchase.customers_and_their_products.items()]
+
+
+def test_columns_are_memory_mapped_arrays(tmp_path):
+    path = tmp_path / 'purchases.bin'
+    write_snapshot(Purchase(customers_and_their_products=EXPECTED), str(path))
+    with SnapshotFile(str(path)) as snapshot:
+        assert snapshot.counts == {'customers': 3, 'products': 3, 'purchases': 3, 'strings': 10}
+        assert list(snapshot.columns['customer_age']) == [30, 25, 28]
+        assert list(snapshot.columns['product_price_coefficient']) == [120000, 80000, 10000]
+        assert list(snapshot.columns['customer_purchases_offset']) == [0, 2, 3, 3]
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / 'purchases.bin'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        read_snapshot(str(path))
+
+
+@pytest.mark.parametrize("file_format, body", [("csv", CSV_BODY), ("json", JSON_BODY)])
+def test_convert_local_export(tmp_path, file_format: str, body: str):
+    source, output = tmp_path / f'purchases.{file_format}', tmp_path / 'purchases.bin'
+    source.write_text(body, encoding='utf-8')
+    main([file_format, str(source), str(output)])
+    assert CustomerProductRepositorySnapshot(path=str(output)).get_purchases().customers_and_their_products == EXPECTED
+
+
+def test_published_snapshot_is_decoded_only_when_replaced(tmp_path):
+    path = str(tmp_path / 'purchases.bin')
+    purchase = Purchase(customers_and_their_products=EXPECTED)
+    loader = MagicMock(return_value=purchase)
+    publisher = SnapshotPublisher(loader=loader, path=path)
+    service = PurchasesService(customer_product_repository=CustomerProductRepositorySnapshot(path=path))
+
+    publisher.refresh()
+    service.refresh()
+    index = service._get_index()
+    publisher.refresh()
+    service.refresh()
+
+    assert publisher.published == 1
+    assert service.customer_product_repository.stats() == {'loads': 1, 'unchanged': 1}
+    assert service._get_index() is index
+
+    loader.return_value = Purchase(customers_and_their_products=dict(list(EXPECTED.items())[:1]))
+    publisher.refresh()
+    service.refresh()
+
+    assert publisher.published == 2
+    assert service.customer_product_repository.stats() == {'loads': 2, 'unchanged': 1}
+    assert service.get_all_purchases().customers_and_their_products == loader.return_value.customers_and_their_products
+    assert service._get_index() is not index
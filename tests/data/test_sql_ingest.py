@@ -0,0 +1,96 @@
+import json
+import pytest
+from decimal import Decimal
+from flask import Flask
+from src.app.data.database.configuration import sa
+from src.app.data.database.entity import CustomerEntity, ProductEntity, CustomerProductEntity
+from src.app.data.database.repository import customer_product_repository_sql
+from src.app.model import Customer, Product
+from src.app.routes import purchases
+from src.app.routes.streaming import NDJSON_MIMETYPE
+
+CSV_UPLOAD = """ID,FirstName,LastName,Age,Salary,ProductID,Product,Category,Price
+1,John,Doe,31,900.00,1,Laptop,Electronics,1100.00
+3,Sam,Smith,28,100.00,5,Ball,Sports,20.00
+3,Sam,Smith,28,100.00,1,Laptop,Electronics,1100.00
+5,Eve,Stone,40,10.00,,,,
+"""
+
+
+@pytest.fixture
+def client(sql_app: Flask, mocker):
+    """
+    Fixture for creating a test client of the purchases blueprint over the SQLite database, serving the SQL source.
+
+    :return: A Flask test client.
+    """
+    mocker.patch('src.app.routes.purchases.repo_type', 'sql')
+    sql_app.register_blueprint(purchases.purchases_blueprint)
+    return sql_app.test_client()
+
+
+def purchased_product_ids() -> dict[int, list[int]]:
+    return {customer.id: [product.id for product in products]
+            for customer, products in customer_product_repository_sql.get_purchases().customers_and_their_products.items()}
+
+
+# Customers and products repeated across chunks are written once per chunk, and existing purchases are not counted
+@pytest.mark.parametrize("chunk_size, counts", [(1, (4, 3, 2)), (2, (4, 3, 2)), (1000, (3, 2, 2))])
+def test_csv_upload_is_upserted(client, chunk_size: int, counts: tuple[int, int, int]):
+    response = client.post(f'/purchases/ingest?chunk_size={chunk_size}', data=CSV_UPLOAD, content_type='text/csv')
+
+    assert response.status_code == 200
+    assert response.json['rows'] == response.json['customers'] + response.json['products'] + response.json['purchases']
+    assert response.json['rows_per_second'] > 0
+    assert (response.json['customers'], response.json['products'], response.json['purchases']) == counts
+    assert sa.session.get(CustomerEntity, 1).age == 31
+    assert sa.session.get(ProductEntity, 1).price == Decimal('1100.00')
+    assert sa.session.get(CustomerEntity, 5).first_name == 'Eve'
+    assert purchased_product_ids() == {1: [1, 2], 2: [3], 3: [1, 5], 4: [4]}
+
+
+def test_ndjson_upload_is_upserted(client):
+    entries = [
+        {'ID': 2, 'FirstName': 'Jane', 'LastName': 'Doe', 'Age': 25, 'Salary': '1500.00',
+         'Purchases': [{'ProductID': 5, 'Product': 'Ball', 'Category': 'Sports', 'Price': '20.00'}]},
+        {'ID': 6, 'FirstName': 'Max', 'LastName': 'Ray', 'Age': 50, 'Salary': '0.00', 'Purchases': []}
+    ]
+    body = ''.join(json.dumps(entry) + '\n' for entry in entries) + '\n'
+    response = client.post('/purchases/ingest', data=body, content_type=NDJSON_MIMETYPE)
+
+    assert (response.json['customers'], response.json['products'], response.json['purchases']) == (2, 1, 1)
+    assert customer_product_repository_sql.get_purchases().customers_and_their_products[
+        Customer(id=2, first_name='Jane', last_name='Doe', age=25, cash=Decimal('1500.00'))
+    ] == [Product(id=3, name='Shoes', category='Clothing', price=Decimal('100.00')),
+          Product(id=5, name='Ball', category='Sports', price=Decimal('20.00'))]
+    assert sa.session.get(CustomerEntity, 6).age == 50
+
+
+def test_invalid_uploads_are_rejected_without_writing(client):
+    invalid = CSV_UPLOAD.replace('20.00', 'twenty')
+    response = client.post('/purchases/ingest?chunk_size=1', data=invalid, content_type='text/csv')
+    assert response.status_code == 400
+    assert sa.session.get(CustomerEntity, 1).age == 30
+    assert sa.session.query(CustomerProductEntity).count() == 4
+
+    assert client.post('/purchases/ingest', data='{}', content_type='application/json').status_code == 415
+    assert client.post('/purchases/ingest?chunk_size=0', data=CSV_UPLOAD, content_type='text/csv').status_code == 400
+
+
+@pytest.mark.parametrize("malformed", [
+    CSV_UPLOAD + '6,"Ann,Lee,33,5.00,,,,\n',
+    CSV_UPLOAD + '6,"Ann"x,Lee,33,5.00,,,,\n',
+    CSV_UPLOAD.replace('Stone', 'Sto\0ne')
+], ids=['unterminated quote', 'text after quote', 'NUL byte'])
+def test_malformed_csv_uploads_are_rejected_without_writing(client, malformed: str):
+    response = client.post('/purchases/ingest', data=malformed, content_type='text/csv')
+    assert response.status_code == 400
+    assert sa.session.get(CustomerEntity, 5) is None
+
+
+def test_file_sources_refuse_uploads(client, mocker):
+    mocker.patch('src.app.routes.purchases.repo_type', 'csv')
+    response = client.post('/purchases/ingest', data=CSV_UPLOAD, content_type='text/csv')
+
+    assert response.status_code == 409
+    assert sa.session.get(CustomerEntity, 1).age == 30
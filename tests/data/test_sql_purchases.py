@@ -0,0 +1,47 @@
+from decimal import Decimal
+from flask import Flask
+from sqlalchemy import event
+from src.app.data.database.configuration import sa
+from src.app.data.database.repository import customer_product_repository_sql
+from src.app.model import Customer, Product
+
+
+def test_get_purchases_uses_single_query(sql_app: Flask):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(sa.engine, 'before_cursor_execute', listener)
+    try:
+        purchases = customer_product_repository_sql.get_purchases()
+    finally:
+        event.remove(sa.engine, 'before_cursor_execute', listener)
+
+    assert len(statements) == 1
+    assert purchases.customers_and_their_products == {
+        Customer(id=1, first_name="John", last_name="Doe", age=30, cash=Decimal('1000.00')): [
+            Product(id=1, name="Laptop", category="Electronics", price=Decimal('1200.00')),
+            Product(id=2, name="Smartphone", category="Electronics", price=Decimal('800.00'))
+        ],
+        Customer(id=2, first_name="Jane", last_name="Doe", age=25, cash=Decimal('1500.00')): [
+            Product(id=3, name="Shoes", category="Clothing", price=Decimal('100.00'))
+        ],
+        Customer(id=4, first_name="Ann", last_name="Lee", age=30, cash=Decimal('50.00')): [
+            Product(id=4, name="Hat", category="Clothing", price=Decimal('100.00'))
+        ]
+    }
+
+
+def test_get_purchases_with_small_batches(sql_app: Flask):
+    customer_product_repository_sql.batch_size = 1
+    try:
+        purchases = customer_product_repository_sql.get_purchases()
+    finally:
+        customer_product_repository_sql.batch_size = 1000
+
+    assert [c.id for c in purchases.customers_and_their_products] == [1, 2, 4]
+    assert sum(len(p) for p in purchases.customers_and_their_products.values()) == 4
+
+
+def test_iter_purchases_yields_customers_in_id_order(sql_app: Flask):
+    streamed = list(customer_product_repository_sql.iter_purchases())
+    assert [customer.id for customer, _ in streamed] == [1, 2, 4]
+    assert dict(streamed) == customer_product_repository_sql.get_purchases().customers_and_their_products
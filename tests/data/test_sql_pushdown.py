@@ -0,0 +1,66 @@
+import pytest
+from decimal import Decimal
+from flask import Flask
+from src.app.data.cache import SnapshotCache
+from src.app.data.database.repository import customer_product_repository_sql
+from src.app.service import PurchasesService, SQLPurchasesService
+
+
+@pytest.fixture
+def services(sql_app: Flask) -> tuple[PurchasesService, SQLPurchasesService]:
+    """
+    Fixture for creating an in-memory and a push-down service over the same SQLite database.
+
+    :return: A tuple of the in-memory service and the push-down service.
+    """
+    return (
+        PurchasesService(customer_product_repository=customer_product_repository_sql, snapshot_cache=SnapshotCache(0)),
+        SQLPurchasesService(customer_product_repository=customer_product_repository_sql,
+                            snapshot_cache=SnapshotCache(0))
+    )
+
+
+@pytest.mark.parametrize(
+    "method, args",
+    [
+        ("get_customer_who_spent_the_most", ()),
+        ("get_most_spending_in_category", ("Electronics",)),
+        ("get_most_spending_in_category", ("Clothing",)),
+        ("get_most_spending_in_category", ("Toys",)),
+        ("get_category_and_avg_price", ()),
+        ("get_most_and_least_expensive_in_category", ()),
+        ("get_customers_with_debts", ()),
+        *[("get_customers_total_spent", (customer_id,)) for customer_id in range(1, 6)],
+        *[("get_customers_debt", (customer_id,)) for customer_id in range(1, 6)],
+        *[("can_customer_pay", (customer_id,)) for customer_id in range(1, 6)],
+    ]
+)
+def test_pushdown_matches_in_memory(services: tuple, method: str, args: tuple):
+    in_memory, pushdown = services
+    assert getattr(pushdown, method)(*args) == getattr(in_memory, method)(*args)
+
+
+def test_most_and_least_expensive_prefers_lower_id_on_ties(services: tuple):
+    _, pushdown = services
+    result = pushdown.get_most_and_least_expensive_in_category()
+    assert (result['Electronics'].max.id, result['Electronics'].min.id) == (1, 2)
+    assert (result['Clothing'].max.id, result['Clothing'].min.id) == (3, 3)
+
+
+def test_debts_are_exact(services: tuple):
+    _, pushdown = services
+    assert pushdown.get_customers_with_debts() == {1: Decimal('1000.00'), 4: Decimal('50.00')}
+    assert str(pushdown.get_customers_debt(2)) == '0'
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 10])
+def test_pushdown_pages_match_in_memory(services: tuple, limit: int):
+    in_memory, pushdown = services
+    after = None
+    while True:
+        expected = in_memory.get_purchases_page(limit, after)
+        page = pushdown.get_purchases_page(limit, after)
+        assert page == expected
+        if page[1] is None:
+            break
+        after = page[1]
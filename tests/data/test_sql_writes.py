@@ -0,0 +1,141 @@
+import gc
+import pytest
+from decimal import Decimal
+from flask import Flask
+from src.app.data.cache import SnapshotCache
+from src.app.data.database.configuration import sa
+from src.app.data.database.entity import CustomerEntity, ProductEntity, CustomerProductEntity
+from src.app.data.database.repository import (
+    CrudRepositoryORM,
+    CustomerProductRepositorySQL,
+    CustomerRepositorySQL,
+    ProductRepositorySQL,
+    customer_product_repository_sql
+)
+from src.app.index import PurchaseIndex
+from src.app.model import Customer, Product, PurchaseChange
+from src.app.service import PurchasesService
+
+JOHN = Customer(id=1, first_name="John", last_name="Doe", age=30, cash=Decimal('1000.00'))
+SAM = Customer(id=3, first_name="Sam", last_name="Smith", age=28, cash=Decimal('100.00'))
+ANN = Customer(id=4, first_name="Ann", last_name="Lee", age=30, cash=Decimal('50.00'))
+LAPTOP = Product(id=1, name="Laptop", category="Electronics", price=Decimal('1200.00'))
+HAT = Product(id=4, name="Hat", category="Clothing", price=Decimal('100.00'))
+
+
+@pytest.fixture
+def changes(mocker, sql_app: Flask) -> list:
+    """
+    Fixture recording the changes passed to the change listeners of the ORM repositories.
+
+    :return: The list to which the changes of every write are appended.
+    """
+    recorded = []
+    mocker.patch.object(CrudRepositoryORM, '_change_listeners', [])
+    customer_product_repository_sql.add_change_listener(recorded.append)
+    return recorded
+
+
+def test_writes_describe_purchase_changes(changes: list):
+    customer_product_repository_sql.save_or_update(CustomerProductEntity(customer_id=3, product_id=1))
+    customer_product_repository_sql.delete_by_id((4, 4))
+    CustomerRepositorySQL(sa).save_or_update(CustomerEntity(first_name="New", last_name="Buyer", age=40, cash=0))
+    customer_product_repository_sql.delete_all()
+
+    assert changes == [[PurchaseChange(SAM, LAPTOP, added=True)], [PurchaseChange(ANN, HAT, added=False)], [], None]
+
+
+def test_updates_and_customers_inserted_with_purchases_are_not_described(changes: list):
+    customer = sa.session.get(CustomerEntity, 3)
+    customer.cash = Decimal('5000.00')
+    CustomerRepositorySQL(sa).save_or_update(customer)
+
+    new_customer = CustomerEntity(first_name="New", last_name="Buyer", age=40, cash=0)
+    new_customer.purchases.append(sa.session.get(ProductEntity, 3))
+    CustomerRepositorySQL(sa).save_or_update_many([new_customer])
+
+    assert changes == [None, None]
+
+
+def test_purchase_writes_are_applied_without_reloading(sql_app: Flask, mocker):
+    mocker.patch.object(CrudRepositoryORM, '_change_listeners', [])
+    service = PurchasesService(customer_product_repository=customer_product_repository_sql,
+                               snapshot_cache=SnapshotCache(ttl=3600))
+    assert service.get_customer_who_spent_the_most() == [JOHN]
+    from_purchase = mocker.spy(PurchaseIndex, 'from_purchase')
+
+    customer_product_repository_sql.save_or_update_many([
+        CustomerProductEntity(customer_id=3, product_id=1),
+        CustomerProductEntity(customer_id=3, product_id=2)
+    ])
+    customer_product_repository_sql.delete_by_id((4, 4))
+
+    assert (service.snapshot_cache.misses, from_purchase.call_count) == (1, 0)
+    assert service.snapshot_cache.version == 3
+    assert service.get_customer_who_spent_the_most() == [JOHN, SAM]
+    assert service.get_customers_with_debts() == {1: Decimal('1000.00'), 3: Decimal('1900.00')}
+    assert service.get_customers_debt(4) == Decimal(-1)
+    assert service.get_category_and_avg_price() == {'Electronics': Decimal('1000.00'), 'Clothing': Decimal('100.00')}
+
+    reloaded = PurchasesService(customer_product_repository=customer_product_repository_sql,
+                                snapshot_cache=SnapshotCache(ttl=0))
+    assert service.get_all_purchases() == reloaded.get_all_purchases()
+    assert service.get_age_category_preference() == reloaded.get_age_category_preference()
+    assert service.get_most_frequent_category_for_customers() == reloaded.get_most_frequent_category_for_customers()
+
+
+def test_writes_which_cannot_be_applied_reload_the_snapshot(sql_app: Flask, mocker):
+    mocker.patch.object(CrudRepositoryORM, '_change_listeners', [])
+    service = PurchasesService(customer_product_repository=customer_product_repository_sql,
+                               snapshot_cache=SnapshotCache(ttl=3600))
+    service.get_customers_with_debts()
+
+    product = sa.session.get(ProductEntity, 3)
+    product.price = Decimal('2000.00')
+    ProductRepositorySQL(sa).save_or_update(product)
+
+    assert service.get_customers_debt(2) == Decimal('500.00')
+    assert service.snapshot_cache.misses == 2
+
+
+def test_discarded_services_stop_listening(changes: list):
+    service = PurchasesService(customer_product_repository=customer_product_repository_sql)
+    assert len(CrudRepositoryORM._change_listeners) == 2
+
+    del service
+    gc.collect()
+    customer_product_repository_sql.delete_by_id((4, 4))
+
+    assert len(CrudRepositoryORM._change_listeners) == 1
+    assert changes == [[PurchaseChange(ANN, HAT, added=False)]]
+
+
+def test_deletes_are_set_based_and_report_deleted_rows(changes: list):
+    repository = CustomerProductRepositorySQL(sa, product_repository=ProductRepositorySQL(sa),
+                                              customer_repository=CustomerRepositorySQL(sa), batch_size=1)
+    assert repository.delete_many([(1, 1), (4, 4), (9, 9), (1, 1)]) == 2
+    assert repository.delete_by_id((9, 9)) == 0
+    assert CustomerRepositorySQL(sa).delete_many([2, 3]) == 2
+
+    assert changes == [[PurchaseChange(JOHN, LAPTOP, added=False), PurchaseChange(ANN, HAT, added=False)], None]
+    assert sorted((row.customer_id, row.product_id) for row in repository.find_all()) == [(1, 2)]
+    assert CustomerRepositorySQL(sa).find_by_id(2) is None
+
+
+@pytest.mark.parametrize("batch_size", [None, 3])
+def test_delete_all_removes_associations(changes: list, batch_size: int | None):
+    assert ProductRepositorySQL(sa).delete_all(batch_size) == 4
+    assert ProductRepositorySQL(sa).delete_all(batch_size) == 0
+
+    assert changes == [None]
+    assert sa.session.query(CustomerProductEntity).count() == 0
+    assert sa.session.query(CustomerEntity).count() == 4
+
+
+@pytest.mark.parametrize("batch_size", [None, 1, 3])
+def test_delete_all_with_composite_primary_key(changes: list, batch_size: int | None):
+    assert customer_product_repository_sql.delete_all(batch_size) == 4
+
+    assert changes == [None]
+    assert sa.session.query(CustomerProductEntity).count() == 0
+    assert sa.session.query(ProductEntity).count() == 4
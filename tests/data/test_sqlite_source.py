@@ -0,0 +1,83 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+from src.app.asgi import create_repository
+from src.app.create_app import configure_database
+from sqlalchemy import create_engine
+from src.app.data.database.configuration import create_sqlite_schema, sa, sqlite_url
+from src.app.data.database.repository import customer_product_repository_sql
+from src.app.data.repository import CustomerProductRepositoryCSV
+from src.app.service import SQLPurchasesService
+from src.benchmarks.generator import DatasetSpec, write_dataset
+
+INDEXES = {'ix_customer_product_product_id', 'ix_products_category'}
+
+
+def index_names(path: str) -> set[str]:
+    with sqlite3.connect(path) as connection:
+        return {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_sqlite_source_uses_wal_and_creates_missing_indexes(tmp_path, monkeypatch, mocker):
+    path = str(tmp_path / 'purchases.db')
+    with sqlite3.connect(path) as connection:
+        connection.execute('CREATE TABLE customers (id INTEGER PRIMARY KEY, first_name VARCHAR(255), '
+                           'last_name VARCHAR(255), age INTEGER, cash NUMERIC(10, 2))')
+    monkeypatch.setenv('SOURCE', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', path)
+    http_get = mocker.patch('src.app.create_app.http_session.get')
+
+    app = Flask(__name__)
+    configure_database(app)
+    with app.app_context():
+        assert sa.session.execute(sa.text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert sa.session.execute(sa.text('PRAGMA foreign_keys')).scalar() == 1
+        assert customer_product_repository_sql.get_purchases().customers_and_their_products == {}
+        sa.session.remove()
+        sa.engine.dispose()
+
+    http_get.assert_not_called()
+    assert INDEXES <= index_names(path)
+
+
+def test_workers_may_create_the_schema_at_the_same_time(tmp_path):
+    path = str(tmp_path / 'purchases.db')
+    engines = [create_engine(sqlite_url(path)) for _ in range(4)]
+    barrier = threading.Barrier(len(engines))
+
+    def create(engine) -> None:
+        barrier.wait()
+        create_sqlite_schema(engine)
+        engine.dispose()
+
+    with ThreadPoolExecutor(len(engines)) as executor:
+        list(executor.map(create, engines))
+    assert INDEXES <= index_names(path)
+
+
+def test_sqlite_source_answers_queries_like_the_file_sources(tmp_path, monkeypatch, mocker):
+    paths = write_dataset(DatasetSpec(rows=300, seed=3), str(tmp_path), ('csv', 'sqlite'))
+    monkeypatch.setenv('SOURCE', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', paths['sqlite'])
+    mocker.patch('src.app.data.database.repository.CrudRepositoryORM._change_listeners', [])
+    expected = CustomerProductRepositoryCSV(path=paths['csv']).get_purchases()
+
+    app = Flask(__name__)
+    configure_database(app)
+    with app.app_context():
+        service = SQLPurchasesService(customer_product_repository_sql)
+        assert service.get_customers_with_debts() == {
+            customer.id: sum(product.price for product in products) - customer.cash
+            for customer, products in expected.customers_and_their_products.items()
+            if sum(product.price for product in products) > customer.cash
+        }
+        sa.engine.dispose()
+
+    async def load():
+        repository = await create_repository('sqlite')
+        return await repository.get_purchases()
+
+    assert set(asyncio.run(load()).customers_and_their_products) == \
+           {customer for customer, products in expected.customers_and_their_products.items() if products}
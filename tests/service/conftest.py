@@ -1,9 +1,27 @@
 import pytest
+from typing import Callable
 from unittest.mock import MagicMock
 from decimal import Decimal
+from flask import Flask
+from flask_restful import Api
 from src.app.model import Customer, Product, Purchase
 from src.app.service import PurchasesService
 from src.app.data.database.repository import CrudRepository
+from src.app.routes import purchases
+from src.app.routes.caching import response_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """
+    Fixture clearing the module-level response cache and its counters,
+    since every test service starts at snapshot version 1.
+    """
+    response_cache.clear()
+    response_cache.hits = response_cache.misses = 0
+    yield
+    response_cache.clear()
+    response_cache.hits = response_cache.misses = 0
 
 
 @pytest.fixture
@@ -28,6 +46,21 @@ def mock_purchases_service() -> PurchasesService:
     return service
 
 
+@pytest.fixture
+def create_app(mocker) -> Callable[[PurchasesService], Flask]:
+    """
+    Fixture for creating Flask applications serving the /data resource and the purchase routes.
+
+    :return: A function taking the PurchasesService the routes are patched to use and returning the application.
+    """
+    def create(service: PurchasesService) -> Flask:
+        mocker.patch.object(purchases, 'purchase_service', service)
+        app = Flask(__name__)
+        Api(app).add_resource(purchases.DataResource, '/data')
+        app.register_blueprint(purchases.purchases_blueprint)
+        return app
+
+    return create
 
 
 @pytest.fixture
@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import httpx
+import pytest
+from decimal import Decimal
+from flask import Flask
+from src.app.asgi import PurchasesApplication
+from src.app.async_service import AsyncPurchasesService
+from src.app.data.async_repository import AsyncRepository
+from src.app.data.cache import SnapshotCache
+from src.app.model import Customer, Product, Purchase
+from src.app.routes.purchases import purchases_blueprint
+from src.app.routes.queries import PURCHASE_QUERIES
+from src.app.service import PurchasesService
+
+PURCHASE = Purchase(customers_and_their_products={
+    Customer(id=1, first_name="John", last_name="Doe", age=30, cash=Decimal('1000.00')): [
+        Product(id=1, name="Laptop", category="Electronics", price=Decimal('1200.00')),
+        Product(id=2, name="Smartphone", category="Electronics", price=Decimal('800.00'))
+    ],
+    Customer(id=2, first_name="Jane", last_name="Doe", age=25, cash=Decimal('1500.00')): [
+        Product(id=3, name="Shoes", category="Clothing", price=Decimal('100.00'))
+    ]
+})
+
+PATHS = [
+    '/data',
+    '/data?limit=1',
+    '/data?limit=1&cursor=MQ',
+    '/data?cursor=MQ',
+    '/data?limit=0',
+    '/purchases/total_spent/1',
+    '/purchases/most_spending',
+    '/purchases/most_spending_in_category/Clothing',
+    '/purchases/age_category_preference',
+    '/purchases/category_avg_price',
+    '/purchases/most_and_least_expensive',
+    '/purchases/most_frequent_category',
+    '/purchases/can_pay/1',
+    '/purchases/get_debt/1',
+    '/purchases/indebted_customers'
+]
+
+
+class SlowRepository(AsyncRepository):
+    """
+    Async repository which takes a while to return the sample purchases and counts its loads.
+    """
+
+    def __init__(self) -> None:
+        self.loads = 0
+
+    async def get_purchases(self) -> Purchase:
+        self.loads += 1
+        await asyncio.sleep(0.01)
+        return PURCHASE
+
+
+def get(application: PurchasesApplication, *paths: str, headers: dict | None = None) -> list[httpx.Response]:
+    """
+    Sends concurrent GET requests to an ASGI application.
+
+    :return: The responses in the order of the paths.
+    """
+    async def send():
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await asyncio.gather(*(client.get(path, headers=headers) for path in paths))
+
+    return asyncio.run(send())
+
+
+def test_concurrent_requests_share_a_single_load():
+    repository = SlowRepository()
+    service = AsyncPurchasesService(repository=repository)
+
+    async def query():
+        return await asyncio.gather(*(service.get_customers_total_spent(1) for _ in range(50)))
+
+    assert asyncio.run(query()) == [Decimal('2000.00')] * 50
+    assert repository.loads == 1
+
+
+def test_stale_snapshot_is_reloaded():
+    repository = SlowRepository()
+    service = AsyncPurchasesService(repository=repository, snapshot_cache=SnapshotCache(ttl=0))
+
+    async def query():
+        await service.get_customers_debt(1)
+        await service.get_customers_debt(1)
+
+    asyncio.run(query())
+    assert repository.loads == 2
+
+
+@pytest.mark.parametrize(
+    "path, accept",
+    [
+        *[(path, '*/*') for path in PATHS],
+        ('/data', 'application/x-ndjson'),
+        ('/purchases/indebted_customers', 'application/x-ndjson'),
+        ('/purchases/indebted_customers', 'application/x-ndjson;q=0.5, application/json')
+    ]
+)
+def test_asgi_responses_match_flask(mocker, create_app, path: str, accept: str):
+    flask_app = create_app(PurchasesService(
+        customer_product_repository=mocker.MagicMock(get_purchases=mocker.MagicMock(return_value=PURCHASE))
+    ))
+    expected = flask_app.test_client().get(path, headers={'Accept': accept})
+
+    async def create_service():
+        return AsyncPurchasesService(repository=SlowRepository())
+
+    [response] = get(PurchasesApplication(service_factory=create_service), path, headers={'Accept': accept})
+    assert response.status_code == expected.status_code
+    assert response.headers['Content-Type'] == expected.content_type
+    assert response.content == expected.data
+
+
+def test_asgi_errors_and_unknown_paths():
+    class FailingRepository(AsyncRepository):
+        async def get_purchases(self) -> Purchase:
+            raise ValueError('Source unavailable')
+
+    async def create_service():
+        return AsyncPurchasesService(repository=FailingRepository())
+
+    error, not_found = get(PurchasesApplication(service_factory=create_service), '/data', '/unknown')
+    assert (error.status_code, error.json()) == (500, {'message': 'Source unavailable'})
+    assert not_found.status_code == 404
+
+
+def test_concurrent_first_requests_create_a_single_service():
+    created = []
+
+    async def create_service():
+        await asyncio.sleep(0.01)
+        created.append(AsyncPurchasesService(repository=SlowRepository()))
+        return created[-1]
+
+    responses = get(PurchasesApplication(service_factory=create_service), *PATHS)
+    assert [response.status_code for response in responses] == [400 if path.endswith('limit=0') else 200
+                                                                 for path in PATHS]
+    assert len(created) == 1
+
+
+def test_asgi_rejects_non_get_requests_and_unconverted_arguments():
+    async def create_service():
+        return AsyncPurchasesService(repository=SlowRepository())
+
+    async def send():
+        transport = httpx.ASGITransport(app=PurchasesApplication(service_factory=create_service))
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.post('/data'), await client.get('/purchases/total_spent/one')
+
+    not_allowed, not_found = asyncio.run(send())
+    assert (not_allowed.status_code, not_found.status_code) == (405, 404)
+
+
+def test_aggregations_run_outside_the_event_loop(mocker):
+    threads = []
+    get_customers_with_debts = PurchasesService.get_customers_with_debts
+
+    def record_thread(service: PurchasesService) -> dict[int, Decimal]:
+        threads.append(threading.current_thread())
+        return get_customers_with_debts(service)
+
+    mocker.patch.object(PurchasesService, 'get_customers_with_debts', record_thread)
+
+    async def create_service():
+        return AsyncPurchasesService(repository=SlowRepository())
+
+    [response] = get(PurchasesApplication(service_factory=create_service), '/purchases/indebted_customers')
+    assert response.status_code == 200
+    assert threads and threading.main_thread() not in threads
+
+
+def test_flask_routes_match_the_purchase_queries():
+    flask_app = Flask(__name__)
+    flask_app.register_blueprint(purchases_blueprint)
+    rules = {rule.endpoint: rule.rule for rule in flask_app.url_map.iter_rules() if 'GET' in rule.methods}
+    assert {f'purchases.{name}': f'/purchases{query.rule}' for name, query in PURCHASE_QUERIES.items()} \
+        == {endpoint: rule for endpoint, rule in rules.items() if endpoint.startswith('purchases.')}
@@ -0,0 +1,98 @@
+import random
+import pytest
+from decimal import Decimal
+from unittest.mock import MagicMock
+from flask import Flask, jsonify
+from src.app.columnar import ColumnarPurchases, ColumnarPurchasesService
+from src.app.data.database.repository import CrudRepository
+from src.app.model import Customer, Product, Purchase
+from src.app.service import PurchasesService
+
+
+def random_purchase(seed: int) -> Purchase:
+    """
+    Generates purchases with prices and cash of various exponents, e.g. 12, 1.5 and 0.25.
+
+    :param seed: The seed of the random generator.
+    :return: A Purchase object.
+    """
+    generator = random.Random(seed)
+    products = [
+        Product(id=i, name=f"Product {i}", category=generator.choice("ABCD"),
+                price=Decimal(generator.randint(0, 500)) / generator.choice([1, 10, 100]))
+        for i in range(generator.randint(0, 20))
+    ]
+    return Purchase(customers_and_their_products={
+        Customer(id=i, first_name="First", last_name="Last", age=generator.randint(18, 22),
+                 cash=Decimal(generator.randint(0, 100000)) / 100): generator.sample(products, min(len(products), 4))
+        for i in range(generator.randint(0, 30))
+    })
+
+
+def responses(service_type: type, purchase: Purchase) -> list[bytes]:
+    """
+    Serializes the results of all service methods the way the purchase routes do.
+
+    :param service_type: The service class to query.
+    :param purchase: The purchases served by the mocked repository.
+    :return: The JSON response bodies.
+    """
+    repository = MagicMock(spec=CrudRepository)
+    repository.get_purchases = MagicMock(return_value=purchase)
+    service = service_type(customer_product_repository=repository)
+    with Flask(__name__).app_context():
+        return [
+            jsonify([c.to_dict() for c in service.get_customer_who_spent_the_most()]).get_data(),
+            jsonify(service.get_age_category_preference()).get_data(),
+            jsonify(service.get_category_and_avg_price()).get_data(),
+            jsonify(service.get_most_and_least_expensive_in_category()).get_data(),
+            jsonify({k: [c.to_dict() for c in v]
+                     for k, v in service.get_most_frequent_category_for_customers().items()}).get_data(),
+            jsonify(service.get_customers_with_debts()).get_data(),
+            *[jsonify([c.to_dict() for c in service.get_most_spending_in_category(category)]).get_data()
+              for category in "ABCDE"],
+            *[jsonify([service.get_customers_total_spent(i), service.get_customers_debt(i),
+                       service.can_customer_pay(i)]).get_data()
+              for i in range(-1, 32)]
+        ]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_responses_are_identical(seed: int):
+    purchase = random_purchase(seed)
+    assert ColumnarPurchases.from_purchase(purchase) is not None
+    assert responses(ColumnarPurchasesService, purchase) == responses(PurchasesService, purchase)
+
+
+def test_falls_back_for_fractional_cents(mock_purchases_service: PurchasesService):
+    purchase = mock_purchases_service.get_all_purchases()
+    purchase.customers_and_their_products[Customer(id=3, first_name="Sam", last_name="Smith", age=28,
+                                                   cash=Decimal('0.001'))] = []
+    assert ColumnarPurchases.from_purchase(purchase) is None
+    assert responses(ColumnarPurchasesService, purchase) == responses(PurchasesService, purchase)
+
+
+def test_equally_priced_products_are_ordered_by_id():
+    products = [Product(id=5, name="Five", category="A", price=Decimal('10.00')),
+                Product(id=2, name="Two", category="A", price=Decimal('10.00')),
+                Product(id=7, name="Seven", category="A", price=Decimal('1.00')),
+                Product(id=3, name="Three", category="A", price=Decimal('1.00'))]
+    purchase = Purchase(customers_and_their_products={
+        Customer(id=1, first_name="First", last_name="Last", age=20, cash=Decimal(0)): products
+    })
+    result = responses(ColumnarPurchasesService, purchase)
+    assert result == responses(PurchasesService, purchase)
+    expensive = ColumnarPurchasesService(customer_product_repository=MagicMock(
+        spec=CrudRepository, get_purchases=MagicMock(return_value=purchase)
+    )).get_most_and_least_expensive_in_category()['A']
+    assert (expensive.max.id, expensive.min.id) == (2, 3)
+
+
+def test_falls_back_when_sums_might_overflow():
+    price = Decimal(2 ** 61) / 100
+    products = [Product(id=i, name=f"Product {i}", category="A", price=price) for i in range(4)]
+    purchase = Purchase(customers_and_their_products={
+        Customer(id=1, first_name="First", last_name="Last", age=20, cash=Decimal(0)): products
+    })
+    assert ColumnarPurchases.from_purchase(purchase) is None
+    assert responses(ColumnarPurchasesService, purchase) == responses(PurchasesService, purchase)
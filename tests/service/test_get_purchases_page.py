@@ -0,0 +1,47 @@
+import pytest
+from src.app.service import PurchasesService
+from src.app.utils import decode_cursor, encode_cursor, parse_page_arguments, MAX_PAGE_LIMIT
+
+
+def test_pages_cover_all_customers_in_id_order(mock_purchases_service: PurchasesService):
+    first, last_id = mock_purchases_service.get_purchases_page(limit=1)
+    assert [c.id for c in first.customers_and_their_products] == [1]
+    assert last_id == 1
+
+    second, last_id = mock_purchases_service.get_purchases_page(limit=1, after=last_id)
+    assert [c.id for c in second.customers_and_their_products] == [2]
+    assert last_id is None
+
+
+def test_page_keeps_products(mock_purchases_service: PurchasesService):
+    page, last_id = mock_purchases_service.get_purchases_page(limit=10)
+    assert page == mock_purchases_service.get_all_purchases()
+    assert last_id is None
+
+
+def test_page_after_last_customer_is_empty(mock_purchases_service: PurchasesService):
+    page, last_id = mock_purchases_service.get_purchases_page(limit=10, after=2)
+    assert page.customers_and_their_products == {}
+    assert last_id is None
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+
+
+@pytest.mark.parametrize(
+    "limit, cursor, expected",
+    [
+        (None, None, (100, None)),
+        ("5", encode_cursor(7), (5, 7)),
+        ("1000000", None, (MAX_PAGE_LIMIT, None))
+    ]
+)
+def test_parse_page_arguments(limit: str | None, cursor: str | None, expected: tuple):
+    assert parse_page_arguments(limit, cursor) == expected
+
+
+@pytest.mark.parametrize("limit, cursor", [("0", None), ("ten", None), ("5", "!!"), ("5", "YWJj")])
+def test_parse_invalid_page_arguments(limit: str, cursor: str | None):
+    with pytest.raises(ValueError):
+        parse_page_arguments(limit, cursor)
@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+import pytest
+from flask import Flask
+from prometheus_client import CONTENT_TYPE_LATEST
+from sqlalchemy import create_engine, text
+from src.app.metrics import instrument_loads, registry, render_metrics
+from src.app.routes.metrics import metrics_blueprint
+from src.app.service import PurchasesService
+
+# Records metrics in a separate process, like a gunicorn worker
+RECORD_METRICS = """
+from src.app.metrics import repository_rows, sql_queries
+sql_queries.inc(3)
+repository_rows.labels('csv').set(7)
+"""
+
+
+def sample(name: str, **labels: str) -> float:
+    return registry.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture
+def metrics_app(mocker, create_app, mock_purchases_service: PurchasesService) -> Flask:
+    """
+    Fixture for creating a Flask application serving the purchase routes and the metrics.
+
+    :return: The application.
+    """
+    mocker.patch('src.app.routes.metrics.purchase_service', mock_purchases_service)
+    app = create_app(mock_purchases_service)
+    app.register_blueprint(metrics_blueprint)
+    return app
+
+
+def test_metrics_of_all_worker_processes_are_aggregated(tmp_path, monkeypatch):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', RECORD_METRICS], env=env, check=True)
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+
+    lines = render_metrics().decode().splitlines()
+    assert 'purchases_sql_queries_total 6.0' in lines
+    assert sum(line.startswith('purchases_repository_rows{') and line.endswith(' 7.0') for line in lines) == 2
+
+
+def test_repository_loads_are_timed_and_counted(mocker, mock_purchases_service: PurchasesService):
+    repository = mock_purchases_service.customer_product_repository
+    loads = sample('purchases_repository_load_duration_seconds_count', source='test')
+    instrument_loads(repository, 'test')
+
+    mock_purchases_service.get_all_purchases()
+    assert sample('purchases_repository_load_duration_seconds_count', source='test') == loads + 1
+    assert sample('purchases_repository_rows', source='test') == 3
+
+    errors = sample('purchases_repository_load_errors_total', source='test')
+    repository.get_purchases.__wrapped__.side_effect = ConnectionError('source is down')
+    with pytest.raises(ConnectionError):
+        repository.get_purchases()
+    assert sample('purchases_repository_load_errors_total', source='test') == errors + 1
+
+
+def test_requests_are_timed_by_route(metrics_app: Flask):
+    client = metrics_app.test_client()
+    route = '/purchases/get_debt/<int:customer_id>'
+    labels = {'method': 'GET', 'route': route, 'status': '200'}
+    requests = sample('purchases_request_duration_seconds_count', **labels)
+    hits = sample('purchases_cache_hits_total', cache='responses')
+
+    client.get('/purchases/get_debt/1')
+    client.get('/purchases/get_debt/1')
+    response = client.get('/metrics')
+
+    assert response.content_type == CONTENT_TYPE_LATEST
+    assert sample('purchases_request_duration_seconds_count', **labels) == requests + 2
+    assert sample('purchases_cache_hits_total', cache='responses') == hits + 1
+    lines = response.get_data(as_text=True).splitlines()
+    assert 'purchases_cache_hit_ratio{cache="responses"} 0.5' in lines
+    assert f'purchases_request_duration_seconds_count{{method="GET",route="{route}",status="200"}} ' \
+           f'{requests + 2:.1f}' in lines
+
+
+def test_sql_queries_are_counted_per_request(metrics_app: Flask):
+    app = metrics_app
+    engine = create_engine('sqlite://')
+
+    @app.route('/query/<int:count>')
+    def query(count: int):
+        with engine.connect() as connection:
+            for _ in range(count):
+                connection.execute(text('SELECT 1'))
+        return {}
+
+    requests = sample('purchases_request_sql_queries_count', route='/query/<int:count>')
+    queries = sample('purchases_request_sql_queries_sum', route='/query/<int:count>')
+    app.test_client().get('/query/3')
+    app.test_client().get('/query/2')
+
+    assert sample('purchases_request_sql_queries_count', route='/query/<int:count>') == requests + 2
+    assert sample('purchases_request_sql_queries_sum', route='/query/<int:count>') == queries + 5
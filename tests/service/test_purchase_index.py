@@ -0,0 +1,120 @@
+import dataclasses
+import pytest
+from decimal import Decimal
+from src.app.index import PurchaseIndex, PurchaseIndexMaintainer
+from src.app.model import Customer, Product, Purchase, PurchaseChange
+from src.app.service import PurchasesService
+from src.app.utils import MaxMin
+
+
+def test_index_aggregates(mock_purchases_service: PurchasesService):
+    index = PurchaseIndex.from_purchase(mock_purchases_service.get_all_purchases())
+    john, jane = index.customers[1], index.customers[2]
+    assert index.totals_spent == {1: Decimal('2000.00'), 2: Decimal('100.00')}
+    assert index.top_spenders == [john]
+    assert index.category_top_spenders == {'Electronics': [john], 'Clothing': [jane]}
+    assert index.category_counts == {'Electronics': {john: 2}, 'Clothing': {jane: 1}}
+    assert index.age_category_counts == {30: {'Electronics': 2}, 25: {'Clothing': 1}}
+    assert index.debts == {1: Decimal('1000.00'), 2: Decimal(0)}
+    assert list(index.unique_products) == [1, 2, 3]
+    assert [p.id for p in index.products_by_category['Electronics']] == [1, 2]
+    assert index.category_avg_price == {'Electronics': Decimal('1000.00'), 'Clothing': Decimal('100.00')}
+
+
+def test_index_is_built_once_per_snapshot(mock_purchases_service: PurchasesService, mocker):
+    from_purchase = mocker.spy(PurchaseIndex, 'from_purchase')
+    mock_purchases_service.get_customers_with_debts()
+    mock_purchases_service.get_category_and_avg_price()
+    mock_purchases_service.get_customer_who_spent_the_most()
+    assert from_purchase.call_count == 1
+
+    repository = mock_purchases_service.customer_product_repository
+    repository.get_purchases.return_value = dataclasses.replace(repository.get_purchases.return_value)
+    mock_purchases_service.snapshot_cache.invalidate()
+    mock_purchases_service.get_customers_with_debts()
+    assert from_purchase.call_count == 2
+
+
+@pytest.mark.parametrize("extra_products, totals, avg_prices", [
+    ([], {1: '105.5', 2: '20.00', 3: '0'}, {'X': '52.75', 'Y': '20.00'}),
+    # An amount with more than two decimal places is aggregated with Decimal arithmetic
+    ([Product(id=4, name='Pen', category='Y', price=Decimal('0.125'))], {1: '105.5', 2: '20.00', 3: '0.125'},
+     {'X': '52.75', 'Y': '10.0625'})
+])
+def test_index_amounts_keep_decimal_exponents(extra_products: list, totals: dict, avg_prices: dict):
+    expensive = Product(id=1, name='Bike', category='X', price=Decimal('1E+2'))
+    cheap = Product(id=2, name='Bell', category='X', price=Decimal('5.5'))
+    index = PurchaseIndex.from_purchase(Purchase(customers_and_their_products={
+        Customer(id=1, first_name='John', last_name='Doe', age=30, cash=Decimal('1E+1')): [expensive, cheap],
+        Customer(id=2, first_name='Jane', last_name='Doe', age=25, cash=Decimal('20.00')): [
+            Product(id=3, name='Shoes', category='Y', price=Decimal('20.00'))
+        ],
+        Customer(id=3, first_name='Sam', last_name='Smith', age=28, cash=Decimal('5')): extra_products
+    }))
+
+    assert {customer_id: str(total) for customer_id, total in index.totals_spent.items()} == totals
+    assert {customer_id: str(debt) for customer_id, debt in index.debts.items()} == {1: '95.5', 2: '0.00', 3: '0'}
+    assert {category: str(price) for category, price in index.category_avg_price.items()} == avg_prices
+    assert index.most_and_least_expensive['X'] == MaxMin(max=expensive, min=cheap)
+    assert index.top_spenders == [index.customers[1]]
+
+
+def test_most_and_least_expensive_prefers_lower_id_on_ties():
+    hat = Product(id=4, name='Hat', category='Clothing', price=Decimal('100.00'))
+    shoes = Product(id=3, name='Shoes', category='Clothing', price=Decimal('100.00'))
+    scarf = Product(id=2, name='Scarf', category='Clothing', price=Decimal('100.00'))
+    john = Customer(id=1, first_name='John', last_name='Doe', age=30, cash=Decimal('0.00'))
+    purchase = Purchase(customers_and_their_products={john: [hat, shoes]})
+    index = PurchaseIndex.from_purchase(purchase)
+    assert index.most_and_least_expensive['Clothing'] == MaxMin(max=shoes, min=shoes)
+
+    maintainer = PurchaseIndexMaintainer.from_index(index, purchase)
+    updated = maintainer.apply(purchase, [PurchaseChange(john, scarf, added=True)])
+    assert maintainer.index.most_and_least_expensive['Clothing'] == MaxMin(max=scarf, min=scarf)
+    assert PurchaseIndex.from_purchase(updated).most_and_least_expensive == maintainer.index.most_and_least_expensive
+
+
+def test_maintained_index_matches_rebuilt_index(mock_purchases_service: PurchasesService):
+    purchase = mock_purchases_service.get_all_purchases()
+    index = PurchaseIndex.from_purchase(purchase)
+    john, jane = index.customers[1], index.customers[2]
+    laptop, smartphone, shoes = index.unique_products.values()
+    sam = Customer(id=3, first_name='Sam', last_name='Smith', age=25, cash=Decimal('0.00'))
+    maintainer = PurchaseIndexMaintainer.from_index(index, purchase)
+
+    updated = maintainer.apply(purchase, [
+        PurchaseChange(john, laptop, added=False),
+        PurchaseChange(jane, laptop, added=True),
+        PurchaseChange(sam, shoes, added=True)
+    ])
+
+    assert updated.customers_and_their_products == {john: [smartphone], jane: [shoes, laptop], sam: [shoes]}
+    assert purchase.customers_and_their_products[john] == [laptop, smartphone]
+    assert index == PurchaseIndex.from_purchase(purchase)
+    maintained = maintainer.index
+    rebuilt = PurchaseIndex.from_purchase(updated)
+    assert maintained.totals_spent == rebuilt.totals_spent and maintained.debts == rebuilt.debts
+    assert maintained.top_spenders == rebuilt.top_spenders == [jane]
+    assert maintained.category_top_spenders == rebuilt.category_top_spenders
+    assert maintained.category_counts == rebuilt.category_counts
+    assert maintained.age_category_counts == rebuilt.age_category_counts
+    assert maintained.category_avg_price == rebuilt.category_avg_price
+    assert maintained.most_and_least_expensive == rebuilt.most_and_least_expensive
+
+    assert maintainer.apply(updated, [PurchaseChange(sam, laptop, added=False)]) is None
+    assert maintainer.index is maintained and maintained.totals_spent == rebuilt.totals_spent
+
+
+def test_changes_not_matching_the_rankings_invalidate_the_snapshot(mock_purchases_service: PurchasesService):
+    purchase = mock_purchases_service.get_all_purchases()
+    index = mock_purchases_service._get_index()
+    john = index.customers[1]
+    laptop = index.unique_products[1]
+    mock_purchases_service.apply_changes([PurchaseChange(john, laptop, added=False)])
+    maintainer = mock_purchases_service.snapshot_cache._derived['index_maintainer']
+    maintainer._spend_ranking[:] = [(Decimal('1000000.00'), 99)]
+
+    mock_purchases_service.apply_changes([PurchaseChange(john, laptop, added=True)])
+
+    assert not mock_purchases_service.snapshot_cache._is_fresh()
+    assert purchase.customers_and_their_products[john] == [laptop, index.unique_products[2]]
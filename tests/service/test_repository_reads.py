@@ -0,0 +1,49 @@
+import pytest
+from decimal import Decimal
+from unittest.mock import MagicMock
+from src.app.data.cache import SnapshotCache
+from src.app.data.database.repository import CrudRepository
+from src.app.model import Customer, Product, Purchase
+from src.app.service import PurchasesService
+
+
+@pytest.fixture
+def uncached_purchases_service() -> PurchasesService:
+    """
+    Fixture for creating a PurchasesService with caching disabled and a few hundred customers,
+    so every repository read made by a service method is visible to the mock.
+
+    :return: A PurchasesService instance with a mocked CrudRepository.
+    """
+    service = PurchasesService(customer_product_repository=MagicMock(spec=CrudRepository),
+                               snapshot_cache=SnapshotCache(ttl=0))
+    purchase = Purchase(customers_and_their_products={
+        Customer(id=i, first_name="First", last_name="Last", age=20 + i % 50, cash=Decimal(i)): [
+            Product(id=j, name=f"Product {j}", category=f"Category {j % 7}", price=Decimal(j) / 4)
+            for j in range(i % 10, i % 10 + 5)
+        ]
+        for i in range(500)
+    })
+    service.customer_product_repository.get_purchases = MagicMock(return_value=purchase)
+    return service
+
+
+@pytest.mark.parametrize(
+    "method, args",
+    [
+        ("get_customers_total_spent", (1,)),
+        ("get_customer_who_spent_the_most", ()),
+        ("get_most_spending_in_category", ("Category 1",)),
+        ("get_age_category_preference", ()),
+        ("get_category_and_avg_price", ()),
+        ("get_most_and_least_expensive_in_category", ()),
+        ("get_most_frequent_category_for_customers", ()),
+        ("can_customer_pay", (1,)),
+        ("get_customers_debt", (1,)),
+        ("get_customers_with_debts", ())
+    ]
+)
+def test_repository_is_read_once_per_call(uncached_purchases_service: PurchasesService, method: str, args: tuple):
+    getattr(uncached_purchases_service, method)(*args)
+    assert uncached_purchases_service.customer_product_repository.get_purchases.call_count == 1
+
@@ -0,0 +1,89 @@
+import asyncio
+import httpx
+from decimal import Decimal
+from src.app.asgi import PurchasesApplication
+from src.app.async_service import AsyncPurchasesService
+from src.app.model import Customer, Product, Purchase
+from src.app.routes.caching import ResponseCache, make_etag, response_cache
+from src.app.routes.streaming import NDJSON_MIMETYPE
+from src.app.service import PurchasesService, SQLPurchasesService
+from tests.service.test_async_service import SlowRepository
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(maxsize=2)
+    cache.put(('a',), b'1')
+    cache.put(('b',), b'2')
+    assert cache.get(('a',)) == (b'1', make_etag(b'1'))
+    cache.put(('c',), b'3')
+
+    assert cache.get(('b',)) is None
+    assert cache.get(('c',)) == (b'3', make_etag(b'3'))
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'size': 2, 'maxsize': 2}
+
+
+def test_unchanged_data_is_rendered_once_and_revalidated(mocker, create_app, mock_purchases_service: PurchasesService):
+    client = create_app(mock_purchases_service).test_client()
+    spy = mocker.spy(mock_purchases_service, 'get_category_and_avg_price')
+
+    first = client.get('/purchases/category_avg_price')
+    second = client.get('/purchases/category_avg_price')
+    not_modified = client.get('/purchases/category_avg_price', headers={'If-None-Match': first.headers['ETag']})
+
+    assert spy.call_count == 1
+    assert first.headers['ETag'] == f'"{make_etag(first.data)}"'
+    assert first.headers['Cache-Control'] == 'no-cache'
+    assert second.data == first.data and second.headers['ETag'] == first.headers['ETag']
+    assert (not_modified.status_code, not_modified.data) == (304, b'')
+    assert response_cache.stats()['hits'] == 2
+
+
+def test_route_arguments_and_new_snapshots_are_cached_separately(create_app, mock_purchases_service: PurchasesService):
+    client = create_app(mock_purchases_service).test_client()
+    john, jane = client.get('/purchases/get_debt/1'), client.get('/purchases/get_debt/2')
+    assert john.json == {'debt': '1000.00'} and jane.json == {'debt': '0'}
+    assert john.headers['ETag'] != jane.headers['ETag']
+
+    mock_purchases_service.customer_product_repository.get_purchases.return_value = Purchase({
+        Customer(id=1, first_name='John', last_name='Doe', age=30, cash=Decimal('0.00')): [
+            Product(id=1, name='Laptop', category='Electronics', price=Decimal('1200.00'))
+        ]
+    })
+    mock_purchases_service.snapshot_cache.invalidate()
+    changed = client.get('/purchases/get_debt/1', headers={'If-None-Match': john.headers['ETag']})
+    assert (changed.status_code, changed.json) == (200, {'debt': '1200.00'})
+
+
+def test_ndjson_and_pushed_down_responses_are_not_stored(mocker, create_app, mock_purchases_service: PurchasesService):
+    client = create_app(mock_purchases_service).test_client()
+    stream = client.get('/purchases/indebted_customers', headers={'Accept': NDJSON_MIMETYPE})
+    assert stream.mimetype == NDJSON_MIMETYPE and 'ETag' not in stream.headers
+    assert stream.headers['Vary'] == 'Accept'
+
+    repository = mocker.MagicMock(get_customers_total_spent=mocker.MagicMock(return_value=Decimal('5.00')))
+    client = create_app(SQLPurchasesService(customer_product_repository=repository)).test_client()
+    first = client.get('/purchases/total_spent/1')
+    not_modified = client.get('/purchases/total_spent/1', headers={'If-None-Match': first.headers['ETag']})
+
+    assert not_modified.status_code == 304
+    assert repository.get_customers_total_spent.call_count == 2
+    assert response_cache.stats()['size'] == 0
+
+
+def test_asgi_etags_match_flask(create_app, mock_purchases_service: PurchasesService):
+    expected = create_app(mock_purchases_service).test_client().get('/purchases/most_and_least_expensive')
+
+    async def create_service():
+        return AsyncPurchasesService(repository=SlowRepository())
+
+    async def send():
+        transport = httpx.ASGITransport(app=PurchasesApplication(service_factory=create_service))
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            first = await client.get('/purchases/most_and_least_expensive')
+            second = await client.get('/purchases/most_and_least_expensive',
+                                      headers={'If-None-Match': first.headers['etag']})
+            return first, second
+
+    first, second = asyncio.run(send())
+    assert first.headers['etag'] == expected.headers['ETag']
+    assert (second.status_code, second.content) == (304, b'')
@@ -0,0 +1,110 @@
+import json
+import pytest
+from decimal import Decimal
+from flask import Flask, jsonify
+from src.app.model import Customer, Product, Purchase
+from src.app.serializer import PurchaseSerializer, create_backend
+from src.app.service import PurchasesService
+from src.app.utils import MaxMin
+
+LAPTOP = Product(id=1, name='Laptop "Pro" \\ 15″', category='Électronique', price=Decimal('1200.00'))
+PHONE = Product(id=2, name='Phone\x7f \t', category='Electronics', price=Decimal('1E+3'))
+SHOES = Product(id=3, name='Shoes', category='Clothing', price=Decimal('-0.00'))
+
+PURCHASE = Purchase(customers_and_their_products={
+    Customer(id=10, first_name='Zoë', last_name='Doe', age=30, cash=Decimal('1000.00')): [LAPTOP, PHONE, LAPTOP],
+    Customer(id=9, first_name='Jane', last_name='Doe', age=25, cash=Decimal('1500.00')): [SHOES, PHONE],
+    # A second customer object with an id already seen replaces its products, like in Purchase.to_dict
+    Customer(id=10, first_name='Zoë', last_name='Doe', age=31, cash=Decimal('1000.00')): [SHOES],
+    Customer(id=11, first_name='Empty', last_name='Cart', age=40, cash=Decimal('0')): []
+})
+
+PAYLOADS = [
+    {'total_spent': 2000.0},
+    {'total_spent': 1e16},
+    {'total_spent': 0.1 + 0.2},
+    {'debt': Decimal('12.50')},
+    {'can_pay': False},
+    {'top_spenders': [customer.to_dict() for customer in PURCHASE.customers_and_their_products]},
+    {'age_category_preference': {30: 'Électronique', 25: 'Clothing', 100: 'Books'}},
+    {'category_avg_price': {'Electronics': Decimal('1000.000'), 'Clothing': Decimal('1E+2')}},
+    {'most_and_least_expensive': {'Electronics': MaxMin(max=LAPTOP, min=PHONE)}},
+    {'most_frequent_category_for_customer': {'Clothing': list(PURCHASE.customers_and_their_products)}},
+    {'indebted_customers': {9: Decimal('100.00'), 10: Decimal('1E+1')}},
+    {'message': 'Not\x7f found '}
+]
+
+
+@pytest.fixture(params=['json', 'orjson'])
+def serializer(request) -> PurchaseSerializer:
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    return PurchaseSerializer(create_backend(request.param))
+
+
+@pytest.mark.parametrize('payload', PAYLOADS)
+def test_dumps_matches_jsonify(serializer: PurchaseSerializer, payload: dict):
+    with Flask(__name__).app_context():
+        assert serializer.dumps(payload) == jsonify(payload).get_data()
+
+
+def test_purchases_match_flask_restful(serializer: PurchaseSerializer):
+    assert serializer.purchases(PURCHASE) == (json.dumps({'purchases': PURCHASE.to_dict()}) + '\n').encode()
+    assert serializer.purchases(PURCHASE) is serializer.purchases(PURCHASE)
+
+
+def test_purchases_page_matches_flask_restful(serializer: PurchaseSerializer):
+    for next_cursor in ['MTA', None]:
+        expected = json.dumps({'purchases': PURCHASE.to_dict(), 'next_cursor': next_cursor}) + '\n'
+        assert serializer.purchases_page(PURCHASE, next_cursor) == expected.encode()
+
+
+def test_ndjson_lines_match_json(serializer: PurchaseSerializer):
+    lines = serializer.purchase_lines(PURCHASE.customers_and_their_products.items())
+    assert list(lines) == [
+        json.dumps({'customer_id': customer.id, 'products': [product.to_dict() for product in products]},
+                   separators=(',', ':')).encode() + b'\n'
+        for customer, products in PURCHASE.customers_and_their_products.items()
+    ]
+
+    debts = {9: Decimal('100.00'), 10: Decimal('-1E+1')}
+    assert list(serializer.debt_lines(debts)) == [
+        json.dumps({'customer_id': customer_id, 'debt': str(debt)}, separators=(',', ':')).encode() + b'\n'
+        for customer_id, debt in debts.items()
+    ]
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend('simplejson')
+
+
+@pytest.mark.parametrize('debug', [False, True])
+@pytest.mark.parametrize('path', ['/data', '/data?limit=2', '/purchases/most_and_least_expensive',
+                                  '/purchases/age_category_preference', '/purchases/indebted_customers'])
+def test_routes_match_default_encoders(mocker, create_app, path: str, debug: bool):
+    service = PurchasesService(
+        customer_product_repository=mocker.MagicMock(get_purchases=mocker.MagicMock(return_value=PURCHASE))
+    )
+    app = create_app(service)
+    app.debug = debug
+    response = app.test_client().get(path)
+
+    with app.test_request_context():
+        match path:
+            case '/data':
+                expected = json.dumps({'purchases': PURCHASE.to_dict()}, indent=4 if debug else None) + '\n'
+            case '/data?limit=2':
+                page, _ = service.get_purchases_page(2)
+                payload = {'purchases': page.to_dict(), 'next_cursor': 'MTA'}
+                expected = json.dumps(payload, indent=4 if debug else None) + '\n'
+            case '/purchases/most_and_least_expensive':
+                expected = jsonify({'most_and_least_expensive': service.get_most_and_least_expensive_in_category()})
+            case '/purchases/age_category_preference':
+                expected = jsonify({'age_category_preference': service.get_age_category_preference()})
+            case _:
+                expected = jsonify({'indebted_customers': service.get_customers_with_debts()})
+
+    assert response.status_code == 200
+    assert response.content_type == 'application/json'
+    assert response.data == (expected.encode() if isinstance(expected, str) else expected.get_data())
@@ -0,0 +1,61 @@
+import dataclasses
+from unittest.mock import MagicMock
+from src.app.data.cache import SnapshotCache
+from src.app.service import PurchasesService
+
+
+def test_repository_is_read_once_while_snapshot_is_fresh(mock_purchases_service: PurchasesService):
+    mock_purchases_service.get_customer_who_spent_the_most()
+    mock_purchases_service.get_category_and_avg_price()
+    mock_purchases_service.get_customers_with_debts()
+    assert mock_purchases_service.customer_product_repository.get_purchases.call_count == 1
+    assert mock_purchases_service.snapshot_cache.misses == 1
+    assert mock_purchases_service.snapshot_cache.hits > 0
+
+
+def test_invalidate_reloads_snapshot(mock_purchases_service: PurchasesService):
+    repository = mock_purchases_service.customer_product_repository
+    mock_purchases_service.get_all_purchases()
+    version = mock_purchases_service.snapshot_cache.version
+    repository.get_purchases.return_value = dataclasses.replace(repository.get_purchases.return_value)
+    mock_purchases_service.snapshot_cache.invalidate()
+    mock_purchases_service.get_all_purchases()
+    assert repository.get_purchases.call_count == 2
+    assert mock_purchases_service.snapshot_cache.version == version + 1
+
+
+def test_reloading_the_same_snapshot_keeps_its_version_and_derived_values(mocker):
+    cache = SnapshotCache(ttl=10)
+    snapshot = object()
+    loader = MagicMock(return_value=snapshot)
+    builder = MagicMock(return_value='derived')
+    monotonic = mocker.patch('src.app.data.cache.time.monotonic', return_value=100.0)
+    cache.get_derived('name', loader, builder)
+    monotonic.return_value = 111.0
+    assert cache.get_derived('name', loader, builder) == 'derived'
+
+    assert loader.call_count == 2
+    assert builder.call_count == 1
+    assert cache.stats() == {'hits': 0, 'misses': 2, 'version': 1, 'age': 0.0}
+
+
+def test_zero_ttl_disables_caching():
+    cache = SnapshotCache(ttl=0)
+    loader = MagicMock(return_value=object())
+    cache.get(loader)
+    cache.get(loader)
+    assert loader.call_count == 2
+    assert cache.stats()['hits'] == 0
+
+
+def test_expired_snapshot_is_reloaded(mocker):
+    cache = SnapshotCache(ttl=10)
+    loader = MagicMock(side_effect=lambda: object())
+    monotonic = mocker.patch('src.app.data.cache.time.monotonic', return_value=100.0)
+    cache.get(loader)
+    monotonic.return_value = 105.0
+    cache.get(loader)
+    monotonic.return_value = 111.0
+    cache.get(loader)
+    assert loader.call_count == 2
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'version': 2, 'age': 0.0}
@@ -0,0 +1,72 @@
+import pytest
+import time
+from decimal import Decimal
+from unittest.mock import MagicMock
+from src.app.data.database.repository import CrudRepository
+from src.app.model import Customer, Product, Purchase
+from src.app.refresher import SnapshotRefresher
+from src.app.service import PurchasesService
+from src.app.data.cache import SnapshotCache
+
+CUSTOMER = Customer(id=1, first_name="John", last_name="Doe", age=30, cash=Decimal('1000.00'))
+
+
+def purchase(price: str) -> Purchase:
+    return Purchase(customers_and_their_products={
+        CUSTOMER: [Product(id=1, name="Laptop", category="Electronics", price=Decimal(price))]
+    })
+
+
+@pytest.fixture
+def service() -> PurchasesService:
+    repository = MagicMock(spec=CrudRepository)
+    repository.get_purchases = MagicMock(side_effect=[purchase('1200.00'), purchase('900.00')])
+    return PurchasesService(customer_product_repository=repository, snapshot_cache=SnapshotCache(ttl=float('inf')))
+
+
+def test_refresh_swaps_in_snapshot_and_aggregates(service: PurchasesService):
+    refresher = SnapshotRefresher(service=service)
+
+    assert refresher.refresh()
+    assert service.get_customers_total_spent(1) == Decimal('1200.00')
+    assert refresher.refresh()
+    assert service.get_customers_total_spent(1) == Decimal('900.00')
+    assert service.customer_product_repository.get_purchases.call_count == 2
+    assert refresher.status()['refreshes'] == 2
+
+
+def test_failed_refresh_keeps_last_good_snapshot(service: PurchasesService):
+    service.customer_product_repository.get_purchases.side_effect = [purchase('1200.00'), ConnectionError('Down')]
+    refresher = SnapshotRefresher(service=service, interval=60, jitter=0, backoff=5, max_backoff=8)
+
+    assert refresher.refresh()
+    assert not refresher.refresh()
+    assert service.get_customers_total_spent(1) == Decimal('1200.00')
+    assert refresher.status()['last_error'] == 'Down'
+    assert refresher.next_delay() == 5
+
+    refresher.consecutive_failures = 3
+    assert refresher.next_delay() == 8
+
+
+def test_next_delay_is_jittered(service: PurchasesService):
+    refresher = SnapshotRefresher(service=service, interval=100, jitter=0.1)
+    delays = {refresher.next_delay() for _ in range(100)}
+    assert all(90 <= delay <= 110 for delay in delays)
+    assert len(delays) > 1
+
+
+def test_background_thread_refreshes_until_stopped(service: PurchasesService):
+    service.customer_product_repository.get_purchases.side_effect = lambda: purchase('1200.00')
+    refresher = SnapshotRefresher(service=service, interval=0.01, jitter=0)
+
+    refresher.start()
+    deadline = time.monotonic() + 5
+    while refresher.refreshes < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert refresher.status()['running']
+    refresher.stop(timeout=5)
+
+    assert refresher.refreshes >= 3
+    assert not refresher.status()['running']
+    assert refresher.status()['snapshot_age'] is not None
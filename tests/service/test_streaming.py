@@ -0,0 +1,34 @@
+import json
+from decimal import Decimal
+from src.app.routes.streaming import NDJSON_MIMETYPE
+from src.app.service import PurchasesService
+
+
+def test_data_is_streamed_as_ndjson(create_app, mock_purchases_service: PurchasesService):
+    response = create_app(mock_purchases_service).test_client().get('/data', headers={'Accept': NDJSON_MIMETYPE})
+
+    assert response.mimetype == NDJSON_MIMETYPE
+    assert response.is_streamed
+    lines = [json.loads(line) for line in response.data.splitlines()]
+    assert lines == [
+        {'customer_id': customer.id, 'products': [product.to_dict() for product in products]}
+        for customer, products in mock_purchases_service.get_all_purchases().customers_and_their_products.items()
+    ]
+
+
+def test_indebted_customers_are_streamed_as_ndjson(create_app, mock_purchases_service: PurchasesService):
+    response = create_app(mock_purchases_service).test_client().get(
+        '/purchases/indebted_customers', headers={'Accept': f'{NDJSON_MIMETYPE}, application/json;q=0.5'}
+    )
+
+    assert response.mimetype == NDJSON_MIMETYPE
+    assert [json.loads(line) for line in response.data.splitlines()] == [
+        {'customer_id': customer_id, 'debt': str(debt)}
+        for customer_id, debt in mock_purchases_service.get_customers_with_debts().items()
+    ]
+    assert Decimal(json.loads(response.data.splitlines()[0])['debt']) == Decimal('1000.00')
+
+
+def test_json_remains_the_default(create_app, mock_purchases_service: PurchasesService):
+    response = create_app(mock_purchases_service).test_client().get('/data', headers={'Accept': '*/*'})
+    assert response.mimetype == 'application/json'